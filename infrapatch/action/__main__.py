@@ -6,6 +6,7 @@ from github import Auth, Github, GithubException
 from github.PullRequest import PullRequest
 from github.Repository import Repository
 
+import infrapatch.core.constants as cs
 from infrapatch.action.config import ActionConfigProvider
 from infrapatch.core.log_helper import catch_exception, setup_logging
 from infrapatch.core.provider_handler import ProviderHandler
@@ -29,18 +30,23 @@ def main(debug: bool):
     if len(config.enabled_providers) == 0:
         raise Exception("No providers enabled. Please enable at least one provider.")
 
+    # Refs like origin/main are only up to date after fetching, changed files are compared against them.
+    git.fetch_origin()
+
     builder = ProviderHandlerBuilder(config.working_directory)
-    builder.with_git_integration(config.repository_root)
+    builder.with_git_integration(config.repository_root, config.commit_strategy)
+    builder.with_release_notes_mode(config.release_notes_mode)
+    if config.changed_since_ref is not None:
+        builder.with_changed_files_since(config.changed_since_ref)
     if "terraform_modules" in config.enabled_providers or "terraform_providers" in config.enabled_providers:
-        builder.add_terraform_registry_configuration(config.default_registry_domain, config.terraform_registry_secrets)
+        builder.add_terraform_registry_configuration(config.default_registry_domain, config.terraform_registry_secrets, registry_cache_path=config.registry_cache_path)
     if "terraform_modules" in config.enabled_providers:
         builder.with_terraform_module_provider(github)
     if "terraform_providers" in config.enabled_providers:
         builder.with_terraform_provider_provider(github)
 
     provider_handler = builder.build()
-
-    git.fetch_origin()
+    click.get_current_context().call_on_close(builder.close)
 
     try:
         github_target_branch = github_repo.get_branch(config.target_branch)
@@ -59,6 +65,7 @@ def main(debug: bool):
         log.info(f"Rebasing branch {config.target_branch} onto origin/{config.head_branch}")
         git.run_git_command(["rebase", "-Xtheirs", f"origin/{config.head_branch}"])
         git.push(["-f", "-u", "origin", config.target_branch])
+        builder.update_changed_files()
 
     provider_handler.print_resource_table(only_upgradable=True, disable_cache=True)
 
@@ -78,6 +85,7 @@ def main(debug: bool):
         log.info(f"Branch {config.target_branch} does not exist. Creating and checking out...")
         github_repo.create_git_ref(ref=f"refs/heads/{config.target_branch}", sha=github_head_branch.commit.sha)
         git.checkout_branch(config.target_branch, f"origin/{config.head_branch}")
+        builder.update_changed_files()
 
     provider_handler.upgrade_resources()
     if upgradable_resources_head_branch is not None:
@@ -106,6 +114,11 @@ def update_pr_body(pr, provider_handler):
 
 def get_pr_body(provider_handler: ProviderHandler) -> str:
     body = ""
+    statistics = provider_handler._get_statistics().get_markdown_table().dumps() + "\n"
+    # Release notes which would exceed the size limit of the body are left out, the tables and statistics are always added.
+    # Some room is kept for the note about omitted release notes.
+    omitted_release_notes = 0
+    release_notes_budget = cs.PULL_REQUEST_BODY_MAX_LENGTH - len(statistics) - 500
     markdown_tables = provider_handler.get_markdown_table_for_changed_resources()
     patched_resources = provider_handler.get_patched_resources()
     release_notes = provider_handler.get_release_notes(patched_resources)
@@ -120,13 +133,19 @@ def get_pr_body(provider_handler: ProviderHandler) -> str:
             log.debug(f"Adding release notes for provider '{provider_name}' to pull request body.")
             body += "## Changelog\n"
             for release_note in release_notes[provider_name]:
-                body += "<details>\n"
-                body += f"<summary>{release_note.name} - {release_note.version}</summary>\n"
-                body += f"{release_note.body}\n"
-                body += "</details>\n\n"
-
-    body += provider_handler._get_statistics().get_markdown_table().dumps()
-    body += "\n"
+                section = "<details>\n"
+                section += f"<summary>{release_note.name} - {release_note.version}</summary>\n"
+                section += f"{release_note.body}\n"
+                section += "</details>\n\n"
+                if len(body) + len(section) > release_notes_budget:
+                    log.debug(f"Omitting release notes of '{release_note.name}' to stay within the size limit of the pull request body.")
+                    omitted_release_notes += 1
+                    continue
+                body += section
+
+    if omitted_release_notes > 0:
+        body += f"{omitted_release_notes} release notes were omitted to stay within the size limit of the pull request body.\n\n"
+    body += statistics
     return body
 
 
@@ -1,7 +1,7 @@
 import logging as log
 import os
 from pathlib import Path
-from typing import Any
+from typing import Any, Union
 
 
 class MissingConfigException(Exception):
@@ -19,6 +19,10 @@ class ActionConfigProvider:
     repository_root: Path
     report_only: bool
     terraform_registry_secrets: dict[str, str]
+    registry_cache_path: Union[Path, None]
+    changed_since_ref: Union[str, None]
+    commit_strategy: str
+    release_notes_mode: str
 
     def __init__(self) -> None:
         self.github_token = _get_value_from_env("GITHUB_TOKEN", secret=True)
@@ -31,6 +35,10 @@ class ActionConfigProvider:
         self.default_registry_domain = _get_value_from_env("DEFAULT_REGISTRY_DOMAIN")
         self.terraform_registry_secrets = _get_credentials_from_string(_get_value_from_env("TERRAFORM_REGISTRY_SECRET_STRING", secret=True, default=""))
         self.report_only = _from_env_to_bool(_get_value_from_env("REPORT_ONLY", default="False").lower())
+        self.registry_cache_path = _get_optional_path_from_env("REGISTRY_CACHE_PATH")
+        self.changed_since_ref = _get_value_from_env("CHANGED_SINCE_REF", default="") or None
+        self.commit_strategy = _get_value_from_env("COMMIT_STRATEGY", default="resource").lower()
+        self.release_notes_mode = _get_value_from_env("RELEASE_NOTES_MODE", default="latest").lower()
 
 
 def _get_value_from_env(key: str, secret: bool = False, default: Any = None) -> Any:
@@ -46,6 +54,13 @@ def _get_value_from_env(key: str, secret: bool = False, default: Any = None) ->
     raise MissingConfigException(f"Missing configuration for key: {key}")
 
 
+def _get_optional_path_from_env(key: str) -> Union[Path, None]:
+    value = _get_value_from_env(key, default="")
+    if value == "":
+        return None
+    return Path(value)
+
+
 def _get_credentials_from_string(credentials_string: str) -> dict[str, str]:
     credentials = {}
     if credentials_string == "":
@@ -0,0 +1,22 @@
+from unittest.mock import MagicMock
+
+import infrapatch.core.constants as cs
+from infrapatch.action.__main__ import get_pr_body
+from infrapatch.core.models.statistics import Statistics
+from infrapatch.core.models.versioned_resource import VersionedResourceReleaseNotes
+
+
+def test_get_pr_body_stays_within_size_limit():
+    release_notes = [VersionedResourceReleaseNotes(resources=[], name=f"test/module_{i}/aws", version="2.0.0", body="x" * 20000) for i in range(5)]
+    provider_handler = MagicMock()
+    provider_handler.providers = {"terraform_modules": MagicMock()}
+    provider_handler.get_markdown_table_for_changed_resources.return_value = {}
+    provider_handler.get_release_notes.return_value = {"terraform_modules": release_notes}
+    provider_handler._get_statistics.return_value = Statistics(errors=0, resources_patched=5, resources_pending_update=0, total_resources=5, providers={})
+
+    body = get_pr_body(provider_handler)
+
+    assert len(body) <= cs.PULL_REQUEST_BODY_MAX_LENGTH
+    assert body.count("<details>") == 3
+    assert "2 release notes were omitted" in body
+    assert body.endswith(provider_handler._get_statistics().get_markdown_table().dumps() + "\n")
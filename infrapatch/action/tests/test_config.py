@@ -70,6 +70,8 @@ def test_action_config_init(working_directory_relative_path):
     assert config.default_registry_domain == "registry.example.com"
     assert config.terraform_registry_secrets == {"test_registry.ch": "abc123"}
     assert config.report_only is False
+    assert config.commit_strategy == "resource"
+    assert config.release_notes_mode == "latest"
 
     # Test case 2: Missing values in os.environ
     os.environ.clear()
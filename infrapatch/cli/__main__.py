@@ -1,17 +1,16 @@
 from pathlib import Path
-from typing import Union
+from typing import TYPE_CHECKING, Union
 
 import click
 
+import infrapatch.core.constants as cs
 from infrapatch.cli.__init__ import __version__
-from infrapatch.core.credentials_helper import get_registry_credentials
 from infrapatch.core.log_helper import catch_exception, setup_logging
-from infrapatch.core.provider_handler import ProviderHandler
-from infrapatch.core.provider_handler_builder import ProviderHandlerBuilder
-from infrapatch.core.utils.terraform.hcl_edit_cli import HclEditCli
-from infrapatch.core.utils.terraform.hcl_handler import HclHandler
 
-provider_handler: Union[ProviderHandler, None] = None
+if TYPE_CHECKING:
+    from infrapatch.core.provider_handler import ProviderHandler
+
+provider_handler: Union["ProviderHandler", None] = None
 
 
 @click.group(invoke_without_command=True)
@@ -20,13 +19,40 @@ provider_handler: Union[ProviderHandler, None] = None
 @click.option("--working-directory-path", default=None, help="Working directory to run. Defaults to the current working directory")
 @click.option("--credentials-file-path", default=None, help="Path to a file containing credentials for private registries.")
 @click.option("--default-registry-domain", default="registry.terraform.io", help="Default registry domain for resources without a specified domain.")
+@click.option("--registry-workers", default=cs.DEFAULT_REGISTRY_WORKERS, type=click.IntRange(min=1), help="Number of parallel registry lookups.")
+@click.option("--patch-workers", default=cs.DEFAULT_PATCH_WORKERS, type=click.IntRange(min=1), help="Number of .tf files patched in parallel.")
+@click.option(
+    "--registry-cache-path", default=None, envvar="INFRAPATCH_REGISTRY_CACHE_PATH", help="Directory to persist registry responses between runs. Disabled if not specified."
+)
+@click.option("--disable-registry-cache", is_flag=True, help="Bypass the persistent registry cache for this run.")
+@click.option("--prune-registry-cache", is_flag=True, help="Remove expired entries from the persistent registry cache before running.")
+@click.option("--incremental", is_flag=True, help="Only parse .tf files which changed since the last run, based on a manifest stored in the working directory.")
+@click.option("--changed-since", default=None, help="Only scan .tf files changed since the given git ref, resources of other files are taken from the previous incremental scan.")
 @catch_exception(handle=Exception)
-def main(debug: bool, version: bool, working_directory_path: str, credentials_file_path: str, default_registry_domain: str):
+def main(
+    debug: bool,
+    version: bool,
+    working_directory_path: str,
+    credentials_file_path: str,
+    default_registry_domain: str,
+    registry_workers: int,
+    patch_workers: int,
+    registry_cache_path: Union[str, None],
+    disable_registry_cache: bool,
+    prune_registry_cache: bool,
+    incremental: bool,
+    changed_since: Union[str, None],
+):
     if version:
         print(f"You are running infrapatch version: {__version__}")
         exit(0)
     setup_logging(debug)
 
+    # Imported after the version check, so '--version' does not load pydantic, GitHub, Git and the HCL parser.
+    from infrapatch.core.credentials_helper import get_registry_credentials
+    from infrapatch.core.provider_handler_builder import ProviderHandlerBuilder
+    from infrapatch.core.utils.terraform.registry_cache import RegistryResponseCache
+
     global provider_handler
     credentials_file = None
     working_directory = Path.cwd()
@@ -40,12 +66,28 @@ def main(debug: bool, version: bool, working_directory_path: str, credentials_fi
         credentials_file = Path(credentials_file_path)
         if not credentials_file.exists() or not credentials_file.is_file():
             raise Exception(f"Credentials file '{credentials_file}' does not exist.")
-    credentials = get_registry_credentials(HclHandler(HclEditCli()), credentials_file)
+    if prune_registry_cache and registry_cache_path is None:
+        raise click.UsageError("--prune-registry-cache requires a registry cache path, set it with --registry-cache-path or INFRAPATCH_REGISTRY_CACHE_PATH.")
+    registry_cache = None
+    if registry_cache_path is not None:
+        if prune_registry_cache:
+            RegistryResponseCache(Path(registry_cache_path)).prune()
+        if not disable_registry_cache:
+            registry_cache = Path(registry_cache_path)
+
     provider_builder = ProviderHandlerBuilder(working_directory)
-    provider_builder.add_terraform_registry_configuration(default_registry_domain, credentials)
+    if incremental:
+        provider_builder.with_incremental_scan()
+    if changed_since is not None:
+        provider_builder.with_changed_files_since(changed_since)
+    # The scan options must be set before, the credentials loader creates the handler shared with the providers.
+    credentials = get_registry_credentials(provider_builder.get_hcl_handler(), credentials_file)
+    provider_builder.add_terraform_registry_configuration(default_registry_domain, credentials, registry_workers, registry_cache)
+    provider_builder.with_patch_workers(patch_workers)
     provider_builder.with_terraform_module_provider()
     provider_builder.with_terraform_provider_provider()
     provider_handler = provider_builder.build()
+    click.get_current_context().call_on_close(provider_builder.close)
 
 
 # noinspection PyUnresolvedReferences
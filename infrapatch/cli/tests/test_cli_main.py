@@ -0,0 +1,12 @@
+from click.testing import CliRunner
+
+from infrapatch.cli.__main__ import main
+
+
+def test_prune_registry_cache_requires_cache_path(monkeypatch):
+    monkeypatch.delenv("INFRAPATCH_REGISTRY_CACHE_PATH", raising=False)
+
+    result = CliRunner().invoke(main, ["--prune-registry-cache", "report"])
+
+    assert result.exit_code == 2
+    assert "--prune-registry-cache requires a registry cache path" in result.output
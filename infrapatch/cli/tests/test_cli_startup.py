@@ -0,0 +1,50 @@
+import re
+import subprocess
+import sys
+
+from infrapatch.cli.__init__ import __version__
+
+# Generous cold import budgets in microseconds, they catch heavy modules moving back to import time, not small regressions.
+VERSION_IMPORT_BUDGET = 300_000
+REPORT_IMPORT_BUDGET = 1_500_000
+
+# Modules which are only needed by some commands and must not be imported at startup.
+HEAVY_MODULES = ["github", "git", "pytablewriter", "pygohcl", "pydantic", "rich.console"]
+
+
+def _get_import_times(*modules: str) -> tuple[dict[str, int], set[str]]:
+    # Imports the modules in a fresh interpreter and returns the cumulative import time of every module and all loaded modules.
+    statements = "; ".join(f"import {module}" for module in modules)
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"{statements}; import sys; print(','.join(sys.modules))"], capture_output=True, text=True, check=True)
+    import_times = {}
+    for line in result.stderr.splitlines():
+        # Only top level imports are counted, nested imports are contained in their cumulative time.
+        match = re.match(r"import time:\s+\d+ \|\s+(\d+) \| (\S+)", line)
+        if match is not None:
+            import_times[match.group(2)] = int(match.group(1))
+    return import_times, set(result.stdout.strip().split(","))
+
+
+def _get_cumulative_import_time(import_times: dict[str, int], modules: list[str]) -> int:
+    return sum(time for module, time in import_times.items() if module.split(".")[0] in modules)
+
+
+def test_version_command():
+    result = subprocess.run([sys.executable, "-m", "infrapatch.cli", "--version"], capture_output=True, text=True)
+    assert result.returncode == 0
+    assert __version__ in result.stdout
+
+
+def test_version_startup_does_not_import_heavy_modules():
+    import_times, loaded_modules = _get_import_times("infrapatch.cli.__main__")
+
+    assert [module for module in HEAVY_MODULES if module in loaded_modules] == []
+    assert _get_cumulative_import_time(import_times, ["infrapatch", "click"]) < VERSION_IMPORT_BUDGET
+
+
+def test_report_startup_does_not_import_unused_clients():
+    # The report command needs the provider handler, but neither GitHub, Git nor markdown tables.
+    import_times, loaded_modules = _get_import_times("infrapatch.cli.__main__", "infrapatch.core.provider_handler_builder")
+
+    assert [module for module in ["github", "git", "pytablewriter"] if module in loaded_modules] == []
+    assert _get_cumulative_import_time(import_times, ["infrapatch", "click"]) < REPORT_IMPORT_BUDGET
@@ -0,0 +1,101 @@
+import json
+import threading
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Callable, Iterator, Union
+
+import pytest
+
+from infrapatch.core.models.versioned_terraform_resources import TerraformModule
+
+# Helpers shared by the tests of all packages, test modules import them from infrapatch.conftest.
+
+
+def get_module(
+    name: str,
+    source_file: str = "main.tf",
+    source: str = "test/test_module/aws",
+    current_version: str = "1.0.0",
+    newest_version: Union[str, None] = None,
+) -> TerraformModule:
+    module = TerraformModule(name=name, current_version=current_version, source_file=Path(source_file), source_string=source, start_line_number=1)
+    if newest_version is not None:
+        module.newest_version = newest_version
+    return module
+
+
+@dataclass
+class StubResponse:
+    status: int
+    body: Union[dict, list]
+    headers: dict[str, str] = field(default_factory=dict)
+
+
+class StubHttpServer(ThreadingHTTPServer):
+    # Answers GET requests with the response of the given function and records the requests it received.
+    def __init__(self, handle_request: Callable[["StubHttpServer", str], StubResponse]):
+        super().__init__(("127.0.0.1", 0), StubHttpRequestHandler)
+        self.handle_request = handle_request
+        self.connections = 0
+        self.active_requests = 0
+        self.max_active_requests = 0
+        self.authorization_headers: list[str] = []
+        self.paths: list[str] = []
+        self.lock = threading.Lock()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+class StubHttpRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: StubHttpServer
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def do_GET(self):
+        with self.server.lock:
+            self.server.active_requests += 1
+            self.server.max_active_requests = max(self.server.max_active_requests, self.server.active_requests)
+            self.server.authorization_headers.append(self.headers.get("Authorization", ""))
+            self.server.paths.append(self.path)
+        try:
+            self._send(self.server.handle_request(self.server, self.path))
+        finally:
+            with self.server.lock:
+                self.server.active_requests -= 1
+
+    def _send(self, response: StubResponse):
+        payload = json.dumps(response.body).encode()
+        self.send_response(response.status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for key, value in response.headers.items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def start_stub_http_server() -> Iterator[Callable[[Callable[[StubHttpServer, str], StubResponse]], StubHttpServer]]:
+    servers: list[StubHttpServer] = []
+
+    def start(handle_request: Callable[[StubHttpServer, str], StubResponse]) -> StubHttpServer:
+        server = StubHttpServer(handle_request)
+        thread = threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.01}, daemon=True)
+        thread.start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
@@ -1,3 +1,5 @@
+import os
+
 # Width of the cli interface
 CLI_WIDTH = 160
 
@@ -7,3 +9,42 @@ APP_NAME = "InfraPatch"
 DEFAULT_CREDENTIALS_FILE_NAME = "infrapatch_credentials.json"
 
 infrapatch_options_prefix = "# infrapatch_options:"
+
+# Number of parallel registry lookups per provider
+DEFAULT_REGISTRY_WORKERS = 8
+
+# Lifetime in seconds of persistent registry cache entries before they are revalidated
+REGISTRY_CACHE_METADATA_TTL = 24 * 60 * 60
+REGISTRY_CACHE_VERSIONS_TTL = 15 * 60
+REGISTRY_CACHE_VERSION_INFO_TTL = 7 * 24 * 60 * 60
+
+# Connection settings for requests to the registries
+DEFAULT_REGISTRY_CONNECTIONS_PER_HOST = 8
+REGISTRY_REQUEST_TIMEOUT = 30
+REGISTRY_MAX_REDIRECTS = 5
+
+# Number of .tf files parsed in parallel
+DEFAULT_PARSER_WORKERS = os.cpu_count() or 1
+
+# Directories which are never searched for .tf files
+DEFAULT_PRUNED_DIRECTORIES = [".terraform", ".git", "node_modules"]
+
+# Files containing gitignore patterns for files and directories to skip
+IGNORE_FILE_NAMES = [".gitignore", ".infrapatchignore"]
+
+# Number of .tf files patched in parallel
+DEFAULT_PATCH_WORKERS = 8
+
+# Coarsest modification time resolution of common filesystems (FAT), files modified within it of being read are checked by content.
+FILE_TIMESTAMP_GRANULARITY_NS = 2_000_000_000
+
+# Number of parallel requests for release notes from GitHub
+DEFAULT_RELEASE_NOTES_WORKERS = 8
+
+# Lifetime in seconds of persistent release notes cache entries, missing releases are checked again sooner
+RELEASE_NOTES_CACHE_TTL = 7 * 24 * 60 * 60
+RELEASE_NOTES_MISSING_CACHE_TTL = 60 * 60
+
+# Size limits in characters for the release notes of a single resource and for the whole pull request body
+RELEASE_NOTES_MAX_LENGTH = 10000
+PULL_REQUEST_BODY_MAX_LENGTH = 65536
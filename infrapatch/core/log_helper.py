@@ -1,7 +1,7 @@
 from functools import wraps, partial
 import logging as log
 
-from rich.console import Console
+import click
 
 _debug = False
 
@@ -23,8 +23,13 @@ def catch_exception(func=None, *, handle):
     def wrapper(*args, **kwargs):
         try:
             return func(*args, **kwargs)
+        except click.ClickException:
+            # Usage errors are reported by click itself.
+            raise
         except handle as e:
             if _debug:
+                from rich.console import Console
+
                 Console().print_exception()
             else:
                 log.error("An error occurred: " + str(e))
@@ -0,0 +1,8 @@
+class CommitStrategy:
+    RESOURCE = "resource"
+    FILE = "file"
+    PROVIDER = "provider"
+    RUN = "run"
+
+
+COMMIT_STRATEGIES = [CommitStrategy.RESOURCE, CommitStrategy.FILE, CommitStrategy.PROVIDER, CommitStrategy.RUN]
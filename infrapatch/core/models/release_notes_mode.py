@@ -0,0 +1,8 @@
+class ReleaseNotesMode:
+    # Release notes of the newest version only.
+    LATEST = "latest"
+    # Release notes of every version between the current and the newest version.
+    RANGE = "range"
+
+
+RELEASE_NOTES_MODES = [ReleaseNotesMode.LATEST, ReleaseNotesMode.RANGE]
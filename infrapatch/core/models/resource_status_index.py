@@ -0,0 +1,78 @@
+import threading
+from typing import Sequence
+
+from infrapatch.core.models.versioned_resource import ResourceStatus, VersionedResource
+
+
+class ResourceCategory:
+    UPGRADABLE = "upgradable"
+    PATCHED = ResourceStatus.PATCHED
+    PATCH_ERROR = ResourceStatus.PATCH_ERROR
+    NO_VERSION_FOUND = ResourceStatus.NO_VERSION_FOUND
+
+
+RESOURCE_CATEGORIES = [ResourceCategory.UPGRADABLE, ResourceCategory.PATCHED, ResourceCategory.PATCH_ERROR, ResourceCategory.NO_VERSION_FOUND]
+
+
+def get_resource_categories(resource: VersionedResource) -> set[str]:
+    categories = set()
+    if resource.status in RESOURCE_CATEGORIES:
+        categories.add(resource.status)
+    # Resources are only indexed after their newest version was resolved, until then they can not be upgradable.
+    if (resource.newest_version_string is not None or resource.status == ResourceStatus.NO_VERSION_FOUND) and not resource.check_if_up_to_date():
+        categories.add(ResourceCategory.UPGRADABLE)
+    return categories
+
+
+class _ProviderIndex:
+    def __init__(self, resources: Sequence[VersionedResource]):
+        self.resources = list(resources)
+        # Resources of every category by their position, so lookups return the resources in their original order.
+        self.categories: dict[str, dict[int, VersionedResource]] = {category: {} for category in RESOURCE_CATEGORIES}
+        self.refresh()
+
+    def refresh(self):
+        for category_resources in self.categories.values():
+            category_resources.clear()
+        for position, resource in enumerate(self.resources):
+            for category in get_resource_categories(resource):
+                self.categories[category][position] = resource
+
+
+class ResourceStatusIndex:
+    # Resources by provider and category, refreshed by the provider handler whenever it changes the status of resources.
+    def __init__(self):
+        self._providers: dict[str, _ProviderIndex] = {}
+        self._lock = threading.Lock()
+
+    def set_resources(self, provider_name: str, resources: Sequence[VersionedResource]):
+        provider_index = _ProviderIndex(resources)
+        with self._lock:
+            self._providers[provider_name] = provider_index
+
+    def refresh(self):
+        # Categorizes all indexed resources again, after their status or versions changed.
+        with self._lock:
+            for provider_index in self._providers.values():
+                provider_index.refresh()
+
+    def has_provider(self, provider_name: str) -> bool:
+        return provider_name in self._providers
+
+    def get_resources(self, provider_name: str, *categories: str) -> list[VersionedResource]:
+        # Resources in one of the given categories, in the order they were indexed.
+        with self._lock:
+            provider_index = self._providers[provider_name]
+            resources: dict[int, VersionedResource] = {}
+            for category in categories:
+                resources.update(provider_index.categories[category])
+            return [resources[position] for position in sorted(resources)]
+
+    def count(self, provider_name: str, category: str) -> int:
+        with self._lock:
+            return len(self._providers[provider_name].categories[category])
+
+    def get_counts(self, provider_name: str) -> dict[str, int]:
+        # Counts of all categories from a single consistent state, used for the statistics.
+        with self._lock:
+            return {category: len(resources) for category, resources in self._providers[provider_name].categories.items()}
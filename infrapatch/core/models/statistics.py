@@ -1,8 +1,10 @@
-from typing import Any, Sequence
+from typing import TYPE_CHECKING, Any, Sequence
 from pydantic import BaseModel
-from pytablewriter import MarkdownTableWriter
 from rich.table import Table
-from infrapatch.core.models.versioned_resource import VersionedResource
+from infrapatch.core.models.versioned_resource import ResourceStatus, VersionedResource
+
+if TYPE_CHECKING:
+    from pytablewriter import MarkdownTableWriter
 
 
 class BaseStatistics(BaseModel):
@@ -18,10 +20,35 @@ class BaseStatistics(BaseModel):
 class ProviderStatistics(BaseStatistics):
     resources: Sequence[VersionedResource]
 
+    @classmethod
+    def from_resources(cls, resources: Sequence[VersionedResource]) -> "ProviderStatistics":
+        # Counts everything in a single pass over the resources.
+        errors = 0
+        resources_patched = 0
+        resources_pending_update = 0
+        for resource in resources:
+            if resource.status == ResourceStatus.PATCH_ERROR:
+                errors += 1
+            elif resource.status == ResourceStatus.PATCHED:
+                resources_patched += 1
+            if not resource.check_if_up_to_date():
+                resources_pending_update += 1
+        return cls(errors=errors, resources_patched=resources_patched, resources_pending_update=resources_pending_update, total_resources=len(resources), resources=resources)
+
 
 class Statistics(BaseStatistics):
     providers: dict[str, ProviderStatistics]
 
+    @classmethod
+    def from_providers(cls, providers: dict[str, ProviderStatistics]) -> "Statistics":
+        return cls(
+            errors=sum(statistics.errors for statistics in providers.values()),
+            resources_patched=sum(statistics.resources_patched for statistics in providers.values()),
+            resources_pending_update=sum(statistics.resources_pending_update for statistics in providers.values()),
+            total_resources=sum(statistics.total_resources for statistics in providers.values()),
+            providers=providers,
+        )
+
     def get_rich_table(self) -> Table:
         table = Table(show_header=True, title="Statistics", expand=True)
         table.add_column("Errors")
@@ -38,7 +65,10 @@ class Statistics(BaseStatistics):
         )
         return table
 
-    def get_markdown_table(self) -> MarkdownTableWriter:
+    def get_markdown_table(self) -> "MarkdownTableWriter":
+        # Only needed for pull requests, importing pytablewriter is deferred until then.
+        from pytablewriter import MarkdownTableWriter
+
         dict_element = {
             "Errors": self.errors,
             "Patched": self.resources_patched,
@@ -0,0 +1,55 @@
+import logging as log
+import os
+from pathlib import Path
+
+from pydantic import BaseModel
+
+import infrapatch.core.constants as cs
+from infrapatch.core.models.versioned_terraform_resources import TerraformModule, TerraformProvider
+from infrapatch.core.utils.atomic_file import write_file_atomic
+
+# Increase when the structure of the manifest or the parsed resources changes, older manifests are discarded.
+MANIFEST_FORMAT_VERSION = 2
+
+
+class ParsedTerraformFile(BaseModel):
+    mtime_ns: int
+    size: int
+    content_hash: str
+    modules: list[TerraformModule]
+    providers: list[TerraformProvider]
+    # Time the content was read. A file modified within the timestamp granularity before can be rewritten without changing size and mtime.
+    # Such entries are verified by their content hash, entries of older manifests without this field as well.
+    checked_at_ns: int = 0
+
+    def matches_stat(self, stat: os.stat_result) -> bool:
+        if self.mtime_ns != stat.st_mtime_ns or self.size != stat.st_size:
+            return False
+        return self.mtime_ns + cs.FILE_TIMESTAMP_GRANULARITY_NS < self.checked_at_ns
+
+
+class TerraformScanManifest(BaseModel):
+    format_version: int = MANIFEST_FORMAT_VERSION
+    files: dict[str, ParsedTerraformFile] = {}
+
+    @classmethod
+    def load(cls, manifest_file: Path) -> "TerraformScanManifest":
+        if not manifest_file.exists():
+            log.debug(f"No scan manifest found at {manifest_file.absolute().as_posix()}.")
+            return cls()
+        try:
+            manifest = cls.model_validate_json(manifest_file.read_text())
+        except Exception as e:
+            log.warning(f"Could not read scan manifest {manifest_file.absolute().as_posix()}, running a full scan: {e}")
+            return cls()
+        if manifest.format_version != MANIFEST_FORMAT_VERSION:
+            log.debug(f"Scan manifest has format version {manifest.format_version}, expected {MANIFEST_FORMAT_VERSION}. Running a full scan.")
+            return cls()
+        log.debug(f"Loaded scan manifest with {len(manifest.files)} files from {manifest_file.absolute().as_posix()}.")
+        return manifest
+
+    def save(self, manifest_file: Path):
+        log.debug(f"Writing scan manifest with {len(self.files)} files to {manifest_file.absolute().as_posix()}.")
+        # Unset fields are excluded, so resource options that were never processed are not restored as processed.
+        content = self.model_dump_json(exclude_unset=True)
+        write_file_atomic(manifest_file, content)
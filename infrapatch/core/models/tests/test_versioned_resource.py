@@ -1,6 +1,8 @@
 from pathlib import Path, PosixPath
+from unittest import mock
 
 import pytest
+import semantic_version
 
 from infrapatch.core.models.versioned_resource import ResourceStatus, VersionedResource
 
@@ -121,3 +123,22 @@ def test_versioned_resource_to_dict():
         },
     }
     assert resource.model_dump() == expected_dict
+
+
+def test_version_checks_are_cached():
+    resource = VersionedResource(name="test_resource", current_version="1.0.0", source_file=Path("test_file.py"), start_line_number=1)
+    resource.newest_version = "2.0.0"
+    with mock.patch("semantic_version.Version", wraps=semantic_version.Version) as version_mock:
+        for _ in range(10):
+            assert resource.check_if_up_to_date() is False
+        assert version_mock.call_count == 0
+
+        # Changing a version invalidates the cached result
+        resource.newest_version = "1.0.0"
+        assert resource.check_if_up_to_date() is True
+        resource.current_version = "0.5.0"
+        assert resource.installed_version_equal_or_newer_than_new_version() is False
+        assert resource.has_tile_constraint() is False
+        resource.current_version = "~>0.5.0"
+        assert resource.has_tile_constraint() is True
+        assert version_mock.call_count > 0
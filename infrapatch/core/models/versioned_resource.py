@@ -1,12 +1,15 @@
 import logging as log
 import re
 from pathlib import Path
-from typing import Any, Optional
+from typing import Any, Optional, Sequence
 from urllib.parse import urlparse
 
 import semantic_version
-from git import Sequence
-from pydantic import BaseModel
+from pydantic import BaseModel, PrivateAttr
+
+
+_plain_version_re = re.compile(r"^[0-9]+\.[0-9]+\.[0-9]+$")
+_tile_constraint_re = re.compile(r"^~>[0-9]+\.[0-9]+\.[0-9]+$")
 
 
 class ResourceStatus:
@@ -30,6 +33,10 @@ class VersionedResource(BaseModel):
     status: str = ResourceStatus.UNPATCHED
     github_repo_string: Optional[str] = None
     options: VersionedResourceOptions = VersionedResourceOptions()
+    # Results of the version checks, stored together with the versions they were computed for.
+    # A cached result is only used while the versions are unchanged, so every assignment invalidates it.
+    _tile_constraint_cache: Optional[tuple[str, bool]] = PrivateAttr(default=None)
+    _up_to_date_cache: Optional[tuple[str, str, bool]] = PrivateAttr(default=None)
 
     @property
     def resource_name(self):
@@ -87,10 +94,11 @@ class VersionedResource(BaseModel):
         self.status = ResourceStatus.UP_TO_DATE
 
     def has_tile_constraint(self) -> bool:
-        result = re.match(r"^~>[0-9]+\.[0-9]+\.[0-9]+$", self.current_version)
-        if result is None:
-            return False
-        return True
+        if self._tile_constraint_cache is not None and self._tile_constraint_cache[0] == self.current_version:
+            return self._tile_constraint_cache[1]
+        result = _tile_constraint_re.match(self.current_version) is not None
+        self._tile_constraint_cache = (self.current_version, result)
+        return result
 
     def set_patch_error(self):
         self.status = ResourceStatus.PATCH_ERROR
@@ -104,11 +112,18 @@ class VersionedResource(BaseModel):
             return True
         if self.newest_version_string is None:
             raise Exception(f"Newest version of resource '{self.name}' is not set.")
+        cache = self._up_to_date_cache
+        if cache is not None and cache[0] == self.current_version and cache[1] == self.newest_version_string:
+            return cache[2]
+        result = self._compare_versions()
+        self._up_to_date_cache = (self.current_version, self.newest_version_string, result)
+        return result
 
+    def _compare_versions(self) -> bool:
         newest = semantic_version.Version(self.newest_version_base)
 
         # check if the current version has the following format: "1.2.3"
-        if re.match(r"^[0-9]+\.[0-9]+\.[0-9]+$", self.current_version):
+        if _plain_version_re.match(self.current_version):
             current = semantic_version.Version(self.current_version)
             if current >= newest:
                 return True
@@ -27,6 +27,8 @@ class VersionedTerraformResource(VersionedResource):
 
 class TerraformModule(VersionedTerraformResource):
     def model_post_init(self, __context):
+        # Initializes the private attributes of the base model.
+        super().model_post_init(__context)
         self.source = self.source_string
 
     @property
@@ -55,6 +57,8 @@ class TerraformModule(VersionedTerraformResource):
 
 class TerraformProvider(VersionedTerraformResource):
     def model_post_init(self, __context):
+        # Initializes the private attributes of the base model.
+        super().model_post_init(__context)
         self.source = self.source_string
 
     @property
@@ -1,27 +1,54 @@
 import logging as log
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-from typing import Sequence, Union
+from typing import TYPE_CHECKING, Sequence, Union
 
-from git import Repo
-from pytablewriter import MarkdownTableWriter
 from rich import progress
 from rich.console import Console
 
+import infrapatch.core.constants as cs
+from infrapatch.core.models.commit_strategy import COMMIT_STRATEGIES, CommitStrategy
+from infrapatch.core.models.release_notes_mode import RELEASE_NOTES_MODES, ReleaseNotesMode
+from infrapatch.core.models.resource_status_index import ResourceCategory, ResourceStatusIndex
 from infrapatch.core.models.statistics import ProviderStatistics, Statistics
 from infrapatch.core.models.versioned_resource import ResourceStatus, VersionedResource, VersionedResourceReleaseNotes
 from infrapatch.core.providers.base_provider_interface import BaseProviderInterface
 from infrapatch.core.utils.options_processor import OptionsProcessorInterface
+from infrapatch.core.utils.version_selection import parse_version
+
+if TYPE_CHECKING:
+    from git import Repo
+    from pytablewriter import MarkdownTableWriter
 
 
 class ProviderHandler:
     def __init__(
-        self, providers: Sequence[BaseProviderInterface], console: Console, statistics_file: Path, options_processor: OptionsProcessorInterface, repo: Union[Repo, None] = None
+        self,
+        providers: Sequence[BaseProviderInterface],
+        console: Console,
+        statistics_file: Path,
+        options_processor: OptionsProcessorInterface,
+        repo: Union["Repo", None] = None,
+        patch_workers: int = cs.DEFAULT_PATCH_WORKERS,
+        commit_strategy: str = CommitStrategy.RESOURCE,
+        release_notes_mode: str = ReleaseNotesMode.LATEST,
     ) -> None:
+        if patch_workers < 1:
+            raise Exception(f"Patch workers must be at least 1, got {patch_workers}.")
+        if commit_strategy not in COMMIT_STRATEGIES:
+            raise Exception(f"Commit strategy '{commit_strategy}' is not supported, supported strategies are: {', '.join(COMMIT_STRATEGIES)}.")
+        if release_notes_mode not in RELEASE_NOTES_MODES:
+            raise Exception(f"Release notes mode '{release_notes_mode}' is not supported, supported modes are: {', '.join(RELEASE_NOTES_MODES)}.")
+        self.patch_workers = patch_workers
+        self.commit_strategy = commit_strategy
+        self.release_notes_mode = release_notes_mode
         self.providers: dict[str, BaseProviderInterface] = {}
         for provider in providers:
             self.providers[provider.get_provider_name()] = provider
 
         self._resource_cache: dict[str, Sequence[VersionedResource]] = {}
+        # Resources of the cache by status, refreshed whenever the handler changes the status of resources.
+        self._status_index = ResourceStatusIndex()
         self.console = console
         self.statistics_file = statistics_file
         self.repo = repo
@@ -37,36 +64,30 @@ class ProviderHandler:
                 log.debug(f"Using cached resources for provider {provider.get_provider_name()}.")
                 continue
             resources = provider.get_resources()
-            for resource in resources:
-                self.options_processor.process_options_for_resource(resource)
+            self.options_processor.process_options_for_resources(resources)
             ignored_resources = [resource for resource in resources if resource.options.ignore_resource]
             un_ignored_resources = [resource for resource in resources if not resource.options.ignore_resource]
             for resource in ignored_resources:
                 log.debug(f"Ignoring resource '{resource.name}' from provider {provider.get_provider_display_name()}since its marked as ignored.")
 
             self._resource_cache[provider.get_provider_name()] = un_ignored_resources
+            self._status_index.set_resources(provider.get_provider_name(), un_ignored_resources)
         return self._resource_cache
 
     def get_patched_resources(self) -> dict[str, Sequence[VersionedResource]]:
-        resources = self.get_resources()
-        patched_resources: dict[str, Sequence[VersionedResource]] = {}
-        for provider_name, provider in self.providers.items():
-            patched_resources[provider.get_provider_name()] = [resource for resource in resources[provider_name] if resource.status == ResourceStatus.PATCHED]
-        return patched_resources
+        self.get_resources()
+        return self._get_resources_by_category(ResourceCategory.PATCHED)
 
     def get_upgradable_resources(self, disable_cache: bool = False) -> dict[str, Sequence[VersionedResource]]:
-        upgradable_resources: dict[str, Sequence[VersionedResource]] = {}
-        resources = self.get_resources(disable_cache)
-        for provider_name, provider in self.providers.items():
-            upgradable_resources[provider.get_provider_name()] = [resource for resource in resources[provider.get_provider_name()] if not resource.check_if_up_to_date()]
-        return upgradable_resources
+        self.get_resources(disable_cache)
+        return self._get_resources_by_category(ResourceCategory.UPGRADABLE)
 
     def check_if_upgrades_available(self, disable_cache: bool = False) -> bool:
-        upgradable_resources = self.get_upgradable_resources(disable_cache)
-        for provider_name, provider in self.providers.items():
-            if len(upgradable_resources[provider.get_provider_name()]) > 0:
-                return True
-        return False
+        self.get_resources(disable_cache)
+        return any(self._status_index.count(provider_name, ResourceCategory.UPGRADABLE) > 0 for provider_name in self.providers)
+
+    def _get_resources_by_category(self, category: str) -> dict[str, Sequence[VersionedResource]]:
+        return {provider_name: self._status_index.get_resources(provider_name, category) for provider_name in self.providers}
 
     def upgrade_resources(self) -> bool:
         if self._resource_cache is None:
@@ -75,22 +96,100 @@ class ProviderHandler:
             log.info("No upgrades available.")
             return False
         upgradable_resources = self.get_upgradable_resources()
-        for provider_name, resources in upgradable_resources.items():
-            for resource in progress.track(resources, description=f"Upgrading resources for Provider {self.providers[provider_name].get_provider_display_name()}..."):
-                try:
-                    resource = self.providers[provider_name].patch_resource(resource)
-                except Exception as e:
-                    log.error(f"Error patching resource '{resource.name}': {e}")
-                    resource.set_patch_error()
-                    continue
-                resource.set_patched()
-                if self.repo is not None:
-                    log.debug(f"Commiting file: {resource.source_file.absolute().as_posix()} .")
-                    self.repo.index.add(resource.source_file.absolute().as_posix())
-                    self.repo.index.commit(f"Bump {resource.resource_name} '{resource.name}' from version '{resource.current_version}' to '{resource.newest_version}'.")
-
+        try:
+            if self.repo is None:
+                self._patch_resources(upgradable_resources)
+                return True
+            waves = self._get_commit_waves(upgradable_resources)
+            log.debug(f"Patching and committing resources in {len(waves)} waves with commit strategy '{self.commit_strategy}'.")
+            for wave in progress.track(waves, description="Upgrading resources...", disable=len(waves) == 1):
+                wave_resources: dict[str, list[VersionedResource]] = {}
+                for commit_resources in wave:
+                    for provider_name, provider_resources in commit_resources.items():
+                        wave_resources.setdefault(provider_name, []).extend(provider_resources)
+                self._patch_resources(wave_resources, show_progress=len(waves) == 1)
+                # Git is only touched after all workers of the wave are done, the index must not be modified concurrently.
+                for commit_resources in wave:
+                    self._commit_resources(self.repo, [resource for provider_resources in commit_resources.values() for resource in provider_resources])
+        finally:
+            # The status of the patched resources changed, even if patching was aborted.
+            self._status_index.refresh()
         return True
 
+    def _get_commit_waves(self, resources: dict[str, Sequence[VersionedResource]]) -> list[list[dict[str, list[VersionedResource]]]]:
+        # Commits which share a file are patched in separate waves, so every commit only contains its own bumps.
+        # Commits of one wave never share files, all their files are patched in parallel before the commits of the wave are created.
+        waves: list[list[dict[str, list[VersionedResource]]]] = []
+        file_waves: dict[Path, int] = {}
+        for commit_resources in self._get_commit_groups(resources):
+            files = {resource.source_file.absolute() for provider_resources in commit_resources.values() for resource in provider_resources}
+            # A commit follows all earlier commits of its files, otherwise the earliest wave is used.
+            wave_index = max((file_waves[file] + 1 for file in files if file in file_waves), default=0)
+            if wave_index == len(waves):
+                waves.append([])
+            waves[wave_index].append(commit_resources)
+            for file in files:
+                file_waves[file] = wave_index
+        return waves
+
+    def _get_commit_groups(self, resources: dict[str, Sequence[VersionedResource]]) -> list[dict[str, list[VersionedResource]]]:
+        # Resources of one commit by provider, in the order of the resources.
+        commit_groups: dict[str, dict[str, list[VersionedResource]]] = {}
+        for provider_name, provider_resources in resources.items():
+            for i, resource in enumerate(provider_resources):
+                if self.commit_strategy == CommitStrategy.RESOURCE:
+                    key = f"{provider_name}/{i}"
+                elif self.commit_strategy == CommitStrategy.FILE:
+                    key = resource.source_file.absolute().as_posix()
+                elif self.commit_strategy == CommitStrategy.PROVIDER:
+                    key = provider_name
+                else:
+                    key = CommitStrategy.RUN
+                commit_groups.setdefault(key, {}).setdefault(provider_name, []).append(resource)
+        return list(commit_groups.values())
+
+    def _commit_resources(self, repo: "Repo", resources: Sequence[VersionedResource]):
+        patched_resources = [resource for resource in resources if resource.status == ResourceStatus.PATCHED]
+        if len(patched_resources) == 0:
+            log.debug("No patched resources to commit.")
+            return
+        files = list(dict.fromkeys(resource.source_file.absolute().as_posix() for resource in patched_resources))
+        log.debug(f"Commiting files: {', '.join(files)} .")
+        repo.index.add(files)
+        repo.index.commit(self._get_commit_message(patched_resources))
+
+    def _get_commit_message(self, resources: Sequence[VersionedResource]) -> str:
+        messages = [f"Bump {resource.resource_name} '{resource.name}' from version '{resource.current_version}' to '{resource.newest_version}'." for resource in resources]
+        if len(messages) == 1:
+            return messages[0]
+        files = {resource.source_file.absolute() for resource in resources}
+        subject = f"Bump {len(resources)} resources in {len(files)} files."
+        if len(files) == 1:
+            subject = f"Bump {len(resources)} resources in '{resources[0].source_file.name}'."
+        return "\n".join([subject, "", *messages])
+
+    def _patch_resources(self, resources: dict[str, Sequence[VersionedResource]], show_progress: bool = True):
+        # Every job patches all resources of one file, so edits of the same file never run concurrently.
+        file_jobs: dict[Path, dict[str, list[VersionedResource]]] = {}
+        for provider_name, provider_resources in resources.items():
+            for resource in provider_resources:
+                file_jobs.setdefault(resource.source_file.absolute(), {}).setdefault(provider_name, []).append(resource)
+        log.debug(f"Patching {len(file_jobs)} files with {self.patch_workers} workers.")
+
+        with ThreadPoolExecutor(max_workers=self.patch_workers) as executor:
+            futures = [executor.submit(self._patch_file, file, provider_resources) for file, provider_resources in file_jobs.items()]
+            for future in progress.track(as_completed(futures), total=len(futures), description="Upgrading resources...", disable=not show_progress):
+                future.result()
+
+    def _patch_file(self, file: Path, resources: dict[str, list[VersionedResource]]):
+        for provider_name, provider_resources in resources.items():
+            try:
+                self.providers[provider_name].patch_resources(provider_resources)
+            except Exception as e:
+                log.error(f"Error patching resources of provider {self.providers[provider_name].get_provider_display_name()} in file '{file}': {e}")
+                for resource in provider_resources:
+                    resource.set_patch_error()
+
     def print_resource_table(self, only_upgradable: bool, disable_cache: bool = False):
         provider_resources = self.get_resources(disable_cache)
         if len([resource for provider in provider_resources for resource in provider_resources[provider]]) == 0:
@@ -113,22 +212,22 @@ class ProviderHandler:
     def _get_statistics(self, disable_cache: bool = False) -> Statistics:
         resources = self.get_resources(disable_cache)
         provider_statistics: dict[str, ProviderStatistics] = {}
+        for provider_name in self.providers:
+            provider_statistics[provider_name] = self._get_provider_statistics(provider_name, resources[provider_name])
+        return Statistics.from_providers(provider_statistics)
 
-        for provider_name, provider in self.providers.items():
-            provider_resources = resources[provider.get_provider_name()]
-            provider_statistics[provider_name] = ProviderStatistics(
-                errors=len([resource for resource in provider_resources if resource.status == ResourceStatus.PATCH_ERROR]),
-                resources_patched=len([resource for resource in provider_resources if resource.status == ResourceStatus.PATCHED]),
-                resources_pending_update=len([resource for resource in provider_resources if resource.check_if_up_to_date() is False]),
-                total_resources=len(provider_resources),
-                resources=provider_resources,
-            )
-        return Statistics(
-            errors=sum([provider_statistics[provider].errors for provider in provider_statistics]),
-            resources_patched=sum([provider_statistics[provider].resources_patched for provider in provider_statistics]),
-            resources_pending_update=sum([provider_statistics[provider].resources_pending_update for provider in provider_statistics]),
-            total_resources=sum([provider_statistics[provider].total_resources for provider in provider_statistics]),
-            providers=provider_statistics,
+    def _get_provider_statistics(self, provider_name: str, resources: Sequence[VersionedResource]) -> ProviderStatistics:
+        if not self._status_index.has_provider(provider_name):
+            log.debug(f"No status index for provider {provider_name}, counting resources.")
+            return ProviderStatistics.from_resources(resources)
+        # The counters of the status index are always up to date, no need to look at the resources.
+        counts = self._status_index.get_counts(provider_name)
+        return ProviderStatistics(
+            errors=counts[ResourceCategory.PATCH_ERROR],
+            resources_patched=counts[ResourceCategory.PATCHED],
+            resources_pending_update=counts[ResourceCategory.UPGRADABLE],
+            total_resources=len(resources),
+            resources=resources,
         )
 
     def dump_statistics(self, disable_cache: bool = False):
@@ -144,15 +243,15 @@ class ProviderHandler:
         table = self._get_statistics(disable_cache).get_rich_table()
         self.console.print(table)
 
-    def get_markdown_table_for_changed_resources(self) -> dict[str, MarkdownTableWriter]:
+    def get_markdown_table_for_changed_resources(self) -> dict[str, "MarkdownTableWriter"]:
         if self._resource_cache is None:
             raise Exception("No resources found. Run get_resources() first.")
 
         markdown_tables = {}
         for provider_name, provider in self.providers.items():
-            changed_resources = [
-                resource for resource in self._resource_cache[provider_name] if resource.status == ResourceStatus.PATCHED or resource.status == ResourceStatus.PATCH_ERROR
-            ]
+            if not self._status_index.has_provider(provider_name):
+                raise Exception("No resources found. Run get_resources() first.")
+            changed_resources = self._status_index.get_resources(provider_name, ResourceCategory.PATCHED, ResourceCategory.PATCH_ERROR)
             if len(changed_resources) == 0:
                 log.debug(f"No changed resources found for provider {provider_name}. Skipping.")
                 continue
@@ -173,6 +272,7 @@ class ProviderHandler:
                 found_resource = found_resources[0]
                 found_resource.set_patched()
                 self._resource_cache[provider_name][i] = found_resource  # type: ignore
+            self._status_index.set_resources(provider_name, self._resource_cache[provider_name])
 
     def get_release_notes(self, resources: dict[str, Sequence[VersionedResource]]) -> dict[str, Sequence[VersionedResourceReleaseNotes]]:
         release_notes: dict[str, Sequence[VersionedResourceReleaseNotes]] = {}
@@ -180,14 +280,27 @@ class ProviderHandler:
             provider_release_notes: list[VersionedResourceReleaseNotes] = []
             patched_resources = [resource for resource in resources[provider_name] if resource.status == ResourceStatus.PATCHED]
             grouped_resources = provider.get_grouped_by_identifier(patched_resources)
-            for identifier in progress.track(grouped_resources, description=f"Getting release notes for resources of Provider {provider.get_provider_display_name()}..."):
-                identifier_resources = grouped_resources[identifier]
-                if identifier_resources[0].status == ResourceStatus.NO_VERSION_FOUND:
-                    log.debug(f"Skipping resource '{identifier_resources[0].name}' since no version was found.")
+            identifier_resources: list[Sequence[VersionedResource]] = []
+            for identifier in grouped_resources:
+                if grouped_resources[identifier][0].status == ResourceStatus.NO_VERSION_FOUND:
+                    log.debug(f"Skipping resource '{grouped_resources[identifier][0].name}' since no version was found.")
                     continue
-                resource_release_note = provider.get_resource_release_notes(grouped_resources[identifier][0])
+                identifier_resources.append(grouped_resources[identifier])
+            log.info(f"Getting release notes for {len(identifier_resources)} resources of Provider {provider.get_provider_display_name()}...")
+            # The provider fetches the release notes of all resources at once.
+            resources_release_notes = provider.get_resources_release_notes([self._get_release_notes_resource(group) for group in identifier_resources], self.release_notes_mode)
+            for group, resource_release_note in zip(identifier_resources, resources_release_notes):
                 if resource_release_note is not None:
-                    resource_release_note.resources = grouped_resources[identifier]
+                    resource_release_note.resources = group
                     provider_release_notes.append(resource_release_note)
             release_notes[provider_name] = provider_release_notes
         return release_notes
+
+    def _get_release_notes_resource(self, group: Sequence[VersionedResource]) -> VersionedResource:
+        # Resources of a group can be on different versions, in range mode the release notes start at the lowest current version of the group.
+        if self.release_notes_mode != ReleaseNotesMode.RANGE:
+            return group[0]
+        current_versions = [(version, resource) for resource in group if (version := parse_version(resource.current_version.strip("~>").strip())) is not None]
+        if len(current_versions) == 0:
+            return group[0]
+        return min(current_versions, key=lambda current_version: current_version[0])[1]
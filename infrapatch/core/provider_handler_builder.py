@@ -1,21 +1,28 @@
 import logging as log
 from pathlib import Path
-from typing import Self, Union
+from typing import TYPE_CHECKING, Self, Sequence, Union
 
-from github import Github
 from infrapatch.core.providers.terraform.terraform_provider_provider import TerraformProviderProvider
 
 from infrapatch.core.providers.terraform.terraform_module_provider import TerraformModuleProvider
-from git import Repo
 from rich.console import Console
 
 import infrapatch.core.constants as const
 import infrapatch.core.constants as cs
+from infrapatch.core.models.commit_strategy import CommitStrategy
+from infrapatch.core.models.release_notes_mode import ReleaseNotesMode
 from infrapatch.core.provider_handler import ProviderHandler
+from infrapatch.core.utils.git import Git
+from infrapatch.core.utils.github_release_notes import GithubReleaseNotesFetcher
 from infrapatch.core.utils.options_processor import OptionsProcessor
 from infrapatch.core.utils.terraform.hcl_edit_cli import HclEditCli
 from infrapatch.core.utils.terraform.hcl_handler import HclHandler
+from infrapatch.core.utils.terraform.registry_cache import RegistryResponseCache
 from infrapatch.core.utils.terraform.registry_handler import RegistryHandler
+from infrapatch.core.utils.terraform.registry_transport import get_default_registry_transport
+
+if TYPE_CHECKING:
+    from github import Github
 
 
 class ProviderHandlerBuilder:
@@ -23,45 +30,140 @@ class ProviderHandlerBuilder:
         self.providers = []
         self.working_directory = working_directory
         self.registry_handler = None
+        self.response_cache: Union[RegistryResponseCache, None] = None
+        self.registry_workers = cs.DEFAULT_REGISTRY_WORKERS
+        self.patch_workers = cs.DEFAULT_PATCH_WORKERS
+        self.commit_strategy = CommitStrategy.RESOURCE
+        self.release_notes_mode = ReleaseNotesMode.LATEST
         self.git_repo = None
-        pass
+        self.options_processor = OptionsProcessor()
+        self.scan_manifest_file: Union[Path, None] = None
+        self.changed_files: Union[Sequence[Path], None] = None
+        self.changed_since_ref: Union[str, None] = None
+        self._hcl_edit_cli: Union[HclEditCli, None] = None
+        self._hcl_handler: Union[HclHandler, None] = None
+
+    def _get_hcl_edit_cli(self) -> HclEditCli:
+        # The binary path is only resolved once per run.
+        if self._hcl_edit_cli is None:
+            self._hcl_edit_cli = HclEditCli()
+        return self._hcl_edit_cli
 
-    def add_terraform_registry_configuration(self, default_registry_domain: str, credentials: dict[str, str]) -> Self:
+    def get_hcl_handler(self) -> HclHandler:
+        # Both terraform providers and the credentials loader share one handler, so every file is only read and parsed once per run.
+        if self._hcl_handler is None:
+            self._hcl_handler = HclHandler(
+                self._get_hcl_edit_cli(), options_processor=self.options_processor, scan_manifest_file=self.scan_manifest_file, changed_files=self.changed_files
+            )
+        return self._hcl_handler
+
+    def add_terraform_registry_configuration(
+        self,
+        default_registry_domain: str,
+        credentials: dict[str, str],
+        registry_workers: int = cs.DEFAULT_REGISTRY_WORKERS,
+        registry_cache_path: Union[Path, None] = None,
+    ) -> Self:
         log.debug(f"Using {default_registry_domain} as default registry domain for Terraform.")
         log.debug(f"Found {len(credentials)} credentials for Terraform registries.")
-        self.registry_handler = RegistryHandler(default_registry_domain, credentials)
+        log.debug(f"Using {registry_workers} parallel workers for registry lookups.")
+        if registry_cache_path is not None:
+            log.debug(f"Using persistent registry cache at {registry_cache_path.absolute().as_posix()}.")
+            self.response_cache = RegistryResponseCache(registry_cache_path)
+        # Allow one pooled connection per registry worker, so lookups never wait for a free connection.
+        transport = get_default_registry_transport(max_connections_per_host=registry_workers)
+        self.registry_handler = RegistryHandler(default_registry_domain, credentials, self.response_cache, transport)
+        self.registry_workers = registry_workers
         return self
 
-    def with_terraform_module_provider(self, github: Union[Github, None] = None) -> Self:
+    def with_terraform_module_provider(self, github: Union["Github", None] = None) -> Self:
         if self.registry_handler is None:
             raise Exception("No registry configuration added to ProviderHandlerBuilder.")
         log.debug("Adding TerraformModuleProvider to ProviderHandlerBuilder.")
-        if github is None:
-            github = Github()
-        tf_module_provider = TerraformModuleProvider(HclEditCli(), self.registry_handler, HclHandler(HclEditCli()), self.working_directory, github)
+        # Without a client, the fetcher creates one when release notes are requested for the first time.
+        # Release notes are cached next to the registry responses.
+        release_notes_fetcher = GithubReleaseNotesFetcher(github, self.response_cache)
+        tf_module_provider = TerraformModuleProvider(
+            self._get_hcl_edit_cli(), self.registry_handler, self.get_hcl_handler(), self.working_directory, github, self.registry_workers, release_notes_fetcher
+        )
         self.providers.append(tf_module_provider)
         return self
 
-    def with_terraform_provider_provider(self, github: Union[Github, None] = None) -> Self:
+    def with_terraform_provider_provider(self, github: Union["Github", None] = None) -> Self:
         if self.registry_handler is None:
             raise Exception("No registry configuration added to ProviderHandlerBuilder.")
         log.debug("Adding TerraformModuleProvider to ProviderHandlerBuilder.")
-        if github is None:
-            github = Github()
-        tf_module_provider = TerraformProviderProvider(HclEditCli(), self.registry_handler, HclHandler(HclEditCli()), self.working_directory, github)
+        # Without a client, the fetcher creates one when release notes are requested for the first time.
+        # Release notes are cached next to the registry responses.
+        release_notes_fetcher = GithubReleaseNotesFetcher(github, self.response_cache)
+        tf_module_provider = TerraformProviderProvider(
+            self._get_hcl_edit_cli(), self.registry_handler, self.get_hcl_handler(), self.working_directory, github, self.registry_workers, release_notes_fetcher
+        )
         self.providers.append(tf_module_provider)
         return self
 
-    def with_git_integration(self, git_working_directory: Path) -> Self:
-        log.debug("Enabling Git integration.")
+    def with_incremental_scan(self) -> Self:
+        if self._hcl_handler is not None:
+            raise Exception("Incremental scan must be enabled before adding Terraform providers to ProviderHandlerBuilder.")
+        self.scan_manifest_file = self.working_directory.joinpath(f"{cs.APP_NAME}_Scan_Manifest.json")
+        log.debug(f"Enabling incremental scan with manifest {self.scan_manifest_file.absolute().as_posix()}.")
+        return self
+
+    def with_changed_files_since(self, base_ref: str) -> Self:
+        if self._hcl_handler is not None:
+            raise Exception("Changed files must be set before adding Terraform providers to ProviderHandlerBuilder.")
+        # Files which did not change are resolved from the manifest of the previous scan.
+        self.with_incremental_scan()
+        self.changed_since_ref = base_ref
+        self.changed_files = Git(self.working_directory).get_changed_files(base_ref)
+        log.debug(f"Limiting scan to {len(self.changed_files)} files changed since {base_ref}.")
+        return self
+
+    def update_changed_files(self):
+        # Needs to be called after every checkout, files changed by the checked out commits are not part of the previous changes.
+        if self.changed_since_ref is None:
+            return
+        changed_files = Git(self.working_directory).get_changed_files(self.changed_since_ref)
+        log.debug(f"Found {len(changed_files)} files changed since {self.changed_since_ref} after checkout.")
+        self.changed_files = sorted({*(self.changed_files or []), *changed_files})
+        if self._hcl_handler is not None:
+            self._hcl_handler.add_changed_files(changed_files)
+
+    def with_patch_workers(self, patch_workers: int) -> Self:
+        log.debug(f"Using {patch_workers} parallel workers for patching files.")
+        self.patch_workers = patch_workers
+        return self
+
+    def with_release_notes_mode(self, release_notes_mode: str) -> Self:
+        log.debug(f"Using release notes mode '{release_notes_mode}'.")
+        self.release_notes_mode = release_notes_mode
+        return self
+
+    def with_git_integration(self, git_working_directory: Path, commit_strategy: str = CommitStrategy.RESOURCE) -> Self:
+        log.debug(f"Enabling Git integration with commit strategy '{commit_strategy}'.")
+        from git import Repo
+
         self.git_integration = True
         self.git_repo = Repo(git_working_directory)
+        self.commit_strategy = commit_strategy
         return self
 
+    def close(self):
+        # Called when the run is done, the registry connections are kept open until then.
+        if self.registry_handler is not None:
+            self.registry_handler.close()
+
     def build(self) -> ProviderHandler:
         if len(self.providers) == 0:
             raise Exception("No providers added to ProviderHandlerBuilder.")
         statistics_file = self.working_directory.joinpath(f"{cs.APP_NAME}_Statistics.json")
         return ProviderHandler(
-            providers=self.providers, console=Console(width=const.CLI_WIDTH), options_processor=OptionsProcessor(), statistics_file=statistics_file, repo=self.git_repo
+            providers=self.providers,
+            console=Console(width=const.CLI_WIDTH),
+            options_processor=self.options_processor,
+            statistics_file=statistics_file,
+            repo=self.git_repo,
+            patch_workers=self.patch_workers,
+            commit_strategy=self.commit_strategy,
+            release_notes_mode=self.release_notes_mode,
         )
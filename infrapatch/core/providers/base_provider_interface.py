@@ -1,10 +1,13 @@
-from typing import Protocol, Sequence, Union
+from typing import TYPE_CHECKING, Hashable, Protocol, Sequence, Union
 
-from pytablewriter import MarkdownTableWriter
 from rich.table import Table
 
+from infrapatch.core.models.release_notes_mode import ReleaseNotesMode
 from infrapatch.core.models.versioned_resource import VersionedResource, VersionedResourceReleaseNotes
 
+if TYPE_CHECKING:
+    from pytablewriter import MarkdownTableWriter
+
 
 class BaseProviderInterface(Protocol):
     def get_provider_name(self) -> str: ...
@@ -15,12 +18,16 @@ class BaseProviderInterface(Protocol):
 
     def patch_resource(self, resource: VersionedResource) -> VersionedResource: ...
 
+    def patch_resources(self, resources: Sequence[VersionedResource]) -> Sequence[VersionedResource]: ...
+
     def get_rich_table(self, resources: Sequence[VersionedResource]) -> Table: ...
 
-    def get_markdown_table(self, resources: Sequence[VersionedResource]) -> MarkdownTableWriter: ...
+    def get_markdown_table(self, resources: Sequence[VersionedResource]) -> "MarkdownTableWriter": ...
 
     def get_resources_as_dict_list(self, resources: Sequence[VersionedResource]): ...
 
     def get_resource_release_notes(self, resource: VersionedResource) -> Union[VersionedResourceReleaseNotes, None]: ...
 
-    def get_grouped_by_identifier(self, resources: Sequence[VersionedResource]) -> dict[str, Sequence[VersionedResource]]: ...
+    def get_resources_release_notes(self, resources: Sequence[VersionedResource], mode: str = ReleaseNotesMode.LATEST) -> Sequence[Union[VersionedResourceReleaseNotes, None]]: ...
+
+    def get_grouped_by_identifier(self, resources: Sequence[VersionedResource]) -> dict[Hashable, Sequence[VersionedResource]]: ...
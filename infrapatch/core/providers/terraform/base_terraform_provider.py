@@ -1,30 +1,50 @@
 import logging as log
 from abc import abstractmethod
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
-from typing import Any, Sequence, Union
+from typing import TYPE_CHECKING, Any, Hashable, Sequence, Union
 
-from github import Github
-from pytablewriter import MarkdownTableWriter
 from rich import progress
 from rich.table import Table
 
+import infrapatch.core.constants as cs
+from infrapatch.core.models.release_notes_mode import ReleaseNotesMode
 from infrapatch.core.models.versioned_resource import VersionedResource, VersionedResourceReleaseNotes
 from infrapatch.core.models.versioned_terraform_resources import VersionedTerraformResource
 from infrapatch.core.providers.base_provider_interface import BaseProviderInterface
+from infrapatch.core.utils.github_release_notes import GithubReleaseNotesFetcher, ReleaseNotesFetcherInterface, limit_release_notes, merge_release_notes
 from infrapatch.core.utils.terraform.hcl_edit_cli import HclEditCliInterface
 from infrapatch.core.utils.terraform.hcl_handler import HclHandlerInterface
 from infrapatch.core.utils.terraform.registry_handler import RegistryHandlerInterface
+from infrapatch.core.utils.version_selection import parse_version
+
+if TYPE_CHECKING:
+    from github import Github
+    from pytablewriter import MarkdownTableWriter
 
 
 class TerraformProvider(BaseProviderInterface):
     def __init__(
-        self, hcledit: HclEditCliInterface, registry_handler: RegistryHandlerInterface, hcl_handler: HclHandlerInterface, project_root: Path, github: Union[Github, None]
+        self,
+        hcledit: HclEditCliInterface,
+        registry_handler: RegistryHandlerInterface,
+        hcl_handler: HclHandlerInterface,
+        project_root: Path,
+        github: Union["Github", None],
+        registry_workers: int = cs.DEFAULT_REGISTRY_WORKERS,
+        release_notes_fetcher: Union[ReleaseNotesFetcherInterface, None] = None,
     ) -> None:
+        if registry_workers < 1:
+            raise Exception(f"Registry workers must be at least 1, got {registry_workers}.")
         self.hcledit = hcledit
         self.registry_handler = registry_handler
         self.hcl_handler = hcl_handler
         self.project_root = project_root
+        self.registry_workers = registry_workers
         self._github = github
+        if release_notes_fetcher is None and github is not None:
+            release_notes_fetcher = GithubReleaseNotesFetcher(github)
+        self._release_notes_fetcher = release_notes_fetcher
 
     @abstractmethod
     def get_provider_name(self) -> str:
@@ -36,28 +56,52 @@ class TerraformProvider(BaseProviderInterface):
 
     def get_resources(self) -> Sequence[VersionedResource]:
         log.info(f"Searching for .tf files in {self.project_root.absolute().as_posix()} ...")
-        terraform_files = self.hcl_handler.get_all_terraform_files(self.project_root)
-        if len(terraform_files) == 0:
-            return []
-
-        resources = []
-        for terraform_file in progress.track(terraform_files, description=f"Parsing .tf files for {self.get_provider_display_name()}..."):
-            if self.get_provider_name() == "terraform_modules":
-                resources.extend(self.hcl_handler.get_terraform_resources_from_file(terraform_file, get_modules=True, get_providers=False))
-
-            elif self.get_provider_name() == "terraform_providers":
-                resources.extend(self.hcl_handler.get_terraform_resources_from_file(terraform_file, get_modules=False, get_providers=True))
-
-            else:
-                raise Exception(f"Provider name '{self.get_provider_name()}' is not implemented.")
-
-        for resource in progress.track(resources, description=f"Getting newest resource versions for Provider {self.get_provider_display_name()}..."):
-            resource.newest_version = self.registry_handler.get_newest_version(resource)
-            source = self.registry_handler.get_source(resource)
-            if source is not None and "github.com" in source:
-                resource.github_repo = source
+        # Discovery, parsing and registry lookups are chained lazily, so lookups start while files are still being searched and parsed.
+        terraform_files = self.hcl_handler.iter_all_terraform_files(self.project_root)
+        if self.get_provider_name() == "terraform_modules":
+            file_resources = self.hcl_handler.iter_terraform_resources_from_files(terraform_files, get_modules=True, get_providers=False)
+        elif self.get_provider_name() == "terraform_providers":
+            file_resources = self.hcl_handler.iter_terraform_resources_from_files(terraform_files, get_modules=False, get_providers=True)
+        else:
+            raise Exception(f"Provider name '{self.get_provider_name()}' is not implemented.")
+
+        resources: list[VersionedTerraformResource] = []
+        # Resources sharing the same registry and identifier only need to be looked up once.
+        grouped_resources: dict[tuple[Union[str, None], Union[str, None]], list[VersionedTerraformResource]] = {}
+        futures: dict[tuple[Union[str, None], Union[str, None]], Future[tuple[Union[str, None], Union[str, None]]]] = {}
+        with ThreadPoolExecutor(max_workers=self.registry_workers) as executor:
+            try:
+                for terraform_file_resources in progress.track(file_resources, description=f"Parsing .tf files for {self.get_provider_display_name()}..."):
+                    for resource in terraform_file_resources:
+                        key = (resource.base_domain, resource.identifier)
+                        if key not in grouped_resources:
+                            grouped_resources[key] = []
+                            futures[key] = executor.submit(self._resolve_resource, resource)
+                        grouped_resources[key].append(resource)
+                        resources.append(resource)
+                self.hcl_handler.save_scan_manifest()
+                log.debug(f"Resolving {len(grouped_resources)} unique sources for {len(resources)} resources with {self.registry_workers} workers.")
+
+                # Results are consumed in input order, so the first failing resource is always the one raised.
+                for key in progress.track(futures, description=f"Getting newest resource versions for Provider {self.get_provider_display_name()}..."):
+                    newest_version, source = futures[key].result()
+                    for resource in grouped_resources[key]:
+                        resource.newest_version = newest_version
+                        if source is not None and "github.com" in source:
+                            resource.github_repo = source
+            except BaseException:
+                for future in futures.values():
+                    future.cancel()
+                raise
         return resources
 
+    def _resolve_resource(self, resource: VersionedTerraformResource) -> tuple[Union[str, None], Union[str, None]]:
+        newest_version = self.registry_handler.get_newest_version(resource)
+        # get_source needs the newest version set on the resource to build the version endpoint.
+        resource.newest_version = newest_version
+        source = self.registry_handler.get_source(resource)
+        return newest_version, source
+
     def patch_resource(self, resource: VersionedTerraformResource) -> VersionedTerraformResource:
         if resource.check_if_up_to_date() is True:
             log.debug(f"Resource '{resource.name}' is already up to date.")
@@ -65,6 +109,24 @@ class TerraformProvider(BaseProviderInterface):
         self.hcl_handler.bump_resource_version(resource)
         return resource
 
+    def patch_resources(self, resources: Sequence[VersionedTerraformResource]) -> Sequence[VersionedTerraformResource]:
+        # Sets the status of every resource, a failing resource does not stop the others from being patched.
+        file_resources: dict[Path, list[VersionedTerraformResource]] = {}
+        for resource in resources:
+            if resource.check_if_up_to_date() is True:
+                log.debug(f"Resource '{resource.name}' is already up to date.")
+                continue
+            file_resources.setdefault(resource.source_file, []).append(resource)
+
+        for file in file_resources:
+            for result in self.hcl_handler.bump_resource_versions(file_resources[file]):
+                if result.error is not None:
+                    log.error(f"Error patching resource '{result.resource.name}': {result.error}")
+                    result.resource.set_patch_error()
+                    continue
+                result.resource.set_patched()
+        return resources
+
     def get_rich_table(self, resources: Sequence[VersionedTerraformResource]) -> Table:
         table = Table(show_header=True, title=self.get_provider_display_name(), expand=True)
         table.add_column("Name", overflow="fold")
@@ -76,7 +138,9 @@ class TerraformProvider(BaseProviderInterface):
             table.add_row(resource.name, resource.source, resource.current_version, resource.newest_version, resource.status)
         return table
 
-    def get_markdown_table(self, resources: Sequence[VersionedTerraformResource]) -> MarkdownTableWriter:
+    def get_markdown_table(self, resources: Sequence[VersionedTerraformResource]) -> "MarkdownTableWriter":
+        from pytablewriter import MarkdownTableWriter
+
         dict_list = []
         for resource in resources:
             dict_element = {
@@ -97,26 +161,53 @@ class TerraformProvider(BaseProviderInterface):
         return [resource.to_dict() for resource in resources]
 
     def get_resource_release_notes(self, resource: VersionedTerraformResource) -> Union[VersionedResourceReleaseNotes, None]:
-        if resource.newest_version is None:
-            raise Exception(f"Newest version of resource '{resource.name}' is not set.")
-        if self._github is None:
+        return self.get_resources_release_notes([resource])[0]
+
+    def get_resources_release_notes(
+        self, resources: Sequence[VersionedTerraformResource], mode: str = ReleaseNotesMode.LATEST
+    ) -> Sequence[Union[VersionedResourceReleaseNotes, None]]:
+        if self._release_notes_fetcher is None:
             raise Exception("Github integration is not enabled.")
-        if resource.github_repo is None:
-            log.debug(f"Resource '{resource.name}' has no github repo set, skipping release notes.")
-            return None
-        try:
-            repo = self._github.get_repo(resource.github_repo)
-            release_notes = repo.get_release(f"v{resource.newest_version_base}").body
-        except Exception as e:
-            log.warning(f"Could not get release notes from repo '{resource.github_repo}' for version '{resource.newest_version}': {e}")
-            return None
-        return VersionedResourceReleaseNotes(resources=[resource], body=release_notes, name=resource.source, version=resource.newest_version)
-
-    def get_grouped_by_identifier(self, resources: Sequence[VersionedTerraformResource]) -> dict[str, Sequence[VersionedTerraformResource]]:
-        identifiers: dict[str, Sequence[VersionedTerraformResource]] = {}
-        for resource in resources:
-            if resource.source not in identifiers:
-                identifiers[resource.source] = [resource]
+        # Position of the resource and its release, resources without a plain current version fall back to the newest release only.
+        latest_releases: list[tuple[int, tuple[str, str]]] = []
+        release_ranges: list[tuple[int, tuple[str, str, str]]] = []
+        for i, resource in enumerate(resources):
+            if resource.newest_version is None:
+                raise Exception(f"Newest version of resource '{resource.name}' is not set.")
+            if resource.github_repo is None:
+                log.debug(f"Resource '{resource.name}' has no github repo set, skipping release notes.")
                 continue
-            list(identifiers[resource.source]).append(resource)
-        return identifiers
+            current_version = resource.current_version.strip("~>").strip()
+            if mode == ReleaseNotesMode.RANGE and parse_version(current_version) is not None:
+                release_ranges.append((i, (resource.github_repo, current_version, resource.newest_version_base)))
+            else:
+                latest_releases.append((i, (resource.github_repo, resource.newest_version_base)))
+
+        # The releases of all resources are fetched concurrently.
+        bodies: dict[int, Union[str, None]] = {}
+        if len(latest_releases) > 0:
+            latest_bodies = self._release_notes_fetcher.get_release_bodies([release for _, release in latest_releases])
+            for (i, _), body in zip(latest_releases, latest_bodies):
+                bodies[i] = body
+        if len(release_ranges) > 0:
+            range_releases = self._release_notes_fetcher.get_release_ranges([release_range for _, release_range in release_ranges])
+            for (i, _), releases in zip(release_ranges, range_releases):
+                bodies[i] = merge_release_notes(releases) if len(releases) > 0 else None
+
+        release_notes: list[Union[VersionedResourceReleaseNotes, None]] = []
+        for i, resource in enumerate(resources):
+            body = bodies.get(i)
+            if body is None or resource.github_repo is None:
+                release_notes.append(None)
+                continue
+            body = limit_release_notes(body, resource.github_repo)
+            release_notes.append(VersionedResourceReleaseNotes(resources=[resource], body=body, name=resource.source, version=resource.newest_version))
+        return release_notes
+
+    def get_grouped_by_identifier(self, resources: Sequence[VersionedTerraformResource]) -> dict[Hashable, Sequence[VersionedTerraformResource]]:
+        # Resources of the same source updated to the same version share their release notes.
+        groups: dict[Hashable, list[VersionedTerraformResource]] = {}
+        for resource in resources:
+            groups.setdefault((resource.base_domain, resource.identifier, resource.newest_version), []).append(resource)
+        grouped_resources: dict[Hashable, Sequence[VersionedTerraformResource]] = {key: group for key, group in groups.items()}
+        return grouped_resources
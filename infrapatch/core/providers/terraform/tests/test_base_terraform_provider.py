@@ -0,0 +1,181 @@
+import threading
+from pathlib import Path
+from typing import Union
+from unittest.mock import MagicMock
+
+import pytest
+
+from infrapatch.conftest import get_module
+from infrapatch.core.models.release_notes_mode import ReleaseNotesMode
+from infrapatch.core.models.versioned_resource import ResourceStatus
+from infrapatch.core.models.versioned_terraform_resources import TerraformModule
+from infrapatch.core.providers.terraform.terraform_module_provider import TerraformModuleProvider
+from infrapatch.core.utils.terraform.hcl_handler import HclPatchResult
+
+
+class FakeRegistryHandler:
+    def __init__(self, versions: dict[str, str], failing_sources: Union[list[str], None] = None):
+        self.versions = versions
+        self.failing_sources = failing_sources if failing_sources is not None else []
+        self.version_calls: list[str] = []
+        self.source_calls: list[str] = []
+        self._lock = threading.Lock()
+
+    def get_newest_version(self, resource):
+        with self._lock:
+            self.version_calls.append(resource.source)
+        if resource.source in self.failing_sources:
+            raise Exception(f"Lookup failed for {resource.source}")
+        return self.versions[resource.source]
+
+    def get_source(self, resource):
+        with self._lock:
+            self.source_calls.append(resource.source)
+        return f"https://github.com/{resource.identifier}"
+
+
+def _get_provider(registry_handler: FakeRegistryHandler, resources: list[TerraformModule], registry_workers: int = 4) -> TerraformModuleProvider:
+    hcl_handler = MagicMock()
+    hcl_handler.iter_all_terraform_files.side_effect = lambda *args, **kwargs: iter([Path("main.tf")])
+    hcl_handler.iter_terraform_resources_from_files.side_effect = lambda *args, **kwargs: iter([resources])
+    return TerraformModuleProvider(MagicMock(), registry_handler, hcl_handler, Path("."), None, registry_workers=registry_workers)
+
+
+def test_get_resources_deduplicates_lookups():
+    resources = [
+        get_module("module1", source="test/module_a/aws"),
+        get_module("module2", source="test/module_b/aws", current_version="2.0.0"),
+        get_module("module3", source="test/module_a/aws", current_version="2.0.0"),
+        get_module("module4", source="test/module_a/aws"),
+    ]
+    registry_handler = FakeRegistryHandler({"test/module_a/aws": "2.0.0", "test/module_b/aws": "2.0.0"})
+    provider = _get_provider(registry_handler, resources)
+
+    found_resources = provider.get_resources()
+
+    assert [resource.name for resource in found_resources] == ["module1", "module2", "module3", "module4"]
+    assert sorted(registry_handler.version_calls) == ["test/module_a/aws", "test/module_b/aws"]
+    assert sorted(registry_handler.source_calls) == ["test/module_a/aws", "test/module_b/aws"]
+    for resource in found_resources:
+        assert resource.newest_version == "2.0.0"
+    assert found_resources[1].github_repo == "test/module_b"
+    assert found_resources[3].github_repo == "test/module_a"
+    assert found_resources[0].status == ResourceStatus.UNPATCHED
+    assert found_resources[1].status == ResourceStatus.UP_TO_DATE
+    assert found_resources[2].status == ResourceStatus.UP_TO_DATE
+
+
+def test_get_resources_raises_first_error_in_input_order():
+    resources = [get_module(f"module{i}", source=f"test/module{i}/aws") for i in range(10)]
+    registry_handler = FakeRegistryHandler({f"test/module{i}/aws": "1.0.0" for i in range(10)}, failing_sources=["test/module3/aws", "test/module7/aws"])
+    provider = _get_provider(registry_handler, resources)
+
+    for _ in range(5):
+        with pytest.raises(Exception, match="test/module3/aws"):
+            provider.get_resources()
+
+
+def test_invalid_registry_workers():
+    with pytest.raises(Exception):
+        _get_provider(FakeRegistryHandler({}), [], registry_workers=0)
+
+
+def test_patch_resources_sets_status_per_resource():
+    resources = [
+        get_module("module1", source="test/module_a/aws"),
+        get_module("module2", source="test/module_b/aws"),
+        get_module("module3", source="test/module_c/aws", current_version="2.0.0"),
+    ]
+    for resource in resources:
+        resource.newest_version = "2.0.0"
+    provider = _get_provider(FakeRegistryHandler({}), resources)
+    provider.hcl_handler.bump_resource_versions.side_effect = lambda file_resources: [
+        HclPatchResult(resource=resource, error=Exception("update failed") if resource.name == "module2" else None) for resource in file_resources
+    ]
+
+    provider.patch_resources(resources)
+
+    # Up to date resources are not passed to the hcl handler
+    provider.hcl_handler.bump_resource_versions.assert_called_once_with(resources[:2])
+    assert [resource.status for resource in resources] == [ResourceStatus.PATCHED, ResourceStatus.PATCH_ERROR, ResourceStatus.UP_TO_DATE]
+
+
+def test_get_resources_starts_lookups_while_parsing():
+    registry_handler = FakeRegistryHandler({"test/module_a/aws": "2.0.0", "test/module_b/aws": "2.0.0"})
+    first_lookup_done = threading.Event()
+    original_get_source = registry_handler.get_source
+
+    def get_source(resource):
+        source = original_get_source(resource)
+        first_lookup_done.set()
+        return source
+
+    registry_handler.get_source = get_source  # type: ignore
+
+    def iter_file_resources(*args, **kwargs):
+        yield [get_module("module1", source="test/module_a/aws")]
+        # The second file is only returned once the lookup of the first one finished
+        assert first_lookup_done.wait(timeout=5)
+        yield [get_module("module2", source="test/module_b/aws")]
+
+    provider = _get_provider(registry_handler, [])
+    provider.hcl_handler.iter_terraform_resources_from_files.side_effect = iter_file_resources
+
+    found_resources = provider.get_resources()
+
+    assert [resource.newest_version for resource in found_resources] == ["2.0.0", "2.0.0"]
+
+
+def test_get_resources_release_notes_in_one_batch():
+    resources = [get_module("module1", source="test/module_a/aws"), get_module("module2", source="test/module_b/aws"), get_module("module3", source="test/module_c/aws")]
+    for resource in resources:
+        resource.newest_version = "2.0.0"
+    resources[0].github_repo = "https://github.com/test/module_a"
+    resources[2].github_repo = "https://github.com/test/module_c"
+    release_notes_fetcher = MagicMock()
+    release_notes_fetcher.get_release_bodies.return_value = ["notes a", None]
+    provider = TerraformModuleProvider(MagicMock(), MagicMock(), MagicMock(), Path("."), None, release_notes_fetcher=release_notes_fetcher)
+
+    release_notes = provider.get_resources_release_notes(resources)
+
+    release_notes_fetcher.get_release_bodies.assert_called_once_with([("test/module_a", "2.0.0"), ("test/module_c", "2.0.0")])
+    assert release_notes[0] is not None and release_notes[0].body == "notes a" and release_notes[0].version == "2.0.0"
+    assert release_notes[1] is None
+    assert release_notes[2] is None
+
+
+def test_get_resources_release_notes_for_version_ranges():
+    resources = [get_module("module1", source="test/module_a/aws", current_version="~>1.0.0"), get_module("module2", source="test/module_b/aws", current_version=">=1.0")]
+    for resource in resources:
+        resource.newest_version = "2.0.0"
+        resource.github_repo = f"https://github.com/{resource.identifier}"
+    release_notes_fetcher = MagicMock()
+    release_notes_fetcher.get_release_ranges.return_value = [[("v2.0.0", "second"), ("v1.1.0", "first")]]
+    release_notes_fetcher.get_release_bodies.return_value = ["latest only"]
+    provider = TerraformModuleProvider(MagicMock(), MagicMock(), MagicMock(), Path("."), None, release_notes_fetcher=release_notes_fetcher)
+
+    release_notes = provider.get_resources_release_notes(resources, ReleaseNotesMode.RANGE)
+
+    release_notes_fetcher.get_release_ranges.assert_called_once_with([("test/module_a", "1.0.0", "2.0.0")])
+    # Constraints without a plain version fall back to the release notes of the newest version
+    release_notes_fetcher.get_release_bodies.assert_called_once_with([("test/module_b", "2.0.0")])
+    assert release_notes[0] is not None and release_notes[0].body == "### v2.0.0\n\nsecond\n\n### v1.1.0\n\nfirst"
+    assert release_notes[1] is not None and release_notes[1].body == "latest only"
+
+
+def test_get_grouped_by_identifier():
+    resources = [
+        get_module("module1", source="test/module_a/aws"),
+        get_module("module2", source="registry.example/test/module_a/aws"),
+        get_module("module3", source="test/module_a/aws"),
+        get_module("module4", source="test/module_a/aws", current_version="~>1.0.0"),
+    ]
+    for resource in resources:
+        resource.newest_version = "2.0.0"
+    provider = TerraformModuleProvider(MagicMock(), MagicMock(), MagicMock(), Path("."), None)
+
+    groups = provider.get_grouped_by_identifier(resources)
+
+    # Resources with the same source and newest version share a group, other registries and versions get their own
+    assert [[resource.name for resource in group] for group in groups.values()] == [["module1", "module3"], ["module2"], ["module4"]]
+    assert list(groups) == [(None, "test/module_a/aws", "2.0.0"), ("registry.example", "test/module_a/aws", "2.0.0"), (None, "test/module_a/aws", "~>2.0.0")]
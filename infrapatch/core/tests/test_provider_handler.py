@@ -0,0 +1,268 @@
+import threading
+import time
+from pathlib import Path
+from typing import Sequence, Union
+from unittest.mock import MagicMock
+
+import pytest
+from git import Repo
+from rich.console import Console
+
+from infrapatch.conftest import get_module
+from infrapatch.core.models.commit_strategy import CommitStrategy
+from infrapatch.core.models.release_notes_mode import ReleaseNotesMode
+from infrapatch.core.models.statistics import ProviderStatistics
+from infrapatch.core.models.versioned_resource import ResourceStatus
+from infrapatch.core.models.versioned_terraform_resources import TerraformModule
+from infrapatch.core.provider_handler import ProviderHandler
+from infrapatch.core.providers.terraform.terraform_module_provider import TerraformModuleProvider
+from infrapatch.core.utils.options_processor import OptionsProcessor
+
+
+class FakeProvider:
+    def __init__(self, name: str, resources: list[TerraformModule], failing_files: Union[list[str], None] = None):
+        self.name = name
+        self.resources = resources
+        self.failing_files = failing_files if failing_files is not None else []
+        self.active_files: dict[Path, int] = {}
+        self.concurrent_file_edits = 0
+        self.active_patches = 0
+        self.max_active_patches = 0
+        self._lock = threading.Lock()
+
+    def get_provider_name(self) -> str:
+        return self.name
+
+    def get_provider_display_name(self) -> str:
+        return self.name
+
+    def get_resources(self) -> Sequence[TerraformModule]:
+        return self.resources
+
+    def patch_resources(self, resources: Sequence[TerraformModule]) -> Sequence[TerraformModule]:
+        file = resources[0].source_file
+        with self._lock:
+            self.active_files[file] = self.active_files.get(file, 0) + 1
+            if self.active_files[file] > 1:
+                self.concurrent_file_edits += 1
+            self.active_patches += 1
+            self.max_active_patches = max(self.max_active_patches, self.active_patches)
+        time.sleep(0.01)
+        with self._lock:
+            self.active_files[file] -= 1
+            self.active_patches -= 1
+        if file.name in self.failing_files:
+            raise Exception("patch failed")
+        for resource in resources:
+            resource.set_patched()
+        return resources
+
+
+class FileWritingProvider(FakeProvider):
+    # Writes the new version of every resource into its file, like the terraform providers.
+    def patch_resources(self, resources: Sequence[TerraformModule]) -> Sequence[TerraformModule]:
+        for resource in resources:
+            content = resource.source_file.read_text()
+            resource.source_file.write_text(content.replace(f'{resource.name} = "{resource.current_version}"', f'{resource.name} = "{resource.newest_version}"'))
+            resource.set_patched()
+        return resources
+
+
+def test_upgrade_resources_patches_files_in_parallel(tmp_path: Path):
+    modules = [get_module(f"module{i}", f"file{i % 4}.tf", newest_version="2.0.0") for i in range(20)]
+    providers = [FakeProvider("modules", modules[:10], failing_files=["file3.tf"]), FakeProvider("providers", modules[10:])]
+    repo = MagicMock()
+    provider_handler = ProviderHandler(
+        providers,  # type: ignore
+        Console(),
+        tmp_path.joinpath("statistics.json"),
+        OptionsProcessor(),
+        repo=repo,
+        patch_workers=4,
+        commit_strategy=CommitStrategy.FILE,
+    )
+    # Resources of both providers share files, the shared provider instance detects concurrent edits of the same file
+    shared_provider = providers[0]
+    providers[1].patch_resources = shared_provider.patch_resources  # type: ignore
+
+    assert provider_handler.upgrade_resources()
+
+    assert shared_provider.concurrent_file_edits == 0
+    # A failing file does not stop the other files from being patched
+    assert [module.name for module in modules if module.status == ResourceStatus.PATCH_ERROR] == ["module3", "module7", "module11", "module15", "module19"]
+    assert all(module.status == ResourceStatus.PATCHED for module in modules if module.source_file.name != "file3.tf")
+    # Commits are created in resource order after patching, the failed file is not committed
+    assert repo.index.commit.call_count == 3
+    assert "module0" in repo.index.commit.call_args_list[0].args[0]
+
+
+def test_upgrade_resources_commits_resources_in_parallel_waves(tmp_path: Path):
+    modules = [get_module(f"module{i}", f"file{i % 4}.tf", newest_version="2.0.0") for i in range(8)]
+    provider = FakeProvider("modules", modules)
+    repo = MagicMock()
+    provider_handler = ProviderHandler([provider], Console(), tmp_path.joinpath("statistics.json"), OptionsProcessor(), repo=repo, patch_workers=4)  # type: ignore
+
+    # Every wave holds one resource per file
+    waves = provider_handler._get_commit_waves(provider_handler.get_upgradable_resources())
+    assert [[commit["modules"][0].name for commit in wave] for wave in waves] == [[f"module{i}" for i in range(4)], [f"module{i}" for i in range(4, 8)]]
+
+    assert provider_handler.upgrade_resources()
+
+    # Files of one wave are patched in parallel, every resource still gets its own commit in resource order
+    assert provider.max_active_patches > 1
+    assert provider.concurrent_file_edits == 0
+    assert [call.args[0] for call in repo.index.commit.call_args_list] == [f"Bump Terraform Module 'module{i}' from version '1.0.0' to '2.0.0'." for i in range(8)]
+
+
+@pytest.mark.parametrize(
+    "commit_strategy, expected_commits",
+    [(CommitStrategy.RESOURCE, 6), (CommitStrategy.FILE, 3), (CommitStrategy.PROVIDER, 2), (CommitStrategy.RUN, 1)],
+)
+def test_upgrade_resources_commit_strategy(tmp_path: Path, commit_strategy: str, expected_commits: int):
+    modules = [get_module(f"module{i}", f"file{i % 3}.tf", newest_version="2.0.0") for i in range(6)]
+    providers = [FakeProvider("modules", modules[:3]), FakeProvider("providers", modules[3:])]
+    repo = MagicMock()
+    provider_handler = ProviderHandler(providers, Console(), tmp_path.joinpath("statistics.json"), OptionsProcessor(), repo=repo, commit_strategy=commit_strategy)  # type: ignore
+
+    provider_handler.upgrade_resources()
+
+    assert repo.index.add.call_count == expected_commits
+    assert repo.index.commit.call_count == expected_commits
+    messages = "\n".join(call.args[0] for call in repo.index.commit.call_args_list)
+    # Every bump keeps its generated message, regardless of the strategy
+    for module in modules:
+        assert f"Bump Terraform Module '{module.name}' from version '1.0.0' to '2.0.0'." in messages
+
+
+@pytest.mark.parametrize(
+    "commit_strategy, expected_commits",
+    [
+        (CommitStrategy.RESOURCE, [["module0"], ["module1"], ["module2"], ["module3"]]),
+        (CommitStrategy.FILE, [["module0", "module2"], ["module1", "module3"]]),
+        (CommitStrategy.PROVIDER, [["module0", "module1"], ["module2", "module3"]]),
+        (CommitStrategy.RUN, [["module0", "module1", "module2", "module3"]]),
+    ],
+)
+def test_upgrade_resources_commit_contents(tmp_path: Path, commit_strategy: str, expected_commits: list[list[str]]):
+    repo = Repo.init(tmp_path)
+    with repo.config_writer() as config:
+        config.set_value("user", "name", "test")
+        config.set_value("user", "email", "test@example.com")
+    modules = [get_module(f"module{i}", tmp_path.joinpath(f"file{i % 2}.tf").as_posix(), newest_version="2.0.0") for i in range(4)]
+    for i in range(2):
+        tmp_path.joinpath(f"file{i}.tf").write_text(f'module{i} = "1.0.0"\nmodule{i + 2} = "1.0.0"\n')
+    repo.index.add([f"file{i}.tf" for i in range(2)])
+    initial_commit = repo.index.commit("Initial commit")
+    providers = [FileWritingProvider("modules", modules[:2]), FileWritingProvider("providers", modules[2:])]
+    provider_handler = ProviderHandler(
+        providers,  # type: ignore
+        Console(),
+        tmp_path.joinpath("statistics.json"),
+        OptionsProcessor(),
+        repo=repo,
+        commit_strategy=commit_strategy,
+    )
+
+    provider_handler.upgrade_resources()
+
+    # Every commit contains exactly the bumps of its resources
+    commits = list(reversed(list(repo.iter_commits(f"{initial_commit.hexsha}..HEAD"))))
+    changed_lines = []
+    for commit in commits:
+        diff = repo.git.diff(commit.parents[0].hexsha, commit.hexsha, "--unified=0")
+        changed_lines.append(sorted(line[1:] for line in diff.splitlines() if line.startswith("+") and not line.startswith("+++")))
+    assert changed_lines == [[f'{name} = "2.0.0"' for name in names] for names in expected_commits]
+    assert not repo.is_dirty(untracked_files=False)
+
+
+def test_invalid_commit_strategy(tmp_path: Path):
+    with pytest.raises(Exception):
+        ProviderHandler([], Console(), tmp_path.joinpath("statistics.json"), OptionsProcessor(), commit_strategy="invalid")
+
+
+def test_status_index_follows_status_changes(tmp_path: Path):
+    modules = [get_module(f"module{i}", f"file{i}.tf", newest_version="2.0.0") for i in range(4)]
+    modules[3].newest_version = "1.0.0"
+    provider = FakeProvider("modules", modules, failing_files=["file0.tf"])
+    provider_handler = ProviderHandler([provider], Console(), tmp_path.joinpath("statistics.json"), OptionsProcessor())  # type: ignore
+
+    assert provider_handler.get_upgradable_resources()["modules"] == modules[:3]
+    assert provider_handler.get_patched_resources()["modules"] == []
+
+    provider_handler.upgrade_resources()
+
+    # Patch errors stay upgradable, lists keep the order of the resources
+    assert provider_handler.get_upgradable_resources()["modules"] == [modules[0]]
+    assert provider_handler.get_patched_resources()["modules"] == [modules[1], modules[2]]
+
+    # Copies of indexed resources do not change the index
+    copied_module = modules[1].model_copy(deep=True)
+    copied_module.set_patch_error()
+    provider_handler.upgrade_resources()
+    assert provider_handler.get_patched_resources()["modules"] == [modules[1], modules[2]]
+
+    provider.failing_files = []
+    provider_handler.upgrade_resources()
+    assert not provider_handler.check_if_upgrades_available()
+
+
+def test_statistics_follow_status_changes(tmp_path: Path):
+    modules = [get_module(f"module{i}", f"file{i}.tf", newest_version="2.0.0") for i in range(4)]
+    modules[3].newest_version = "1.0.0"
+    provider = FakeProvider("modules", modules, failing_files=["file1.tf", "file2.tf"])
+    provider_handler = ProviderHandler([provider], Console(), tmp_path.joinpath("statistics.json"), OptionsProcessor())  # type: ignore
+
+    statistics = provider_handler._get_statistics()
+    assert (statistics.errors, statistics.resources_patched, statistics.resources_pending_update, statistics.total_resources) == (0, 0, 3, 4)
+
+    provider_handler.upgrade_resources()
+
+    statistics = provider_handler._get_statistics()
+    assert (statistics.errors, statistics.resources_patched, statistics.resources_pending_update, statistics.total_resources) == (2, 1, 2, 4)
+    # The counters match a full count of the resources
+    assert statistics.providers["modules"] == ProviderStatistics.from_resources(modules)
+
+
+def test_release_notes_contain_all_resources_of_a_source(tmp_path: Path):
+    modules = [
+        get_module("module0", "file0.tf", newest_version="2.0.0"),
+        get_module("module1", "file1.tf", newest_version="2.0.0"),
+        get_module("module2", "file2.tf", newest_version="2.0.0"),
+    ]
+    modules[2].source = "test/other_module/aws"
+    modules[2].newest_version = "2.0.0"
+    for module in modules:
+        module.github_repo = f"https://github.com/{module.identifier}"
+        module.set_patched()
+    release_notes_fetcher = MagicMock()
+    release_notes_fetcher.get_release_bodies.return_value = ["notes", "other notes"]
+    provider = TerraformModuleProvider(MagicMock(), MagicMock(), MagicMock(), tmp_path, None, release_notes_fetcher=release_notes_fetcher)
+    provider_handler = ProviderHandler([provider], Console(), tmp_path.joinpath("statistics.json"), OptionsProcessor())
+
+    release_notes = provider_handler.get_release_notes({"terraform_modules": modules})["terraform_modules"]
+
+    assert [[resource.name for resource in release_note.resources] for release_note in release_notes] == [["module0", "module1"], ["module2"]]
+    assert release_notes_fetcher.get_release_bodies.call_count == 1
+
+
+def test_range_release_notes_start_at_lowest_current_version(tmp_path: Path):
+    modules = [
+        get_module("module0", "file0.tf", newest_version="2.0.0"),
+        get_module("module1", "file1.tf", newest_version="2.0.0"),
+        get_module("module2", "file2.tf", newest_version="2.0.0"),
+    ]
+    for module, current_version in zip(modules, ["3.7.0", "3.1.0", "3.4.0"]):
+        module.current_version = current_version
+        module.newest_version = "3.8.0"
+        module.github_repo = f"https://github.com/{module.identifier}"
+        module.set_patched()
+    release_notes_fetcher = MagicMock()
+    release_notes_fetcher.get_release_ranges.return_value = [[("v3.8.0", "notes")]]
+    provider = TerraformModuleProvider(MagicMock(), MagicMock(), MagicMock(), tmp_path, None, release_notes_fetcher=release_notes_fetcher)
+    provider_handler = ProviderHandler([provider], Console(), tmp_path.joinpath("statistics.json"), OptionsProcessor(), release_notes_mode=ReleaseNotesMode.RANGE)
+
+    release_notes = provider_handler.get_release_notes({"terraform_modules": modules})["terraform_modules"]
+
+    # One release range covers all resources of the group
+    assert [[resource.name for resource in release_note.resources] for release_note in release_notes] == [["module0", "module1", "module2"]]
+    release_notes_fetcher.get_release_ranges.assert_called_once_with([("test/test_module", "3.1.0", "3.8.0")])
@@ -0,0 +1,45 @@
+import subprocess
+from pathlib import Path
+
+from infrapatch.core.provider_handler_builder import ProviderHandlerBuilder
+
+
+def test_providers_share_hcl_handler(tmp_path: Path):
+    builder = ProviderHandlerBuilder(tmp_path)
+    builder.add_terraform_registry_configuration("registry.terraform.io", {})
+    hcl_handler = builder.get_hcl_handler()
+
+    builder.with_terraform_module_provider().with_terraform_provider_provider()
+
+    # Both providers and the credentials loader use the same handler and hcledit instance
+    assert [provider.hcl_handler for provider in builder.providers] == [hcl_handler, hcl_handler]
+    assert [provider.hcledit for provider in builder.providers] == [hcl_handler.hcl_edit_cli, hcl_handler.hcl_edit_cli]
+
+
+def _run_git(repo_path: Path, *args: str):
+    subprocess.run(["git", *args], cwd=repo_path, check=True, capture_output=True)
+
+
+def test_update_changed_files_after_checkout(tmp_path: Path):
+    _run_git(tmp_path, "init", "-q", "-b", "main")
+    _run_git(tmp_path, "config", "user.email", "test@example.com")
+    _run_git(tmp_path, "config", "user.name", "test")
+    for file_name in ["head.tf", "target.tf"]:
+        tmp_path.joinpath(file_name).write_text("")
+    _run_git(tmp_path, "add", ".")
+    _run_git(tmp_path, "commit", "-q", "-m", "initial")
+    _run_git(tmp_path, "checkout", "-q", "-b", "head")
+    tmp_path.joinpath("head.tf").write_text("# head")
+    _run_git(tmp_path, "commit", "-q", "-am", "head")
+
+    builder = ProviderHandlerBuilder(tmp_path).with_changed_files_since("main")
+    hcl_handler = builder.get_hcl_handler()
+    assert hcl_handler.changed_files == {tmp_path.resolve().joinpath("head.tf")}
+
+    # Files changed by the commits of the checked out branch are added, the previous changes are kept
+    _run_git(tmp_path, "checkout", "-q", "-b", "target", "main")
+    tmp_path.joinpath("target.tf").write_text("# target")
+    _run_git(tmp_path, "commit", "-q", "-am", "target")
+    builder.update_changed_files()
+
+    assert hcl_handler.changed_files == {tmp_path.resolve().joinpath("head.tf"), tmp_path.resolve().joinpath("target.tf")}
@@ -0,0 +1,25 @@
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+
+def write_file_atomic(file: Path, content: str):
+    # Writes to a temporary file in the same directory first, so readers never see a partially written file.
+    # Errors of every step are raised as they are, callers wrap them in their own exception types.
+    # Symlinks are written through, replacing the link itself would leave its target unchanged.
+    file = file.resolve()
+    temp_path = None
+    try:
+        file_descriptor, temp_path = tempfile.mkstemp(dir=file.parent, prefix=f".{file.name}.", suffix=".tmp")
+        # newline="" writes the line endings of the content as they are.
+        with os.fdopen(file_descriptor, "w", encoding="utf-8", newline="") as f:
+            f.write(content)
+        if file.exists():
+            # Temporary files are only accessible by the owner, the replaced file keeps its permissions.
+            shutil.copymode(file, temp_path)
+        os.replace(temp_path, file)
+    except Exception:
+        if temp_path is not None:
+            Path(temp_path).unlink(missing_ok=True)
+        raise
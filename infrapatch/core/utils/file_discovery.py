@@ -0,0 +1,172 @@
+import logging as log
+import os
+import re
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator, Sequence
+
+import infrapatch.core.constants as cs
+
+
+@dataclass
+class FileDiscoveryStatistics:
+    directories_scanned: int = 0
+    files_scanned: int = 0
+    files_found: int = 0
+    duration_seconds: float = 0.0
+
+
+@dataclass
+class IgnoreRule:
+    # Directory of the ignore file, as path relative to the discovery root. Empty for the root itself.
+    base: str
+    pattern: re.Pattern
+    negate: bool
+    directory_only: bool
+
+    def matches(self, relative_path: str, is_directory: bool) -> bool:
+        if self.directory_only and not is_directory:
+            return False
+        if self.base != "":
+            if not relative_path.startswith(f"{self.base}/"):
+                return False
+            relative_path = relative_path[len(self.base) + 1 :]
+        return self.pattern.fullmatch(relative_path) is not None
+
+
+def parse_ignore_file(content: str, base: str) -> list[IgnoreRule]:
+    # Supports the gitignore syntax: negation, anchoring with slashes, directory only patterns, *, ?, ** and character classes.
+    rules = []
+    for line in content.splitlines():
+        line = line.rstrip()
+        if line == "" or line.startswith("#"):
+            continue
+        negate = line.startswith("!")
+        if negate:
+            line = line[1:]
+        elif line.startswith("\\"):
+            line = line[1:]
+        directory_only = line.endswith("/")
+        line = line.rstrip("/")
+        if line == "":
+            continue
+        # Patterns with a slash at the beginning or in the middle are relative to the ignore file, all others match at any depth.
+        anchored = "/" in line
+        line = line.lstrip("/")
+        regex = _translate_pattern(line)
+        if not anchored:
+            regex = f"(?:.*/)?{regex}"
+        rules.append(IgnoreRule(base=base, pattern=re.compile(regex), negate=negate, directory_only=directory_only))
+    return rules
+
+
+def _translate_pattern(pattern: str) -> str:
+    regex = ""
+    i = 0
+    length = len(pattern)
+    while i < length:
+        char = pattern[i]
+        if pattern.startswith("**/", i):
+            regex += "(?:.*/)?"
+            i += 3
+        elif pattern.startswith("**", i):
+            regex += ".*"
+            i += 2
+        elif char == "*":
+            regex += "[^/]*"
+            i += 1
+        elif char == "?":
+            regex += "[^/]"
+            i += 1
+        elif char == "[" and (end := pattern.find("]", i + 2)) != -1:
+            character_class = pattern[i + 1 : end].replace("\\", "\\\\")
+            if character_class.startswith("!"):
+                character_class = f"^{character_class[1:]}"
+            regex += f"[{character_class}]"
+            i = end + 1
+        elif char == "\\" and i + 1 < length:
+            regex += re.escape(pattern[i + 1])
+            i += 2
+        else:
+            regex += re.escape(char)
+            i += 1
+    return regex
+
+
+def is_ignored(rules: Sequence[IgnoreRule], relative_path: str, is_directory: bool) -> bool:
+    # The last matching rule wins, rules of deeper ignore files are added later and therefore take precedence.
+    ignored = False
+    for rule in rules:
+        if rule.negate == ignored and rule.matches(relative_path, is_directory):
+            ignored = not rule.negate
+    return ignored
+
+
+class FileDiscovery:
+    def __init__(self, pruned_directories: Sequence[str] = cs.DEFAULT_PRUNED_DIRECTORIES, ignore_file_names: Sequence[str] = cs.IGNORE_FILE_NAMES):
+        self.pruned_directories = set(pruned_directories)
+        self.ignore_file_names = ignore_file_names
+        self.statistics = FileDiscoveryStatistics()
+
+    def iter_files(self, root: Path, suffix: str) -> Iterator[Path]:
+        # Yields the files while walking, so callers can start processing before the walk is done.
+        self.statistics = FileDiscoveryStatistics()
+        start_time = time.perf_counter()
+        try:
+            yield from self._walk(root, "", suffix, [], set())
+        finally:
+            self.statistics.duration_seconds = time.perf_counter() - start_time
+            log.debug(
+                f"Scanned {self.statistics.directories_scanned} directories and {self.statistics.files_scanned} files in "
+                f"{self.statistics.duration_seconds:.3f}s, found {self.statistics.files_found} '{suffix}' files."
+            )
+
+    def _walk(self, directory: Path, relative_directory: str, suffix: str, rules: list[IgnoreRule], visited: set[tuple[int, int]]) -> Iterator[Path]:
+        try:
+            stat = directory.stat()
+        except OSError as e:
+            log.debug(f"Could not access directory '{directory}': {e}")
+            return
+        # Symlinked directories are followed, but every directory is only walked once to prevent loops.
+        if (stat.st_dev, stat.st_ino) in visited:
+            return
+        visited.add((stat.st_dev, stat.st_ino))
+        self.statistics.directories_scanned += 1
+
+        try:
+            with os.scandir(directory) as iterator:
+                entries = sorted(iterator, key=lambda entry: entry.name)
+        except OSError as e:
+            log.debug(f"Could not scan directory '{directory}': {e}")
+            return
+
+        entry_names = {entry.name for entry in entries}
+        for ignore_file_name in self.ignore_file_names:
+            if ignore_file_name in entry_names:
+                ignore_file = directory.joinpath(ignore_file_name)
+                rules = [*rules, *parse_ignore_file(ignore_file.read_text(errors="replace"), relative_directory)]
+
+        directories = []
+        for entry in entries:
+            # Hidden files and directories are skipped, like glob does.
+            if entry.name.startswith("."):
+                continue
+            relative_path = f"{relative_directory}/{entry.name}" if relative_directory != "" else entry.name
+            try:
+                is_directory = entry.is_dir()
+            except OSError:
+                continue
+            if is_directory:
+                if entry.name in self.pruned_directories or is_ignored(rules, relative_path, True):
+                    continue
+                directories.append((entry, relative_path))
+                continue
+            self.statistics.files_scanned += 1
+            if not entry.name.endswith(suffix) or is_ignored(rules, relative_path, False):
+                continue
+            self.statistics.files_found += 1
+            yield directory.joinpath(entry.name)
+
+        for entry, relative_path in directories:
+            yield from self._walk(directory.joinpath(entry.name), relative_path, suffix, rules, visited)
@@ -36,3 +36,22 @@ class Git:
 
     def push(self, additional_arguments: list[str] = []):
         self.run_git_command(["push", *additional_arguments])
+
+    def get_repository_root(self) -> Path:
+        stdout, _ = self.run_git_command(["rev-parse", "--show-toplevel"])
+        # Git reports the root with symlinks resolved, paths compared against it must be resolved as well.
+        return Path(stdout.strip()).resolve()
+
+    def get_changed_files(self, base_ref: str) -> list[Path]:
+        log.debug(f"Getting files changed since {base_ref}")
+        repository_root = self.get_repository_root()
+        try:
+            merge_base, _ = self.run_git_command(["merge-base", base_ref, "HEAD"])
+        except GitException as e:
+            # Shallow clones lack the history between the ref and HEAD.
+            raise GitException(f"Could not find the merge base of '{base_ref}' and HEAD, the full history of both needs to be fetched: {e}")
+        # Compare against the working tree, so uncommitted changes are included as well.
+        changed_files, _ = self.run_git_command(["diff", "--name-only", "--no-renames", merge_base.strip()])
+        untracked_files, _ = self.run_git_command(["ls-files", "--others", "--exclude-standard", "--full-name", ":/"])
+        file_paths = {line.strip() for line in [*changed_files.splitlines(), *untracked_files.splitlines()] if line.strip() != ""}
+        return sorted(repository_root.joinpath(file_path) for file_path in file_paths)
@@ -0,0 +1,212 @@
+import json
+import logging as log
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Protocol, Sequence, Union
+
+import infrapatch.core.constants as cs
+from infrapatch.core.utils.terraform.registry_cache import RegistryCacheEntry, RegistryCacheException, RegistryCacheInterface
+from infrapatch.core.utils.version_selection import VersionKey, parse_version
+
+if TYPE_CHECKING:
+    from github import Github
+    from github.Repository import Repository
+
+
+class ReleaseNotesFetcherInterface(Protocol):
+    def get_release_bodies(self, releases: Sequence[tuple[str, str]]) -> Sequence[Union[str, None]]: ...
+
+    def get_release_ranges(self, ranges: Sequence[tuple[str, str, str]]) -> Sequence[list[tuple[str, str]]]: ...
+
+
+def get_candidate_tags(version: str) -> list[str]:
+    # Releases are tagged either with or without a 'v' prefix, the prefixed tag is preferred.
+    if version.startswith("v"):
+        return [version, version[1:]]
+    return [f"v{version}", version]
+
+
+def merge_release_notes(releases: Sequence[tuple[str, str]]) -> str:
+    return "\n\n".join(f"### {tag}\n\n{body}" for tag, body in releases)
+
+
+def limit_release_notes(body: str, repo_name: str, max_length: int = cs.RELEASE_NOTES_MAX_LENGTH) -> str:
+    if len(body) <= max_length:
+        return body
+    log.debug(f"Truncating release notes of repo '{repo_name}' from {len(body)} to {max_length} characters.")
+    return f"{body[:max_length]}\n\n... truncated, see https://github.com/{repo_name}/releases for the full release notes."
+
+
+class GithubReleaseNotesFetcher(ReleaseNotesFetcherInterface):
+    def __init__(self, github: Union["Github", None] = None, response_cache: Union[RegistryCacheInterface, None] = None, workers: int = cs.DEFAULT_RELEASE_NOTES_WORKERS):
+        if workers < 1:
+            raise Exception(f"Release notes workers must be at least 1, got {workers}.")
+        # Without a client, an unauthenticated client is created when release notes are requested for the first time.
+        self.github = github
+        self.response_cache = response_cache
+        self.workers = workers
+        self._repos: dict[str, "Repository"] = {}
+        # Release body by repo and tag, None if the release does not exist.
+        self._bodies: dict[tuple[str, str], Union[str, None]] = {}
+        # Releases of a repo newest first, together with the version down to which they are complete.
+        self._release_indexes: dict[str, tuple[VersionKey, list[tuple[VersionKey, str, str]]]] = {}
+        self._lock = threading.Lock()
+
+    def get_release_bodies(self, releases: Sequence[tuple[str, str]]) -> Sequence[Union[str, None]]:
+        # Returns the body of every (repo, version) release, or None if no release was found.
+        # All candidate tags are requested at once, so the tag fallback costs no additional sequential round trip.
+        candidates = [(repo_name, get_candidate_tags(version)) for repo_name, version in releases]
+        keys = list(dict.fromkeys((repo_name, tag) for repo_name, tags in candidates for tag in tags))
+        log.debug(f"Fetching {len(keys)} release tags for {len(releases)} releases with {self.workers} workers.")
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            bodies = dict(zip(keys, executor.map(lambda key: self._get_release_body(*key), keys)))
+
+        results: list[Union[str, None]] = []
+        for repo_name, tags in candidates:
+            found_bodies = [bodies[(repo_name, tag)] for tag in tags if bodies[(repo_name, tag)] is not None]
+            results.append(found_bodies[0] if len(found_bodies) > 0 else None)
+        return results
+
+    def get_release_ranges(self, ranges: Sequence[tuple[str, str, str]]) -> Sequence[list[tuple[str, str]]]:
+        # Returns tag and body of every release newer than the current and up to the newest version of every (repo, current, newest) range, newest first.
+        # The releases of every repo are listed once, independent of the number of ranges and versions.
+        parsed_ranges: list[Union[tuple[str, VersionKey, VersionKey], None]] = []
+        lowest_versions: dict[str, VersionKey] = {}
+        for repo_name, current_version, newest_version in ranges:
+            current = parse_version(current_version.removeprefix("v"))
+            newest = parse_version(newest_version.removeprefix("v"))
+            if current is None or newest is None:
+                log.debug(f"Versions '{current_version}' and '{newest_version}' of repo '{repo_name}' are no valid range.")
+                parsed_ranges.append(None)
+                continue
+            parsed_ranges.append((repo_name, current, newest))
+            lowest_versions[repo_name] = min(lowest_versions.get(repo_name, current), current)
+
+        log.debug(f"Listing releases of {len(lowest_versions)} repos for {len(ranges)} release ranges with {self.workers} workers.")
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            indexes = dict(zip(lowest_versions, executor.map(lambda repo_name: self._get_release_index(repo_name, lowest_versions[repo_name]), lowest_versions)))
+
+        results: list[list[tuple[str, str]]] = []
+        for parsed_range in parsed_ranges:
+            if parsed_range is None:
+                results.append([])
+                continue
+            repo_name, current, newest = parsed_range
+            results.append([(tag, body) for version, tag, body in indexes[repo_name] if current < version <= newest])
+        return results
+
+    def _get_release_index(self, repo_name: str, lowest_version: VersionKey) -> list[tuple[VersionKey, str, str]]:
+        with self._lock:
+            cached_index = self._release_indexes.get(repo_name)
+        if cached_index is not None and cached_index[0] <= lowest_version:
+            return cached_index[1]
+
+        releases: dict[VersionKey, tuple[str, str]] = {}
+        try:
+            release_list = self._get_repo(repo_name).get_releases()
+            per_page = self._get_github().per_page
+            page_number = 0
+            while True:
+                page = release_list.get_page(page_number)
+                page_versions = []
+                for release in page:
+                    if release.draft:
+                        continue
+                    version = parse_version(release.tag_name.removeprefix("v"))
+                    if version is None:
+                        continue
+                    page_versions.append(version)
+                    if version > lowest_version:
+                        releases.setdefault(version, (release.tag_name, release.body or ""))
+                # Releases are listed by creation date, so a backport release can be listed before newer versions.
+                # Paging stops at the last page or once a whole page is not newer than the lowest current version.
+                if len(page) < per_page or (len(page_versions) > 0 and all(version <= lowest_version for version in page_versions)):
+                    break
+                page_number += 1
+        except Exception as e:
+            log.warning(f"Could not list releases of repo '{repo_name}': {e}")
+            return []
+
+        index = [(version, *releases[version]) for version in sorted(releases, reverse=True)]
+        log.debug(f"Found {len(index)} releases in repo '{repo_name}'.")
+        with self._lock:
+            self._release_indexes[repo_name] = (lowest_version, index)
+            for version, tag, body in index:
+                # The other spelling of a listed tag does not exist, the listing contains every release of the version.
+                for candidate_tag in get_candidate_tags(tag):
+                    self._bodies.setdefault((repo_name, candidate_tag), None)
+                self._bodies[(repo_name, tag)] = body
+        return index
+
+    def _get_release_body(self, repo_name: str, tag: str) -> Union[str, None]:
+        with self._lock:
+            if (repo_name, tag) in self._bodies:
+                return self._bodies[(repo_name, tag)]
+
+        cache_key = f"github://{repo_name}/releases/tags/{tag}"
+        found_in_cache, body = self._get_cached_release_body(cache_key)
+        if found_in_cache:
+            log.debug(f"Using cached release notes of repo '{repo_name}' for tag '{tag}'.")
+        else:
+            from github import GithubException
+
+            try:
+                body = self._get_repo(repo_name).get_release(tag).body or ""
+            except GithubException as e:
+                if e.status != 404:
+                    log.warning(f"Could not get release notes from repo '{repo_name}' for tag '{tag}': {e}")
+                    return None
+                log.debug(f"Repo '{repo_name}' has no release with tag '{tag}'.")
+                body = None
+            except Exception as e:
+                log.warning(f"Could not get release notes from repo '{repo_name}' for tag '{tag}': {e}")
+                return None
+            self._set_cached_release_body(cache_key, body)
+
+        with self._lock:
+            self._bodies[(repo_name, tag)] = body
+        return body
+
+    def _get_cached_release_body(self, cache_key: str) -> tuple[bool, Union[str, None]]:
+        # Returns if a valid entry was found and its body, None if the release does not exist. Invalid entries are a cache miss.
+        if self.response_cache is None:
+            return False, None
+        cached_entry = self.response_cache.get(cache_key)
+        if cached_entry is None or cached_entry.is_expired():
+            return False, None
+        try:
+            body = json.loads(cached_entry.body)["body"]
+        except Exception as e:
+            log.debug(f"Ignoring invalid cached release notes '{cache_key}': {e}")
+            return False, None
+        if body is not None and not isinstance(body, str):
+            log.debug(f"Ignoring cached release notes '{cache_key}' without a valid body.")
+            return False, None
+        return True, body
+
+    def _set_cached_release_body(self, cache_key: str, body: Union[str, None]):
+        if self.response_cache is None:
+            return
+        ttl = cs.RELEASE_NOTES_CACHE_TTL if body is not None else cs.RELEASE_NOTES_MISSING_CACHE_TTL
+        try:
+            self.response_cache.set(RegistryCacheEntry(url=cache_key, body=json.dumps({"body": body}), expires_at=time.time() + ttl))
+        except RegistryCacheException as e:
+            # The cache only saves requests of later runs, the release notes are still returned.
+            log.warning(f"Could not cache release notes '{cache_key}': {e}")
+
+    def _get_github(self) -> "Github":
+        with self._lock:
+            if self.github is None:
+                from github import Github
+
+                self.github = Github()
+            return self.github
+
+    def _get_repo(self, repo_name: str) -> "Repository":
+        github = self._get_github()
+        with self._lock:
+            if repo_name not in self._repos:
+                # Lazy repos are created without a request, the release request is the only round trip.
+                self._repos[repo_name] = github.get_repo(repo_name, lazy=True)
+            return self._repos[repo_name]
@@ -1,23 +1,30 @@
 import logging as log
-from typing import Any, Protocol, Union
+from pathlib import Path
+from typing import Any, Protocol, Sequence, Union
 import infrapatch.core.constants as cs
 
 from infrapatch.core.models.versioned_resource import VersionedResource, VersionedResourceOptions
 
 
 class OptionsProcessorInterface(Protocol):
-    def process_options_for_resource(self, resource: VersionedResource) -> VersionedResource: ...
+    def process_options_for_resource(self, resource: VersionedResource, lines: Union[Sequence[str], None] = None) -> VersionedResource: ...
+
+    def process_options_for_resources(self, resources: Sequence[VersionedResource]) -> Sequence[VersionedResource]: ...
 
 
 class OptionsProcessor(OptionsProcessorInterface):
-    def _get_upper_line_content(self, resource: VersionedResource) -> Union[str, None]:
+    def _get_upper_line_content(self, resource: VersionedResource, lines: Union[Sequence[str], None] = None) -> Union[str, None]:
         if resource.start_line_number == 0:
             raise Exception(f"Resource '{resource.name}' has invalid start line number 0.")
         if resource.start_line_number == 1:
             return None
-        with open(resource.source_file, "r") as f:
-            lines = f.readlines()
-            return lines[resource.start_line_number - 2].strip()
+        if lines is None:
+            lines = self._read_lines(resource.source_file)
+        return lines[resource.start_line_number - 2].strip()
+
+    def _read_lines(self, file: Path) -> Sequence[str]:
+        with open(file, "r") as f:
+            return f.read().split("\n")
 
     def _process_options_string(self, options: str) -> dict[str, Any]:
         options_dict = {}
@@ -32,15 +39,29 @@ class OptionsProcessor(OptionsProcessorInterface):
         optioons_dict = self._process_options_string(options_string)
         return VersionedResourceOptions(**optioons_dict)
 
-    def process_options_for_resource(self, resource: VersionedResource) -> VersionedResource:
-        upper_line_content = self._get_upper_line_content(resource)
+    def process_options_for_resources(self, resources: Sequence[VersionedResource]) -> Sequence[VersionedResource]:
+        # Every file is only read once, regardless of the number of resources it contains.
+        file_lines: dict[Path, Sequence[str]] = {}
+        for resource in resources:
+            if "options" in resource.model_fields_set:
+                continue
+            # Resources in the first line have no line above, so their file does not need to be read.
+            if resource.start_line_number > 1 and resource.source_file not in file_lines:
+                file_lines[resource.source_file] = self._read_lines(resource.source_file)
+            self.process_options_for_resource(resource, file_lines.get(resource.source_file))
+        return resources
 
-        if upper_line_content is None:
-            log.debug(f"Resource '{resource.name}' has no options.")
+    def process_options_for_resource(self, resource: VersionedResource, lines: Union[Sequence[str], None] = None) -> VersionedResource:
+        # Options are set explicitly once processed, e.g. when the resource was restored from the scan manifest.
+        if "options" in resource.model_fields_set:
+            log.debug(f"Options of resource '{resource.name}' are already processed.")
             return resource
 
-        if cs.infrapatch_options_prefix not in upper_line_content:
+        upper_line_content = self._get_upper_line_content(resource, lines)
+
+        if upper_line_content is None or cs.infrapatch_options_prefix not in upper_line_content:
             log.debug(f"Resource '{resource.name}' has no options.")
+            resource.options = VersionedResourceOptions()
             return resource
 
         resource.options = self._get_options_object(upper_line_content)
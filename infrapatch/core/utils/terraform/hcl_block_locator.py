@@ -0,0 +1,153 @@
+import bisect
+import re
+from dataclasses import dataclass, field
+
+
+class HclScannerException(Exception):
+    pass
+
+
+identifier_re = re.compile(r"[A-Za-z_][A-Za-z0-9_-]*")
+_heredoc_re = re.compile(r"<<-?([A-Za-z_][A-Za-z0-9_]*)[ \t]*\r?\n")
+_newline_re = re.compile("\n")
+
+
+def skip_comment(content: str, position: int) -> int:
+    # Returns the position after the comment, or the given position if there is no comment.
+    if content.startswith("/*", position):
+        end = content.find("*/", position + 2)
+        return len(content) if end == -1 else end + 2
+    if content.startswith("#", position) or content.startswith("//", position):
+        end = content.find("\n", position)
+        return len(content) if end == -1 else end
+    return position
+
+
+def skip_string(content: str, position: int) -> int:
+    # Returns the position after the closing quote, interpolations may contain quotes and braces.
+    position += 1
+    template_depth = 0
+    length = len(content)
+    while position < length:
+        char = content[position]
+        if char == "\\":
+            position += 2
+            continue
+        if template_depth == 0:
+            if char == '"':
+                return position + 1
+            if char == "\n":
+                raise HclScannerException("Unterminated string literal.")
+            if content.startswith("${", position) or content.startswith("%{", position):
+                template_depth = 1
+                position += 2
+                continue
+        elif char == "{":
+            template_depth += 1
+        elif char == "}":
+            template_depth -= 1
+        position += 1
+    raise HclScannerException("Unterminated string literal.")
+
+
+def skip_heredoc(content: str, position: int) -> int:
+    # Returns the position after the closing marker, or after '<<' if it does not start a heredoc.
+    match = _heredoc_re.match(content, position)
+    if match is None:
+        return position + 2
+    end_marker = re.compile(rf"^[ \t]*{match.group(1)}[ \t]*\r?$", re.MULTILINE)
+    end = end_marker.search(content, match.end())
+    if end is None:
+        raise HclScannerException(f"Unterminated heredoc '{match.group(1)}'.")
+    return end.end()
+
+
+def get_line_offsets(content: str) -> list[int]:
+    return [0, *(match.end() for match in _newline_re.finditer(content))]
+
+
+@dataclass
+class HclBlockLines:
+    # Line of the first 'module "name" {' and 'name = {' entry in required_providers, by name.
+    modules: dict[str, int] = field(default_factory=dict)
+    providers: dict[str, int] = field(default_factory=dict)
+
+
+class HclBlockLocator:
+    # Finds the lines of all module blocks and required_providers entries in a single pass over the content.
+    def locate(self, content: str) -> HclBlockLines:
+        block_lines = HclBlockLines()
+        line_offsets = get_line_offsets(content)
+        # Kind of every open block, the kind of a block is decided by the statement opening it.
+        block_stack: list[str] = []
+        statement: list[str] = []
+        statement_start = 0
+        position = 0
+        length = len(content)
+        while position < length:
+            char = content[position]
+            if char in "#/":
+                next_position = skip_comment(content, position)
+                if next_position != position:
+                    position = next_position
+                    continue
+                statement.append(char)
+                position += 1
+            elif char == '"':
+                end = skip_string(content, position)
+                if len(statement) == 0:
+                    statement_start = position
+                statement.append(content[position:end])
+                position = end
+            elif char == "<" and content.startswith("<<", position):
+                position = skip_heredoc(content, position)
+                statement.append("<<")
+            elif char == "{":
+                kind = self._get_block_kind(block_stack, statement)
+                if kind == "module":
+                    block_lines.modules.setdefault(statement[1][1:-1], self._get_line(line_offsets, statement_start))
+                elif kind == "provider_entry":
+                    block_lines.providers.setdefault(self._get_name(statement[0]), self._get_line(line_offsets, statement_start))
+                block_stack.append(kind)
+                statement = []
+                position += 1
+            elif char == "}":
+                if len(block_stack) > 0:
+                    block_stack.pop()
+                statement = []
+                position += 1
+            elif char in "\n,":
+                statement = []
+                position += 1
+            elif char in " \t\r":
+                position += 1
+            elif match := identifier_re.match(content, position):
+                if len(statement) == 0:
+                    statement_start = position
+                statement.append(match.group())
+                position = match.end()
+            else:
+                statement.append(char)
+                position += 1
+        return block_lines
+
+    def _get_block_kind(self, block_stack: list[str], statement: list[str]) -> str:
+        parent = block_stack[-1] if len(block_stack) > 0 else None
+        if parent is None:
+            if len(statement) == 2 and statement[0] == "module" and statement[1].startswith('"'):
+                return "module"
+            if statement == ["terraform"]:
+                return "terraform"
+        elif parent == "terraform" and statement == ["required_providers"]:
+            return "required_providers"
+        elif parent == "required_providers" and len(statement) == 2 and statement[1] in ["=", ":"]:
+            return "provider_entry"
+        return "other"
+
+    def _get_name(self, token: str) -> str:
+        if token.startswith('"'):
+            return token[1:-1]
+        return token
+
+    def _get_line(self, line_offsets: list[int], position: int) -> int:
+        return bisect.bisect_right(line_offsets, position)
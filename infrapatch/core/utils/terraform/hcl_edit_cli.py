@@ -12,6 +12,8 @@ class HclEditCliException(Exception):
 class HclEditCliInterface(Protocol):
     def update_hcl_value(self, resource: str, file: Path, value: str): ...
 
+    def update_hcl_values(self, file: Path, values: dict[str, str]) -> dict[str, Union[Exception, None]]: ...
+
     def get_hcl_value(self, resource: str, file: Path) -> str: ...
 
 
@@ -36,6 +38,18 @@ class HclEditCli(HclEditCliInterface):
     def update_hcl_value(self, resource: str, file: Path, value: str):
         self._run_hcl_edit_command("update", resource, file, value)
 
+    def update_hcl_values(self, file: Path, values: dict[str, str]) -> dict[str, Union[Exception, None]]:
+        # hcledit only accepts one address per invocation, failed updates do not stop the remaining ones.
+        errors: dict[str, Union[Exception, None]] = {}
+        for resource, value in values.items():
+            try:
+                self.update_hcl_value(resource, file, value)
+            except Exception as e:
+                errors[resource] = e
+                continue
+            errors[resource] = None
+        return errors
+
     def get_hcl_value(self, resource: str, file: Path) -> str:
         result = self._run_hcl_edit_command("read", resource, file)
         if result is None or result == "":
@@ -0,0 +1,76 @@
+import logging as log
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Union
+
+import infrapatch.core.constants as cs
+from infrapatch.core.utils.terraform.hcl_block_locator import get_line_offsets
+
+
+@dataclass
+class HclFileContent:
+    mtime_ns: int
+    size: int
+    # Content as stored on disk, line endings are kept as they are.
+    content: str
+    # Time the content was read, the stat of a file modified shortly before does not prove the file is unchanged.
+    read_at_ns: int = 0
+    # Content written by infrapatch itself is known, regardless of when the file was modified.
+    written: bool = False
+    _line_offsets: Union[list[int], None] = field(default=None, repr=False)
+
+    def matches_stat(self, stat: os.stat_result) -> bool:
+        if self.mtime_ns != stat.st_mtime_ns or self.size != stat.st_size:
+            return False
+        return self.written or self.mtime_ns + cs.FILE_TIMESTAMP_GRANULARITY_NS < self.read_at_ns
+
+    def get_text(self) -> str:
+        # Content with universal newlines, as read by open() in text mode.
+        if "\r" not in self.content:
+            return self.content
+        return self.content.replace("\r\n", "\n").replace("\r", "\n")
+
+    def get_line_offsets(self) -> list[int]:
+        if self._line_offsets is None:
+            self._line_offsets = get_line_offsets(self.content)
+        return self._line_offsets
+
+
+class HclFileCache:
+    # Content and line index of .tf files by path, shared by parsing and patching within one run.
+    # Size and mtime detect changes made by other tools, files written by infrapatch are updated in place.
+    # Files modified within the timestamp granularity before they were read are read again, a rewrite could keep size and mtime.
+    def __init__(self) -> None:
+        self._files: dict[Path, HclFileContent] = {}
+        self._lock = threading.Lock()
+
+    def get(self, file: Path, stat: Union[os.stat_result, None] = None) -> HclFileContent:
+        file_path = file.absolute()
+        if stat is None:
+            stat = os.stat(file_path)
+        with self._lock:
+            file_content = self._files.get(file_path)
+        if file_content is not None and file_content.matches_stat(stat):
+            return file_content
+        # newline="" keeps the line endings of the file as they are.
+        read_at_ns = time.time_ns()
+        with open(file_path, "r", encoding="utf-8", newline="") as f:
+            file_content = HclFileContent(mtime_ns=stat.st_mtime_ns, size=stat.st_size, content=f.read(), read_at_ns=read_at_ns)
+        with self._lock:
+            self._files[file_path] = file_content
+        return file_content
+
+    def set(self, file: Path, content: str):
+        # Called after writing a file, so the next read of the file is served from memory.
+        file_path = file.absolute()
+        stat = os.stat(file_path)
+        log.debug(f"Updating cached content of file '{file}'.")
+        with self._lock:
+            self._files[file_path] = HclFileContent(mtime_ns=stat.st_mtime_ns, size=stat.st_size, content=content, read_at_ns=time.time_ns(), written=True)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._files)
@@ -1,54 +1,173 @@
-import glob
+import hashlib
 import logging as log
+import os
 import platform
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
 from pathlib import Path
-import re
-from typing import Protocol, Sequence
+from typing import Iterable, Iterator, Protocol, Sequence, Union
 
 import pygohcl
 
+import infrapatch.core.constants as cs
+from infrapatch.core.models.terraform_scan_manifest import MANIFEST_FORMAT_VERSION, ParsedTerraformFile, TerraformScanManifest
 from infrapatch.core.models.versioned_terraform_resources import TerraformModule, TerraformProvider, VersionedTerraformResource
+from infrapatch.core.utils.file_discovery import FileDiscovery
+from infrapatch.core.utils.options_processor import OptionsProcessorInterface
+from infrapatch.core.utils.terraform.hcl_block_locator import HclBlockLines, HclBlockLocator
 from infrapatch.core.utils.terraform.hcl_edit_cli import HclEditCliInterface
+from infrapatch.core.utils.terraform.hcl_file_cache import HclFileCache
+from infrapatch.core.utils.terraform.hcl_version_rewriter import HclVersionRewriter, HclVersionRewriterInterface, HclVersionUpdate
 
 
 class HclParserException(Exception):
     pass
 
 
+@dataclass
+class HclPatchResult:
+    resource: VersionedTerraformResource
+    error: Union[Exception, None] = None
+
+
 class HclHandlerInterface(Protocol):
     def bump_resource_version(self, resource: VersionedTerraformResource): ...
 
+    def bump_resource_versions(self, resources: Sequence[VersionedTerraformResource]) -> Sequence[HclPatchResult]: ...
+
     def get_terraform_resources_from_file(self, tf_file: Path, get_modules: bool = True, get_providers: bool = True) -> Sequence[VersionedTerraformResource]: ...
 
+    def iter_terraform_resources_from_files(
+        self, tf_files: Iterable[Path], get_modules: bool = True, get_providers: bool = True
+    ) -> Iterator[Sequence[VersionedTerraformResource]]: ...
+
     def get_all_terraform_files(self, root: Path) -> Sequence[Path]: ...
 
+    def iter_all_terraform_files(self, root: Path) -> Iterator[Path]: ...
+
+    def save_scan_manifest(self): ...
+
     def get_credentials_form_user_rc_file(self) -> dict[str, str]: ...
 
 
 class HclHandler(HclHandlerInterface):
-    def __init__(self, hcl_edit_cli: HclEditCliInterface):
+    def __init__(
+        self,
+        hcl_edit_cli: HclEditCliInterface,
+        parser_workers: int = cs.DEFAULT_PARSER_WORKERS,
+        options_processor: Union[OptionsProcessorInterface, None] = None,
+        scan_manifest_file: Union[Path, None] = None,
+        changed_files: Union[Sequence[Path], None] = None,
+        version_rewriter: Union[HclVersionRewriterInterface, None] = None,
+        file_discovery: Union[FileDiscovery, None] = None,
+        file_cache: Union[HclFileCache, None] = None,
+    ):
+        if parser_workers < 1:
+            raise Exception(f"Parser workers must be at least 1, got {parser_workers}.")
         self.hcl_edit_cli = hcl_edit_cli
-        pass
+        # File contents read for parsing are reused when patching the same files.
+        self.file_cache = file_cache if file_cache is not None else HclFileCache()
+        # Versions are rewritten in process, hcledit is only used for blocks the rewriter can not handle.
+        self.version_rewriter = version_rewriter if version_rewriter is not None else HclVersionRewriter(self.file_cache)
+        self.block_locator = HclBlockLocator()
+        self.file_discovery = file_discovery if file_discovery is not None else FileDiscovery()
+        self.parser_workers = parser_workers
+        self.options_processor = options_processor
+        self.scan_manifest_file = scan_manifest_file
+        # If set, only these files are scanned, all other files are resolved from the scan manifest.
+        # Paths are resolved, so changes reported by git match files below a symlinked working directory.
+        self.changed_files = None if changed_files is None else {file_path.resolve() for file_path in changed_files}
+        # Parse results by file path, shared by all providers using this handler.
+        # Size and mtime detect unchanged files without reading them, the content hash detects files which were only touched.
+        self._parsed_files: dict[Path, ParsedTerraformFile] = {}
+        self._scan_manifest_changed = False
+        if scan_manifest_file is not None:
+            manifest = TerraformScanManifest.load(scan_manifest_file)
+            self._parsed_files = {Path(file_path).resolve(): parsed_file for file_path, parsed_file in manifest.files.items()}
+
+    def add_changed_files(self, changed_files: Sequence[Path]):
+        # Called after a checkout, files changed at any checked out commit are checked again, the others keep their parse result.
+        if self.changed_files is None:
+            raise Exception("Changed files can only be added if the scan is limited to changed files.")
+        self.changed_files.update(file_path.resolve() for file_path in changed_files)
 
     def bump_resource_version(self, resource: VersionedTerraformResource):
+        result = self.bump_resource_versions([resource])[0]
+        if result.error is not None:
+            raise result.error
+
+    def bump_resource_versions(self, resources: Sequence[VersionedTerraformResource]) -> Sequence[HclPatchResult]:
+        results = [HclPatchResult(resource=resource) for resource in resources]
+        # Bumps are grouped by file, so every file is only edited once.
+        file_results: dict[Path, dict[str, list[HclPatchResult]]] = {}
+        for result in results:
+            try:
+                if not self._needs_bump(result.resource):
+                    continue
+                address = self._get_hcl_address(result.resource)
+            except Exception as e:
+                result.error = e
+                continue
+            file_results.setdefault(result.resource.source_file, {}).setdefault(address, []).append(result)
+
+        for file, address_results in file_results.items():
+            values: dict[str, str] = {}
+            for address, address_result in address_results.items():
+                newest_versions = {result.resource.newest_version for result in address_result}
+                if len(newest_versions) > 1:
+                    for result in address_result:
+                        result.error = Exception(f"Conflicting versions {sorted(newest_versions)} for '{address}' in file '{file}'.")
+                    continue
+                values[address] = newest_versions.pop()  # type: ignore
+            values = self._rewrite_versions(file, values, address_results)
+            if len(values) == 0:
+                continue
+            log.debug(f"Updating {len(values)} resources in file '{file}' with hcledit.")
+            try:
+                errors = self.hcl_edit_cli.update_hcl_values(file, values)
+            except Exception as e:
+                errors = {address: e for address in values}
+            for address, error in errors.items():
+                for result in address_results[address]:
+                    result.error = error
+        return results
+
+    def _rewrite_versions(self, file: Path, values: dict[str, str], address_results: dict[str, list[HclPatchResult]]) -> dict[str, str]:
+        # Returns the values which could not be rewritten and need to be updated with hcledit.
+        if len(values) == 0:
+            return values
+        addresses = list(values.keys())
+        updates = []
+        for address in addresses:
+            resource = address_results[address][0].resource
+            updates.append(HclVersionUpdate(start_line_number=resource.start_line_number, current_version=resource.current_version, new_version=values[address]))
+        try:
+            errors = self.version_rewriter.update_versions(file, updates)
+        except Exception as e:
+            log.debug(f"Could not rewrite versions in file '{file}', falling back to hcledit: {e}")
+            return values
+        return {address: values[address] for address, error in zip(addresses, errors) if error is not None}
+
+    def _needs_bump(self, resource: VersionedTerraformResource) -> bool:
         if not isinstance(resource, TerraformModule) and not isinstance(resource, TerraformProvider):
             raise Exception(f"Resource type '{type(resource)}' is not supported.")
         if resource.newest_version is None:
             raise Exception(f"Newest version of resource '{resource.name}' is not set.")
         if resource.installed_version_equal_or_newer_than_new_version():
             log.debug(f"Resource '{resource.name}' is already up to date.")
-            return
-
+            return False
         log.debug(f"Updating resource '{resource.resource_name}' with name '{resource.name}' from version '{resource.current_version}' to '{resource.newest_version}'.")
+        return True
+
+    def _get_hcl_address(self, resource: VersionedTerraformResource) -> str:
         if isinstance(resource, TerraformProvider):
-            resource_name = f"terraform.required_providers.{resource.name}.version"
+            return f"terraform.required_providers.{resource.name}.version"
         elif isinstance(resource, TerraformModule):
-            resource_name = f"module.{resource.name}.version"
+            return f"module.{resource.name}.version"
         else:
             raise Exception(f"Resource type '{type(resource)}' is not supported.")
 
-        self.hcl_edit_cli.update_hcl_value(resource_name, resource.source_file, resource.newest_version)
-
     def get_terraform_resources_from_file(self, tf_file: Path, get_modules: bool = True, get_providers: bool = True) -> Sequence[VersionedTerraformResource]:
         if get_modules is False and get_providers is False:
             raise Exception("At least one of the parameters 'modules' and 'providers' must be True.")
@@ -59,27 +178,98 @@ class HclHandler(HclHandlerInterface):
         if not tf_file.is_file():
             raise Exception(f"Path '{tf_file}' is not a file.")
 
-        with open(tf_file.absolute(), "r") as file:
+        parsed_file = self._get_parsed_file(tf_file)
+        found_resources: list[VersionedTerraformResource] = []
+        # Return copies, so changes by one provider or run never leak into the shared parse results.
+        if get_modules:
+            found_resources.extend(resource.model_copy(deep=True) for resource in parsed_file.modules)
+        if get_providers:
+            found_resources.extend(resource.model_copy(deep=True) for resource in parsed_file.providers)
+        return found_resources
+
+    def _get_parsed_file(self, tf_file: Path) -> ParsedTerraformFile:
+        file_path = tf_file.resolve()
+        parsed_file = self._parsed_files.get(file_path)
+        if parsed_file is not None and self.changed_files is not None and file_path not in self.changed_files:
+            log.debug(f"File '{tf_file}' was not changed, using result from scan manifest.")
+            return parsed_file
+        stat = os.stat(file_path)
+        if parsed_file is not None and parsed_file.matches_stat(stat):
+            log.debug(f"File '{tf_file}' is unchanged, using cached parse result.")
+            return parsed_file
+
+        try:
+            file_content = self.file_cache.get(file_path, stat)
+            content = file_content.get_text()
+            content_hash = hashlib.sha256(content.encode()).hexdigest()
+            if parsed_file is not None and parsed_file.content_hash == content_hash:
+                log.debug(f"Content of file '{tf_file}' is unchanged, using cached parse result.")
+                parsed_file.mtime_ns = stat.st_mtime_ns
+                parsed_file.size = stat.st_size
+                parsed_file.checked_at_ns = file_content.read_at_ns
+                self._scan_manifest_changed = True
+                return parsed_file
+            terraform_file_dict = pygohcl.loads(content)
+            block_lines = self.block_locator.locate(content)
+        except Exception as e:
+            raise HclParserException(f"Could not parse file '{tf_file}': {e}")
+        modules = self._get_terraform_modules_from_dict(terraform_file_dict, tf_file, block_lines)
+        providers = self._get_terraform_providers_from_dict(terraform_file_dict, tf_file, block_lines)
+        if self.options_processor is not None:
+            # Options are read from the content in memory, line numbers are based on newlines as well.
+            lines = content.split("\n")
+            for resource in [*modules, *providers]:
+                self.options_processor.process_options_for_resource(resource, lines)
+        parsed_file = ParsedTerraformFile(
+            mtime_ns=stat.st_mtime_ns, size=stat.st_size, content_hash=content_hash, modules=modules, providers=providers, checked_at_ns=file_content.read_at_ns
+        )
+        self._parsed_files[file_path] = parsed_file
+        self._scan_manifest_changed = True
+        return parsed_file
+
+    def save_scan_manifest(self):
+        if self.scan_manifest_file is None or not self._scan_manifest_changed:
+            return
+        if self.changed_files is not None:
+            # Only changed files can have been deleted, so the other files do not need to be checked.
+            removed_files = {file_path for file_path in self.changed_files if not file_path.exists()}
+        else:
+            removed_files = {file_path for file_path in self._parsed_files if not file_path.exists()}
+        files = {file_path.as_posix(): parsed_file for file_path, parsed_file in self._parsed_files.items() if file_path not in removed_files}
+        TerraformScanManifest(format_version=MANIFEST_FORMAT_VERSION, files=files).save(self.scan_manifest_file)
+        self._scan_manifest_changed = False
+
+    def iter_terraform_resources_from_files(self, tf_files: Iterable[Path], get_modules: bool = True, get_providers: bool = True) -> Iterator[Sequence[VersionedTerraformResource]]:
+        if self.parser_workers == 1:
+            for tf_file in tf_files:
+                yield self.get_terraform_resources_from_file(tf_file, get_modules, get_providers)
+            return
+
+        # pygohcl calls into go through cffi, which releases the GIL while parsing, so threads parse files in parallel.
+        # A process pool is not used since forking a process with a loaded go runtime is not safe.
+        with ThreadPoolExecutor(max_workers=self.parser_workers) as executor:
+            # Only a limited number of files is parsed ahead, so files are consumed lazily and pending results stay bounded.
+            # Results are returned in the order of the input files, regardless of which parse finishes first.
+            pending: deque[Future[Sequence[VersionedTerraformResource]]] = deque()
             try:
-                content = file.read()
-                terraform_file_dict = pygohcl.loads(content)
-            except Exception as e:
-                raise HclParserException(f"Could not parse file '{tf_file}': {e}")
-            found_resources = []
-            if get_modules:
-                found_resources.extend(self._get_terraform_modules_from_dict(terraform_file_dict, tf_file, content))
-            if get_providers:
-                found_resources.extend(self._get_terraform_providers_from_dict(terraform_file_dict, tf_file, content))
-            return found_resources
-
-    def _get_terraform_providers_from_dict(self, terraform_file_dict: dict, tf_file: Path, content: str) -> Sequence[TerraformProvider]:
+                for tf_file in tf_files:
+                    pending.append(executor.submit(self.get_terraform_resources_from_file, tf_file, get_modules, get_providers))
+                    if len(pending) >= self.parser_workers * 2:
+                        yield pending.popleft().result()
+                while len(pending) > 0:
+                    yield pending.popleft().result()
+            finally:
+                for future in pending:
+                    future.cancel()
+
+    def _get_terraform_providers_from_dict(self, terraform_file_dict: dict, tf_file: Path, block_lines: HclBlockLines) -> list[TerraformProvider]:
         found_resources = []
         if "terraform" in terraform_file_dict:
             if "required_providers" in terraform_file_dict["terraform"]:
                 providers = terraform_file_dict["terraform"]["required_providers"]
                 for provider_name, provider_config in providers.items():
                     source = provider_config["source"]
-                    start_line_number = self._get_start_line_number(content, file=tf_file, search_regex=rf'{provider_name}\s*=\s*\{{[^}}]*source\s*=\s*"{source}"[^}}]*\}}')
+                    start_line_number = self._get_start_line_number(block_lines.providers, file=tf_file, name=provider_name)
                     found_resources.append(
                         TerraformProvider(
                             name=provider_name,
@@ -91,7 +281,7 @@ class HclHandler(HclHandlerInterface):
                     )
         return found_resources
 
-    def _get_terraform_modules_from_dict(self, terraform_file_dict: dict, tf_file: Path, content: str) -> Sequence[TerraformProvider]:
+    def _get_terraform_modules_from_dict(self, terraform_file_dict: dict, tf_file: Path, block_lines: HclBlockLines) -> list[TerraformModule]:
         found_resources = []
         if "module" in terraform_file_dict:
             modules = terraform_file_dict["module"]
@@ -102,29 +292,47 @@ class HclHandler(HclHandlerInterface):
                 if "version" not in value:
                     log.debug(f"Skipping module '{module_name}' because it has no version attribute.")
                     continue
-                start_line_number = self._get_start_line_number(content, file=tf_file, search_regex=f'module\s+"{module_name}"\s+\{{')
+                start_line_number = self._get_start_line_number(block_lines.modules, file=tf_file, name=module_name)
                 found_resources.append(
                     TerraformModule(name=module_name, source_string=value["source"], current_version=value["version"], source_file=tf_file, start_line_number=start_line_number)
                 )
         return found_resources
 
-    def _get_start_line_number(self, content: str, file: Path, search_regex: str) -> int:
-        result = re.search(search_regex, content, re.DOTALL)
-        if result is None:
-            raise Exception(f"Could not find line matching regex '{search_regex}' in file '{file.name}'")
-        line_number = content[: result.start()].count("\n") + 1
-        log.debug(f"Found line number {line_number} for regex '{search_regex}' in file '{file.name}'")
+    def _get_start_line_number(self, block_lines: dict[str, int], file: Path, name: str) -> int:
+        if name not in block_lines:
+            raise Exception(f"Could not find block '{name}' in file '{file.name}'")
+        line_number = block_lines[name]
+        log.debug(f"Found line number {line_number} for block '{name}' in file '{file.name}'")
         return line_number
 
     def get_all_terraform_files(self, root: Path) -> Sequence[Path]:
+        return list(self.iter_all_terraform_files(root))
+
+    def iter_all_terraform_files(self, root: Path) -> Iterator[Path]:
         if not root.is_dir():
             raise Exception(f"Path '{root}' is not a directory.")
-        search_string = "*.tf"
-        if root is not None:
-            search_string = f"{root}/**/*.tf"
-        file_paths = glob.glob(search_string, recursive=True)
-        files = [Path(file_path) for file_path in file_paths]
-        return files
+        if self.changed_files is not None:
+            if len(self._parsed_files) > 0:
+                yield from self._get_terraform_files_from_changes(root)
+                return
+            log.info("No previous scan result found, scanning all .tf files.")
+        yield from self.file_discovery.iter_files(root, ".tf")
+
+    def _get_terraform_files_from_changes(self, root: Path) -> Sequence[Path]:
+        if self.changed_files is None:
+            raise Exception("No changed files set.")
+        absolute_root = root.resolve()
+        # Start from the files of the previous scan and apply the changes, so untouched directories are never walked.
+        file_paths = {file_path for file_path in self._parsed_files if file_path.is_relative_to(absolute_root)}
+        for changed_file in self.changed_files:
+            if not changed_file.is_relative_to(absolute_root):
+                continue
+            if changed_file.suffix == ".tf" and changed_file.is_file():
+                file_paths.add(changed_file)
+            else:
+                file_paths.discard(changed_file)
+        log.debug(f"Scanning {len(file_paths)} .tf files, {len(self.changed_files)} files changed since the previous scan.")
+        return [root.joinpath(file_path.relative_to(absolute_root)) for file_path in sorted(file_paths)]
 
     def get_credentials_form_user_rc_file(self) -> dict[str, str]:
         # get the home of the user
@@ -0,0 +1,123 @@
+import logging as log
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Protocol, Sequence, Union
+
+from infrapatch.core.utils.atomic_file import write_file_atomic
+from infrapatch.core.utils.terraform.hcl_block_locator import identifier_re, skip_comment, skip_heredoc, skip_string
+from infrapatch.core.utils.terraform.hcl_file_cache import HclFileCache
+
+
+class HclVersionRewriterException(Exception):
+    pass
+
+
+_attribute_value_re = re.compile(r'[ \t]*[=:](?!=)[ \t]*"')
+
+
+@dataclass
+class HclVersionUpdate:
+    # Line of the block header, for example 'module "name" {' or 'name = {' inside required_providers.
+    start_line_number: int
+    current_version: str
+    new_version: str
+
+
+@dataclass
+class _VersionSpan:
+    start: int
+    end: int
+    value: str
+
+
+class HclVersionRewriterInterface(Protocol):
+    def update_versions(self, file: Path, updates: Sequence[HclVersionUpdate]) -> Sequence[Union[Exception, None]]: ...
+
+
+class HclVersionRewriter(HclVersionRewriterInterface):
+    # Replaces the value of the version attribute in place, everything else in the file stays untouched.
+    def __init__(self, file_cache: Union[HclFileCache, None] = None) -> None:
+        # Files which were already read for parsing are not read again.
+        self.file_cache = file_cache if file_cache is not None else HclFileCache()
+
+    def update_versions(self, file: Path, updates: Sequence[HclVersionUpdate]) -> Sequence[Union[Exception, None]]:
+        file_content = self.file_cache.get(file)
+        content = file_content.content
+        line_offsets = file_content.get_line_offsets()
+
+        errors: list[Union[Exception, None]] = []
+        spans: list[tuple[_VersionSpan, str]] = []
+        for update in updates:
+            try:
+                span = self._find_version_span(content, line_offsets, update.start_line_number)
+                if span.value != update.current_version:
+                    raise HclVersionRewriterException(f"Expected version '{update.current_version}' at line {update.start_line_number}, found '{span.value}'.")
+            except Exception as e:
+                log.debug(f"Could not rewrite version of block at line {update.start_line_number} in file '{file}': {e}")
+                errors.append(e)
+                continue
+            spans.append((span, update.new_version))
+            errors.append(None)
+
+        if len(spans) == 0:
+            return errors
+        # Replace from the end of the file, so the offsets of the remaining spans stay valid.
+        for span, new_version in sorted(spans, key=lambda item: item[0].start, reverse=True):
+            content = content[: span.start] + new_version + content[span.end :]
+        write_file_atomic(file, content)
+        self.file_cache.set(file, content)
+        log.debug(f"Rewrote {len(spans)} versions in file '{file}'.")
+        return errors
+
+    def _find_version_span(self, content: str, line_offsets: list[int], start_line_number: int) -> _VersionSpan:
+        if start_line_number < 1 or start_line_number > len(line_offsets):
+            raise HclVersionRewriterException(f"Line {start_line_number} does not exist.")
+        position = line_offsets[start_line_number - 1]
+        depth = 0
+        expect_key = False
+        length = len(content)
+        while position < length:
+            char = content[position]
+            if char in "#/" and (comment_end := skip_comment(content, position)) != position:
+                position = comment_end
+            elif char == '"':
+                position = skip_string(content, position)
+                expect_key = False
+            elif char == "<" and depth > 0 and content.startswith("<<", position):
+                position = skip_heredoc(content, position)
+                expect_key = False
+            elif char in "{[(":
+                depth += 1
+                expect_key = depth == 1
+                position += 1
+            elif char in "}])":
+                depth -= 1
+                if depth <= 0:
+                    break
+                position += 1
+            elif char == "\n" or char == ",":
+                expect_key = depth == 1
+                position += 1
+            elif char in " \t\r":
+                position += 1
+            elif depth == 1 and expect_key and (match := identifier_re.match(content, position)):
+                position = match.end()
+                expect_key = False
+                if match.group() == "version":
+                    return self._get_attribute_value_span(content, position, start_line_number)
+            else:
+                expect_key = False
+                position += 1
+        raise HclVersionRewriterException(f"No version attribute found in block at line {start_line_number}.")
+
+    def _get_attribute_value_span(self, content: str, position: int, start_line_number: int) -> _VersionSpan:
+        match = _attribute_value_re.match(content, position)
+        if match is None:
+            raise HclVersionRewriterException(f"Version attribute of block at line {start_line_number} is not a string literal.")
+        start = match.end()
+        end = skip_string(content, start - 1) - 1
+        value = content[start:end]
+        if "${" in value or "%{" in value or "\\" in value:
+            raise HclVersionRewriterException(f"Version attribute of block at line {start_line_number} is not a plain string.")
+        return _VersionSpan(start=start, end=end, value=value)
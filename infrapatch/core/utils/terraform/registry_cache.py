@@ -0,0 +1,83 @@
+import hashlib
+import json
+import logging as log
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Protocol, Union
+
+from infrapatch.core.utils.atomic_file import write_file_atomic
+
+
+class RegistryCacheException(Exception):
+    pass
+
+
+@dataclass
+class RegistryCacheEntry:
+    url: str
+    body: str
+    expires_at: float
+    etag: Union[str, None] = None
+    last_modified: Union[str, None] = None
+
+    def is_expired(self) -> bool:
+        return time.time() >= self.expires_at
+
+
+class RegistryCacheInterface(Protocol):
+    def get(self, url: str) -> Union[RegistryCacheEntry, None]: ...
+
+    def set(self, entry: RegistryCacheEntry): ...
+
+    def prune(self) -> int: ...
+
+
+class RegistryResponseCache(RegistryCacheInterface):
+    def __init__(self, cache_path: Path):
+        self.cache_path = cache_path
+        if self.cache_path.exists() and not self.cache_path.is_dir():
+            raise RegistryCacheException(f"Registry cache path '{self.cache_path.absolute().as_posix()}' is not a directory.")
+        self.cache_path.mkdir(parents=True, exist_ok=True)
+
+    def _get_entry_path(self, url: str) -> Path:
+        return self.cache_path.joinpath(f"{hashlib.sha256(url.encode()).hexdigest()}.json")
+
+    def get(self, url: str) -> Union[RegistryCacheEntry, None]:
+        entry_path = self._get_entry_path(url)
+        if not entry_path.exists():
+            log.debug(f"No registry cache entry found for '{url}'.")
+            return None
+        try:
+            with open(entry_path, "r") as file:
+                entry = RegistryCacheEntry(**json.load(file))
+        except Exception as e:
+            log.debug(f"Ignoring unreadable registry cache entry '{entry_path.name}': {e}")
+            return None
+        if entry.url != url:
+            log.debug(f"Registry cache entry '{entry_path.name}' belongs to another url, ignoring it.")
+            return None
+        return entry
+
+    def set(self, entry: RegistryCacheEntry):
+        entry_path = self._get_entry_path(entry.url)
+        # Entries are replaced atomically, so concurrent readers never see a partially written entry.
+        try:
+            write_file_atomic(entry_path, json.dumps(asdict(entry)))
+        except Exception as e:
+            raise RegistryCacheException(f"Could not write registry cache entry for '{entry.url}': {e}")
+
+    def prune(self) -> int:
+        pruned_entries = 0
+        for entry_path in self.cache_path.glob("*.json"):
+            try:
+                with open(entry_path, "r") as file:
+                    entry = RegistryCacheEntry(**json.load(file))
+                if not entry.is_expired():
+                    continue
+            except Exception as e:
+                log.debug(f"Removing unreadable registry cache entry '{entry_path.name}': {e}")
+            entry_path.unlink(missing_ok=True)
+            pruned_entries += 1
+        log.debug(f"Pruned {pruned_entries} entries from registry cache '{self.cache_path.absolute().as_posix()}'.")
+        return pruned_entries
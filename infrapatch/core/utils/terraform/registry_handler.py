@@ -1,13 +1,16 @@
 import json
 import logging as log
 from dataclasses import dataclass
-from distutils.version import StrictVersion
-import re
-from typing import Protocol, Union
-from urllib import request
+import threading
+import time
+from typing import Any, Protocol, Union
 from urllib.parse import urlparse
 
+import infrapatch.core.constants as cs
 from infrapatch.core.models.versioned_terraform_resources import TerraformModule, TerraformProvider, VersionedTerraformResource
+from infrapatch.core.utils.terraform.registry_cache import RegistryCacheEntry, RegistryCacheException, RegistryCacheInterface
+from infrapatch.core.utils.terraform.registry_transport import RegistryResponse, RegistryTransportInterface, get_default_registry_transport
+from infrapatch.core.utils.version_selection import VersionSet
 
 
 class TerraformRegistryException(Exception):
@@ -19,20 +22,41 @@ class RegistryHandlerInterface(Protocol):
 
     def get_source(self, resource: VersionedTerraformResource): ...
 
+    def get_version_set(self, resource: VersionedTerraformResource): ...
+
+    def close(self): ...
+
 
 @dataclass
 class TerraformRegistryResourceCache:
     newest_version: Union[str, None] = None
     source: Union[str, None] = None
+    # All versions of the resource, so further version queries need no request.
+    versions: Union[VersionSet, None] = None
 
 
 class RegistryHandler(RegistryHandlerInterface):
-    def __init__(self, default_registry_domain: str, credentials: dict):
+    def __init__(
+        self,
+        default_registry_domain: str,
+        credentials: dict,
+        response_cache: Union[RegistryCacheInterface, None] = None,
+        transport: Union[RegistryTransportInterface, None] = None,
+    ):
         self.default_registry_domain = default_registry_domain
+        self.response_cache = response_cache
+        if transport is None:
+            transport = get_default_registry_transport()
+        self.transport = transport
         self.cached_registry_metadata = {}
         self.module_cache: dict[str, TerraformRegistryResourceCache] = {}
         self.provider_cache: dict[str, TerraformRegistryResourceCache] = {}
         self.credentials = credentials
+        self._metadata_lock = threading.Lock()
+
+    def close(self):
+        # Closes the open registry connections, the handler can still be used afterwards.
+        self.transport.close()
 
     def get_newest_version(self, resource: VersionedTerraformResource) -> Union[str, None]:
         if not isinstance(resource, TerraformModule) and not isinstance(resource, TerraformProvider):
@@ -42,12 +66,31 @@ class RegistryHandler(RegistryHandlerInterface):
         if cache.newest_version is not None:
             return cache.newest_version
 
+        version_set = self.get_version_set(resource)
+        if version_set is None:
+            return None
+        newest_version = version_set.get_newest()
+        if newest_version is None:
+            log.debug(f"None of the versions of resource '{resource.source}' has a supported format.")
+            return None
+
+        cache.newest_version = newest_version
+
+        return newest_version
+
+    def get_version_set(self, resource: VersionedTerraformResource) -> Union[VersionSet, None]:
+        if not isinstance(resource, TerraformModule) and not isinstance(resource, TerraformProvider):
+            raise Exception(f"Resource type '{type(resource)}' is not supported.")
+
+        cache = self._get_from_cache(resource)
+        if cache.versions is not None:
+            return cache.versions
+
         registry_api_base_endpoint, registry_base_domain = self._compose_base_url(resource)
         version_endpoint = f"{registry_api_base_endpoint}/versions"
         log.debug(f"Getting versions from {version_endpoint}")
 
-        response = self._send_request(version_endpoint, registry_base_domain)
-        response_data = json.loads(response.read())
+        response_data = self._get_json(version_endpoint, registry_base_domain, cs.REGISTRY_CACHE_VERSIONS_TTL)
         if isinstance(resource, TerraformModule):
             versions = response_data["modules"][0]["versions"]
         elif isinstance(resource, TerraformProvider):
@@ -58,23 +101,8 @@ class RegistryHandler(RegistryHandlerInterface):
             log.debug(f"No versions found for resource '{resource.source}'.")
             return None
 
-        valid_versions = []
-        version_re = re.compile(r"^(\d+) \. (\d+) (\. (\d+))? ([ab](\d+))?$", re.VERBOSE | re.ASCII)
-        for version in versions:
-            if version["version"] is None:
-                continue
-            match = version_re.match(version["version"])
-            if not match:
-                log.debug(f"Version '{version['version']}' does not match the expected format, ignoring it.")
-                continue
-            valid_versions.append(version["version"])
-
-        sorted_versions = sorted(valid_versions, key=lambda k: StrictVersion(k), reverse=True)
-        newest_version = sorted_versions[0]
-
-        cache.newest_version = newest_version
-
-        return newest_version
+        cache.versions = VersionSet(version["version"] for version in versions)
+        return cache.versions
 
     def _get_from_cache(self, resource: VersionedTerraformResource) -> TerraformRegistryResourceCache:
         if isinstance(resource, TerraformModule):
@@ -127,11 +155,10 @@ class RegistryHandler(RegistryHandlerInterface):
         base_endpoint, registry_base_domain = self._compose_base_url(resource)
         version_info_endpoint = f"{base_endpoint}/{resource.newest_version_base}"
         try:
-            response = self._send_request(version_info_endpoint, registry_base_domain)
+            response_data = self._get_json(version_info_endpoint, registry_base_domain, cs.REGISTRY_CACHE_VERSION_INFO_TTL)
         except TerraformRegistryException as e:
             log.debug(f"Could not get source for resource '{resource.source}': {e}")
             return None
-        response_data = json.loads(response.read())
         if "source" not in response_data:
             log.debug(f"Source not found in response data: {response_data}")
             return None
@@ -140,31 +167,76 @@ class RegistryHandler(RegistryHandlerInterface):
         cache.source = source
         return source
 
-    def _send_request(self, url: str, registry_base_domain: str):
-        request_object = request.Request(url)
+    def _get_json(self, url: str, registry_base_domain: str, ttl: int) -> Any:
+        if self.response_cache is None:
+            response = self._send_request(url, registry_base_domain)
+            return json.loads(response.read())
+
+        cached_entry = self.response_cache.get(url)
+        if cached_entry is not None and not cached_entry.is_expired():
+            log.debug(f"Using cached registry response for '{url}'.")
+            return json.loads(cached_entry.body)
+
+        headers = {}
+        if cached_entry is not None:
+            if cached_entry.etag is not None:
+                headers["If-None-Match"] = cached_entry.etag
+            if cached_entry.last_modified is not None:
+                headers["If-Modified-Since"] = cached_entry.last_modified
+
+        response = self._send_request(url, registry_base_domain, headers)
+        if response.status == 304 and cached_entry is not None:
+            log.debug(f"Cached registry response for '{url}' is still valid, extending its lifetime.")
+            cached_entry.expires_at = time.time() + ttl
+            self._set_cache_entry(cached_entry)
+            return json.loads(cached_entry.body)
+
+        body = response.read().decode()
+        self._set_cache_entry(
+            RegistryCacheEntry(url=url, body=body, expires_at=time.time() + ttl, etag=response.headers.get("ETag"), last_modified=response.headers.get("Last-Modified"))
+        )
+        return json.loads(body)
+
+    def _set_cache_entry(self, entry: RegistryCacheEntry):
+        if self.response_cache is None:
+            return
+        try:
+            self.response_cache.set(entry)
+        except RegistryCacheException as e:
+            # The cache only saves requests of later runs, the scan continues without it.
+            log.warning(f"Could not cache registry response for '{entry.url}': {e}")
+
+    def _send_request(self, url: str, registry_base_domain: str, headers: Union[dict[str, str], None] = None) -> RegistryResponse:
+        if headers is None:
+            headers = {}
+        request_headers = dict(headers)
 
         if registry_base_domain in self.credentials:
             token = self.credentials[registry_base_domain]
             log.debug(f"Found credentials for registry '{registry_base_domain}', using token: {token[0:5]}...")
-            request_object.add_header("Authorization", f"Bearer {token}")
+            request_headers["Authorization"] = f"Bearer {token}"
         else:
             log.debug(f"No credentials found for registry '{registry_base_domain}', using unauthenticated request.")
         try:
-            response = request.urlopen(request_object)
+            response = self.transport.send(url, request_headers)
         except Exception as e:
             raise TerraformRegistryException(f"Registry request returned an error '{url}': {e}")
+        if response.status == 304 and len(headers) > 0:
+            # Only expected for conditional requests, the cached response is still valid.
+            return response
         if response.status == 404:
             raise TerraformRegistryException(f"Registry resource '{url}' not found.")
-        elif response.status >= 400:
+        elif response.status >= 300:
             raise TerraformRegistryException(f"Registry request '{url}' returned error code '{response.status}'.")
         return response
 
     def get_registry_metadata(self, registry_base_domain: str) -> dict:
-        if registry_base_domain in self.cached_registry_metadata:
-            log.debug(f"Registry metadata for '{registry_base_domain}' already cached.")
-            return self.cached_registry_metadata[registry_base_domain]
-        discovery_url = f"https://{registry_base_domain}/.well-known/terraform.json"
-        response = self._send_request(discovery_url, registry_base_domain)
-        metadata = json.loads(response.read())
-        self.cached_registry_metadata[registry_base_domain] = metadata
-        return metadata
+        # Lookups run concurrently, the lock ensures the discovery document is only fetched once per registry.
+        with self._metadata_lock:
+            if registry_base_domain in self.cached_registry_metadata:
+                log.debug(f"Registry metadata for '{registry_base_domain}' already cached.")
+                return self.cached_registry_metadata[registry_base_domain]
+            discovery_url = f"https://{registry_base_domain}/.well-known/terraform.json"
+            metadata = self._get_json(discovery_url, registry_base_domain, cs.REGISTRY_CACHE_METADATA_TTL)
+            self.cached_registry_metadata[registry_base_domain] = metadata
+            return metadata
@@ -0,0 +1,193 @@
+import http.client
+import logging as log
+import queue
+import threading
+from dataclasses import dataclass
+from email.message import Message
+from typing import Protocol, Union
+from urllib import error, request
+from urllib.parse import SplitResult, urljoin, urlsplit
+
+import infrapatch.core.constants as cs
+
+
+class RegistryTransportException(Exception):
+    pass
+
+
+@dataclass
+class RegistryResponse:
+    url: str
+    status: int
+    headers: Message
+    body: bytes
+
+    def read(self) -> bytes:
+        return self.body
+
+
+class RegistryTransportInterface(Protocol):
+    def send(self, url: str, headers: dict[str, str]) -> RegistryResponse: ...
+
+    def close(self): ...
+
+
+class UrllibRegistryTransport(RegistryTransportInterface):
+    # Opens a new connection for every request, but honors the proxy configuration of the environment.
+    def send(self, url: str, headers: dict[str, str]) -> RegistryResponse:
+        request_object = request.Request(url, headers=headers)
+        try:
+            with request.urlopen(request_object) as response:
+                return RegistryResponse(url=response.url, status=response.status, headers=response.headers, body=response.read())
+        except error.HTTPError as e:
+            return RegistryResponse(url=url, status=e.code, headers=e.headers, body=e.read())
+        except Exception as e:
+            raise RegistryTransportException(f"Request to '{url}' failed: {e}")
+
+    def close(self):
+        pass
+
+
+class _HostConnectionPool:
+    def __init__(self, scheme: str, host: str, port: Union[int, None], max_connections: int, timeout: float):
+        self.scheme = scheme
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self._idle_connections: queue.LifoQueue[http.client.HTTPConnection] = queue.LifoQueue()
+        self._connection_slots = threading.BoundedSemaphore(max_connections)
+        self._closed = False
+
+    def _create_connection(self) -> http.client.HTTPConnection:
+        log.debug(f"Opening new connection to {self.scheme}://{self.host}.")
+        if self.scheme == "https":
+            return http.client.HTTPSConnection(self.host, self.port, timeout=self.timeout)
+        return http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+
+    def _acquire(self) -> tuple[http.client.HTTPConnection, bool]:
+        self._connection_slots.acquire()
+        try:
+            return self._idle_connections.get_nowait(), True
+        except queue.Empty:
+            return self._create_connection(), False
+
+    def _release(self, connection: http.client.HTTPConnection, reusable: bool):
+        # Connections of requests which were still running when the pool was closed are not kept either.
+        if reusable and not self._closed:
+            self._idle_connections.put(connection)
+        else:
+            connection.close()
+        self._connection_slots.release()
+
+    def send(self, path: str, headers: dict[str, str]) -> tuple[int, Message, bytes]:
+        connection, reused = self._acquire()
+        try:
+            try:
+                response = self._request(connection, path, headers)
+            except (http.client.HTTPException, OSError) as e:
+                if not reused:
+                    raise
+                # The server may have closed an idle keep-alive connection, retry once on a fresh one.
+                log.debug(f"Reused connection to {self.host} failed, retrying with a new connection: {e}")
+                connection.close()
+                connection = self._create_connection()
+                response = self._request(connection, path, headers)
+        except BaseException:
+            self._release(connection, reusable=False)
+            raise
+        status, response_headers, body, will_close = response
+        self._release(connection, reusable=not will_close)
+        return status, response_headers, body
+
+    def _request(self, connection: http.client.HTTPConnection, path: str, headers: dict[str, str]) -> tuple[int, Message, bytes, bool]:
+        connection.request("GET", path, headers=headers)
+        response = connection.getresponse()
+        # The body has to be read completely before the connection can be reused.
+        body = response.read()
+        return response.status, response.headers, body, response.will_close
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                self._idle_connections.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+class PooledRegistryTransport(RegistryTransportInterface):
+    # Keeps connections open between requests. Hosts which must be reached through a proxy are requested with urllib instead.
+    def __init__(self, max_connections_per_host: int = cs.DEFAULT_REGISTRY_CONNECTIONS_PER_HOST, timeout: float = cs.REGISTRY_REQUEST_TIMEOUT):
+        if max_connections_per_host < 1:
+            raise Exception(f"Max connections per host must be at least 1, got {max_connections_per_host}.")
+        self.max_connections_per_host = max_connections_per_host
+        self.timeout = timeout
+        self._pools: dict[tuple[str, str, Union[int, None]], _HostConnectionPool] = {}
+        self._pools_lock = threading.Lock()
+        self._proxies = request.getproxies()
+        self._proxy_transport = UrllibRegistryTransport()
+        # Proxy decision by scheme and host, proxy_bypass reads the environment on every call.
+        self._uses_proxy_by_host: dict[tuple[str, str], bool] = {}
+
+    def uses_proxy(self, url: SplitResult) -> bool:
+        # A proxy is used if one is configured for the scheme of the url and NO_PROXY does not exclude the host.
+        if url.scheme not in self._proxies or url.hostname is None:
+            return False
+        key = (url.scheme, url.hostname)
+        with self._pools_lock:
+            uses_proxy = self._uses_proxy_by_host.get(key)
+        if uses_proxy is None:
+            uses_proxy = not request.proxy_bypass(url.hostname)
+            log.debug(f"Requests to {url.scheme}://{url.hostname} {'use' if uses_proxy else 'bypass'} the configured proxy.")
+            with self._pools_lock:
+                self._uses_proxy_by_host[key] = uses_proxy
+        return uses_proxy
+
+    def _get_pool(self, url: SplitResult) -> _HostConnectionPool:
+        if url.scheme not in ["http", "https"] or url.hostname is None:
+            raise RegistryTransportException(f"Unsupported registry url '{url.geturl()}'.")
+        key = (url.scheme, url.hostname, url.port)
+        with self._pools_lock:
+            if key not in self._pools:
+                self._pools[key] = _HostConnectionPool(url.scheme, url.hostname, url.port, self.max_connections_per_host, self.timeout)
+            return self._pools[key]
+
+    def send(self, url: str, headers: dict[str, str]) -> RegistryResponse:
+        for _ in range(cs.REGISTRY_MAX_REDIRECTS + 1):
+            parsed_url = urlsplit(url)
+            if self.uses_proxy(parsed_url):
+                return self._proxy_transport.send(url, headers)
+            path = parsed_url.path or "/"
+            if parsed_url.query:
+                path = f"{path}?{parsed_url.query}"
+            try:
+                status, response_headers, body = self._get_pool(parsed_url).send(path, headers)
+            except RegistryTransportException:
+                raise
+            except Exception as e:
+                raise RegistryTransportException(f"Request to '{url}' failed: {e}")
+            location = response_headers.get("Location")
+            if status in [301, 302, 303, 307, 308] and location is not None:
+                redirect_url = urljoin(url, location)
+                if urlsplit(redirect_url).hostname != parsed_url.hostname:
+                    # Never forward credentials to another host.
+                    headers = {key: value for key, value in headers.items() if key.lower() != "authorization"}
+                log.debug(f"Following redirect from '{url}' to '{redirect_url}'.")
+                url = redirect_url
+                continue
+            return RegistryResponse(url=url, status=status, headers=response_headers, body=body)
+        raise RegistryTransportException(f"Too many redirects for '{url}'.")
+
+    def close(self):
+        # Later requests open new pools, so closing never breaks a transport which is still in use.
+        with self._pools_lock:
+            pools = list(self._pools.values())
+            self._pools.clear()
+        log.debug(f"Closing {len(pools)} registry connection pools.")
+        for pool in pools:
+            pool.close()
+        self._proxy_transport.close()
+
+
+def get_default_registry_transport(max_connections_per_host: int = cs.DEFAULT_REGISTRY_CONNECTIONS_PER_HOST) -> RegistryTransportInterface:
+    return PooledRegistryTransport(max_connections_per_host)
@@ -0,0 +1,58 @@
+import pytest
+
+from infrapatch.core.utils.terraform.hcl_block_locator import HclBlockLocator
+
+
+@pytest.fixture
+def block_locator():
+    return HclBlockLocator()
+
+
+def test_locate_blocks(block_locator: HclBlockLocator):
+    content = """# module "commented" {
+terraform {
+  required_providers {
+    aws = {
+      source = "hashicorp/aws"
+    }
+    "azurerm" = { source = "hashicorp/azurerm" }
+  }
+}
+
+/* module "commented_block" {
+} */
+module "test_module" {
+  source = "test/test_module/aws"
+  description = <<EOT
+module "in_heredoc" {
+EOT
+  name = "${var.prefix}-{module}"
+  providers = {
+    aws = aws
+  }
+}
+
+module   "test_module2"   {
+  source = "test/test_module/aws"
+}
+module "test_module" {
+}
+"""
+    block_lines = block_locator.locate(content)
+    assert block_lines.modules == {"test_module": 13, "test_module2": 24}
+    assert block_lines.providers == {"aws": 4, "azurerm": 7}
+
+
+def test_locate_blocks_ignores_nested_blocks(block_locator: HclBlockLocator):
+    content = """resource "test" "test" {
+  module "nested" {
+  }
+  required_providers {
+    aws = {
+    }
+  }
+}
+"""
+    block_lines = block_locator.locate(content)
+    assert block_lines.modules == {}
+    assert block_lines.providers == {}
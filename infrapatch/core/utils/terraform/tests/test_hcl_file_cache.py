@@ -0,0 +1,59 @@
+import os
+from pathlib import Path
+from unittest.mock import patch
+
+from infrapatch.core.utils.terraform.hcl_file_cache import HclFileCache
+
+
+def test_get_reads_files_once(tmp_path: Path):
+    tf_file = tmp_path.joinpath("main.tf")
+    tf_file.write_bytes(b'module "a" {\r\n  version = "1.0.0"\r\n}\r\n')
+    os.utime(tf_file, ns=(0, 0))
+    file_cache = HclFileCache()
+
+    file_content = file_cache.get(tf_file)
+
+    assert file_cache.get(tf_file) is file_content
+    assert file_content.content == 'module "a" {\r\n  version = "1.0.0"\r\n}\r\n'
+    assert file_content.get_text() == 'module "a" {\n  version = "1.0.0"\n}\n'
+    assert file_content.get_line_offsets() == [0, 14, 35, 38]
+
+
+def test_get_detects_changed_files(tmp_path: Path):
+    tf_file = tmp_path.joinpath("main.tf")
+    tf_file.write_text('module "a" {}\n')
+    file_cache = HclFileCache()
+    file_cache.get(tf_file)
+
+    tf_file.write_text('module "ab" {}\n')
+
+    assert file_cache.get(tf_file).content == 'module "ab" {}\n'
+
+
+def test_get_rereads_recently_modified_files(tmp_path: Path):
+    tf_file = tmp_path.joinpath("main.tf")
+    tf_file.write_text('module "a" {}\n')
+    file_cache = HclFileCache()
+    file_cache.get(tf_file)
+    stat = os.stat(tf_file)
+
+    # A rewrite within the timestamp granularity can keep size and mtime
+    tf_file.write_text('module "b" {}\n')
+    os.utime(tf_file, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+    assert file_cache.get(tf_file).content == 'module "b" {}\n'
+
+
+def test_set_updates_written_files(tmp_path: Path):
+    tf_file = tmp_path.joinpath("main.tf")
+    tf_file.write_text('module "a" {}\n')
+    file_cache = HclFileCache()
+    file_cache.get(tf_file)
+
+    tf_file.write_text('module "b" {}\n')
+    file_cache.set(tf_file, 'module "b" {}\n')
+
+    # Written content is served from memory, even though the file was just modified
+    with patch("builtins.open", side_effect=AssertionError("file was read again")):
+        assert file_cache.get(tf_file).content == 'module "b" {}\n'
+    assert len(file_cache) == 1
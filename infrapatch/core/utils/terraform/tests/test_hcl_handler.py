@@ -1,9 +1,12 @@
+import os
 from pathlib import Path
-from unittest.mock import patch
+from unittest.mock import MagicMock, patch
 
+import pygohcl
 import pytest
 
 from infrapatch.core.models.versioned_terraform_resources import TerraformModule, TerraformProvider
+from infrapatch.core.utils.options_processor import OptionsProcessor
 from infrapatch.core.utils.terraform.hcl_edit_cli import HclEditCli
 from infrapatch.core.utils.terraform.hcl_handler import HclHandler, HclParserException
 
@@ -52,6 +55,29 @@ def valid_terraform_code():
     """
 
 
+@pytest.fixture
+def terraform_code_with_options_for_manifest():
+    return """
+        terraform {
+            required_providers {
+                test_provider = {
+                    source = "test_provider/test_provider"
+                    version = ">1.0.0"
+                }
+            }
+        }
+        module "test_module" {
+            source = "test/test_module/test_provider"
+            version = "2.0.0"
+        }
+        # infrapatch_options: ignore_resource=true
+        module "test_module2" {
+            source = "spacelift.io/test/test_module/test_provider"
+            version = "1.0.2"
+        }
+    """
+
+
 @pytest.fixture
 def invalid_terraform_code():
     return """
@@ -220,3 +246,279 @@ def test_get_credentials_form_user_rc_file(hcl_handler, tmp_user_home: Path):
 
         # Clean up the temporary file
         terraform_rc_file.unlink()
+
+
+def test_iter_terraform_resources_from_files(valid_terraform_code: str, tmp_path: Path):
+    tf_files = []
+    for i in range(20):
+        tf_file = tmp_path.joinpath(f"file{i}.tf")
+        tf_file.write_text(valid_terraform_code.replace('module "test_module2"', f'module "test_module_file{i}"'))
+        tf_files.append(tf_file)
+
+    serial_handler = HclHandler(hcl_edit_cli=HclEditCli(), parser_workers=1)
+    parallel_handler = HclHandler(hcl_edit_cli=HclEditCli(), parser_workers=4)
+    serial_resources = list(serial_handler.iter_terraform_resources_from_files(tf_files))
+    parallel_resources = list(parallel_handler.iter_terraform_resources_from_files(tf_files))
+
+    assert len(parallel_resources) == len(tf_files)
+    assert parallel_resources == serial_resources
+    for i, file_resources in enumerate(parallel_resources):
+        assert all(resource.source_file == tf_files[i] for resource in file_resources)
+        assert f"test_module_file{i}" in [resource.name for resource in file_resources]
+
+
+def test_iter_terraform_resources_from_files_raises_parse_error(valid_terraform_code: str, invalid_terraform_code: str, tmp_path: Path):
+    valid_file = tmp_path.joinpath("valid.tf")
+    valid_file.write_text(valid_terraform_code)
+    invalid_file = tmp_path.joinpath("invalid.tf")
+    invalid_file.write_text(invalid_terraform_code)
+
+    hcl_handler = HclHandler(hcl_edit_cli=HclEditCli(), parser_workers=4)
+    with pytest.raises(HclParserException):
+        list(hcl_handler.iter_terraform_resources_from_files([valid_file, invalid_file, valid_file]))
+
+
+def test_parse_results_are_shared_between_calls(hcl_handler: HclHandler, valid_terraform_code: str, tmp_path: Path):
+    tf_file = tmp_path.joinpath("test_file.tf")
+    tf_file.write_text(valid_terraform_code)
+
+    with patch("pygohcl.loads", wraps=pygohcl.loads) as mock_loads:
+        modules = hcl_handler.get_terraform_resources_from_file(tf_file, get_modules=True, get_providers=False)
+        providers = hcl_handler.get_terraform_resources_from_file(tf_file, get_modules=False, get_providers=True)
+        assert mock_loads.call_count == 1
+
+        # Resources are copies, changes must not affect later calls
+        modules[0].newest_version = "9.9.9"
+        assert hcl_handler.get_terraform_resources_from_file(tf_file, get_modules=True, get_providers=False)[0].newest_version is None
+        assert mock_loads.call_count == 1
+
+        # Changed content invalidates the parse result
+        tf_file.write_text(valid_terraform_code.replace('version = "2.0.0"', 'version = "2.1.0"'))
+        modules = hcl_handler.get_terraform_resources_from_file(tf_file, get_modules=True, get_providers=False)
+        assert mock_loads.call_count == 2
+
+    assert len(providers) == 2
+    assert [module.current_version for module in modules if module.name == "test_module"] == ["2.1.0"]
+
+
+def test_scan_manifest(terraform_code_with_options_for_manifest: str, tmp_path: Path):
+    tf_file = tmp_path.joinpath("test_file.tf")
+    tf_file.write_text(terraform_code_with_options_for_manifest)
+    manifest_file = tmp_path.joinpath("manifest.json")
+
+    hcl_handler = HclHandler(hcl_edit_cli=HclEditCli(), options_processor=OptionsProcessor(), scan_manifest_file=manifest_file)
+    resources = hcl_handler.get_terraform_resources_from_file(tf_file)
+    hcl_handler.save_scan_manifest()
+    assert manifest_file.exists()
+
+    # A new handler restores the resources from the manifest without parsing the file
+    hcl_handler = HclHandler(hcl_edit_cli=HclEditCli(), options_processor=OptionsProcessor(), scan_manifest_file=manifest_file)
+    with patch("pygohcl.loads") as mock_loads:
+        restored_resources = hcl_handler.get_terraform_resources_from_file(tf_file)
+        assert mock_loads.call_count == 0
+    assert [resource.model_dump() for resource in restored_resources] == [resource.model_dump() for resource in resources]
+    assert [type(resource) for resource in restored_resources] == [type(resource) for resource in resources]
+    assert [resource.name for resource in restored_resources if resource.options.ignore_resource] == ["test_module2"]
+    assert all("options" in resource.model_fields_set for resource in restored_resources)
+
+    # Changed files are parsed again
+    tf_file.write_text(terraform_code_with_options_for_manifest.replace('version = "2.0.0"', 'version = "2.1.0"'))
+    with patch("pygohcl.loads", wraps=pygohcl.loads) as mock_loads:
+        changed_resources = hcl_handler.get_terraform_resources_from_file(tf_file)
+        assert mock_loads.call_count == 1
+    assert [resource.current_version for resource in changed_resources if resource.name == "test_module"] == ["2.1.0"]
+
+
+def test_scan_manifest_detects_rewrite_with_same_stat(valid_terraform_code: str, tmp_path: Path):
+    tf_file = tmp_path.joinpath("test_file.tf")
+    tf_file.write_text(valid_terraform_code)
+    manifest_file = tmp_path.joinpath("manifest.json")
+    hcl_handler = HclHandler(hcl_edit_cli=MagicMock(), scan_manifest_file=manifest_file)
+    hcl_handler.get_terraform_resources_from_file(tf_file)
+    hcl_handler.save_scan_manifest()
+    stat = os.stat(tf_file)
+
+    # A rewrite within the timestamp granularity of the scan keeps size and mtime
+    tf_file.write_text(valid_terraform_code.replace('version = "2.0.0"', 'version = "2.1.0"'))
+    os.utime(tf_file, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert os.stat(tf_file).st_size == stat.st_size
+
+    hcl_handler = HclHandler(hcl_edit_cli=MagicMock(), scan_manifest_file=manifest_file)
+    modules = hcl_handler.get_terraform_resources_from_file(tf_file, get_providers=False)
+    assert [module.current_version for module in modules if module.name == "test_module"] == ["2.1.0"]
+
+
+def test_scan_manifest_trusts_stat_of_old_files(valid_terraform_code: str, tmp_path: Path):
+    tf_file = tmp_path.joinpath("test_file.tf")
+    tf_file.write_text(valid_terraform_code)
+    os.utime(tf_file, ns=(0, 0))
+    manifest_file = tmp_path.joinpath("manifest.json")
+    hcl_handler = HclHandler(hcl_edit_cli=MagicMock(), scan_manifest_file=manifest_file)
+    hcl_handler.get_terraform_resources_from_file(tf_file)
+    hcl_handler.save_scan_manifest()
+
+    # Files modified long before the scan are not read again
+    hcl_handler = HclHandler(hcl_edit_cli=MagicMock(), scan_manifest_file=manifest_file)
+    with patch("builtins.open", side_effect=AssertionError("file was read again")):
+        assert len(hcl_handler.get_terraform_resources_from_file(tf_file)) == 4
+
+
+def test_scan_changed_files(terraform_code_with_options_for_manifest: str, tmp_path: Path):
+    unchanged_file = tmp_path.joinpath("unchanged.tf")
+    changed_file = tmp_path.joinpath("changed.tf")
+    removed_file = tmp_path.joinpath("removed.tf")
+    for tf_file in [unchanged_file, changed_file, removed_file]:
+        tf_file.write_text(terraform_code_with_options_for_manifest)
+    manifest_file = tmp_path.joinpath("manifest.json")
+
+    hcl_handler = HclHandler(hcl_edit_cli=HclEditCli(), scan_manifest_file=manifest_file)
+    for tf_file in hcl_handler.get_all_terraform_files(tmp_path):
+        hcl_handler.get_terraform_resources_from_file(tf_file)
+    hcl_handler.save_scan_manifest()
+
+    changed_file.write_text(terraform_code_with_options_for_manifest.replace('version = "2.0.0"', 'version = "2.1.0"'))
+    removed_file.unlink()
+    added_file = tmp_path.joinpath("added.tf")
+    added_file.write_text(terraform_code_with_options_for_manifest)
+    # Files which are not in the changes are not checked, even if they were modified
+    unchanged_file.write_text("")
+
+    hcl_handler = HclHandler(hcl_edit_cli=HclEditCli(), scan_manifest_file=manifest_file, changed_files=[changed_file, removed_file, added_file])
+    files = hcl_handler.get_all_terraform_files(tmp_path)
+    assert files == [added_file, changed_file, unchanged_file]
+    with patch("pygohcl.loads", wraps=pygohcl.loads) as mock_loads:
+        resources = {tf_file.name: hcl_handler.get_terraform_resources_from_file(tf_file) for tf_file in files}
+        assert mock_loads.call_count == 2
+    assert len(resources["unchanged.tf"]) == 3
+    assert [resource.current_version for resource in resources["changed.tf"] if resource.name == "test_module"] == ["2.1.0"]
+    hcl_handler.save_scan_manifest()
+    assert removed_file.as_posix() not in manifest_file.read_text()
+
+
+def test_scan_changed_files_below_symlink(valid_terraform_code: str, tmp_path: Path):
+    real_directory = tmp_path.joinpath("real")
+    real_directory.mkdir()
+    working_directory = tmp_path.joinpath("link")
+    working_directory.symlink_to(real_directory, target_is_directory=True)
+    unchanged_file = working_directory.joinpath("unchanged.tf")
+    changed_file = working_directory.joinpath("changed.tf")
+    for tf_file in [unchanged_file, changed_file]:
+        tf_file.write_text(valid_terraform_code)
+    manifest_file = working_directory.joinpath("manifest.json")
+    hcl_handler = HclHandler(hcl_edit_cli=MagicMock(), scan_manifest_file=manifest_file)
+    for tf_file in hcl_handler.get_all_terraform_files(working_directory):
+        hcl_handler.get_terraform_resources_from_file(tf_file)
+    hcl_handler.save_scan_manifest()
+
+    # Git reports the changed files with symlinks resolved
+    changed_file.write_text(valid_terraform_code.replace('version = "2.0.0"', 'version = "2.1.0"'))
+    unchanged_file.write_text("")
+    hcl_handler = HclHandler(hcl_edit_cli=MagicMock(), scan_manifest_file=manifest_file, changed_files=[real_directory.joinpath("changed.tf")])
+
+    files = hcl_handler.get_all_terraform_files(working_directory)
+    assert files == [changed_file, unchanged_file]
+    with patch("pygohcl.loads", wraps=pygohcl.loads) as mock_loads:
+        for tf_file in files:
+            hcl_handler.get_terraform_resources_from_file(tf_file)
+        assert mock_loads.call_count == 1
+
+
+def test_add_changed_files_after_checkout(valid_terraform_code: str, tmp_path: Path):
+    tf_file = tmp_path.joinpath("test_file.tf")
+    tf_file.write_text(valid_terraform_code)
+    manifest_file = tmp_path.joinpath("manifest.json")
+    hcl_handler = HclHandler(hcl_edit_cli=MagicMock(), scan_manifest_file=manifest_file, changed_files=[])
+    hcl_handler.get_terraform_resources_from_file(tf_file)
+
+    # A checkout changes the file, the result in memory is only used until the file is reported as changed
+    tf_file.write_text(valid_terraform_code.replace('version = "2.0.0"', 'version = "2.1.0"'))
+    modules = hcl_handler.get_terraform_resources_from_file(tf_file, get_providers=False)
+    assert [module.current_version for module in modules if module.name == "test_module"] == ["2.0.0"]
+    hcl_handler.add_changed_files([tf_file])
+    modules = hcl_handler.get_terraform_resources_from_file(tf_file, get_providers=False)
+    assert [module.current_version for module in modules if module.name == "test_module"] == ["2.1.0"]
+
+    with pytest.raises(Exception):
+        HclHandler(hcl_edit_cli=MagicMock()).add_changed_files([tf_file])
+
+
+def test_bump_resource_versions_per_file(valid_terraform_code: str, tmp_path: Path):
+    tf_file = tmp_path.joinpath("test_file.tf")
+    tf_file.write_text(valid_terraform_code)
+    hcl_edit_cli = MagicMock()
+    hcl_handler = HclHandler(hcl_edit_cli=hcl_edit_cli)
+    resources = hcl_handler.get_terraform_resources_from_file(tf_file)
+    for resource in resources:
+        resource.newest_version = "4.0.0"
+
+    results = hcl_handler.bump_resource_versions(resources)
+
+    # The versions are rewritten in process, hcledit is not needed
+    hcl_edit_cli.update_hcl_values.assert_not_called()
+    assert [result.resource for result in results] == list(resources)
+    assert all(result.error is None for result in results)
+    assert tf_file.read_text() == valid_terraform_code.replace('"2.0.0"', '"4.0.0"').replace('"1.0.2"', '"4.0.0"').replace('"1.0.5"', '"4.0.0"')
+
+
+def test_bump_resource_versions_reuses_parsed_content(valid_terraform_code: str, tmp_path: Path):
+    tf_file = tmp_path.joinpath("test_file.tf")
+    tf_file.write_text(valid_terraform_code)
+    # Recently modified files are read again, the file must be older than the timestamp granularity
+    os.utime(tf_file, ns=(0, 0))
+    hcl_handler = HclHandler(hcl_edit_cli=MagicMock())
+    resources = hcl_handler.get_terraform_resources_from_file(tf_file)
+    for resource in resources:
+        resource.newest_version = "4.0.0"
+
+    # The content read for parsing is patched, the file is not read again
+    with patch("builtins.open", side_effect=AssertionError("file was read again")):
+        results = hcl_handler.bump_resource_versions(resources)
+
+    assert all(result.error is None for result in results)
+    assert hcl_handler.file_cache.get(tf_file).content == tf_file.read_text()
+
+
+def test_bump_resource_versions_falls_back_to_hcledit(valid_terraform_code: str, tmp_path: Path):
+    tf_file = tmp_path.joinpath("test_file.tf")
+    tf_file.write_text(valid_terraform_code)
+    hcl_edit_cli = MagicMock()
+    hcl_edit_cli.update_hcl_values.side_effect = lambda file, values: {
+        address: Exception("update failed") if address == "module.test_module2.version" else None for address in values
+    }
+    version_rewriter = MagicMock()
+    version_rewriter.update_versions.side_effect = lambda file, updates: [Exception("rewrite failed") for _ in updates]
+    hcl_handler = HclHandler(hcl_edit_cli=hcl_edit_cli, version_rewriter=version_rewriter)
+    resources = hcl_handler.get_terraform_resources_from_file(tf_file)
+    for resource in resources:
+        resource.newest_version = "4.0.0"
+
+    results = hcl_handler.bump_resource_versions(resources)
+
+    # All bumps of the file are passed in a single call, resources which define a newer version are skipped
+    version_rewriter.update_versions.assert_called_once()
+    hcl_edit_cli.update_hcl_values.assert_called_once_with(
+        tf_file,
+        {"terraform.required_providers.test_provider2.version": "4.0.0", "module.test_module.version": "4.0.0", "module.test_module2.version": "4.0.0"},
+    )
+    assert [result.resource.name for result in results if result.error is not None] == ["test_module2"]
+
+
+def test_iter_terraform_resources_from_files_consumes_files_lazily(valid_terraform_code: str, tmp_path: Path):
+    tf_files = []
+    for i in range(20):
+        tf_file = tmp_path.joinpath(f"test_file{i}.tf")
+        tf_file.write_text(valid_terraform_code)
+        tf_files.append(tf_file)
+    consumed_files = []
+
+    def iter_files():
+        for tf_file in tf_files:
+            consumed_files.append(tf_file)
+            yield tf_file
+
+    hcl_handler = HclHandler(hcl_edit_cli=MagicMock(), parser_workers=2)
+    file_resources = hcl_handler.iter_terraform_resources_from_files(iter_files())
+    assert len(next(file_resources)) == 4
+    # Only a few files are parsed ahead of the consumer
+    assert len(consumed_files) == 4
+    assert len(list(file_resources)) == 19
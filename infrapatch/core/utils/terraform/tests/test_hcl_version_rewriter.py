@@ -0,0 +1,121 @@
+from pathlib import Path
+
+import pytest
+
+from infrapatch.core.utils.terraform.hcl_version_rewriter import HclVersionRewriter, HclVersionUpdate
+
+
+@pytest.fixture
+def version_rewriter():
+    return HclVersionRewriter()
+
+
+@pytest.fixture
+def terraform_code():
+    return """terraform {
+  required_providers {
+    # comment with a version = "0.0.1"
+    aws = {
+      source  = "hashicorp/aws" // keep this comment
+      version = "~> 4.0"
+    }
+    azurerm = { source = "hashicorp/azurerm", version = "3.0.0" }
+  }
+}
+
+module "test_module" {
+  source = "test/test_module/aws"
+  tags = {
+    version = "not this one"
+  }
+  description = <<EOT
+    version = "not this one either" }
+EOT
+  name    = "${var.prefix}-{version}"
+  version = "1.0.0" # pinned
+}
+
+module "no_version" {
+  source = "./local"
+}
+
+module "variable_version" {
+  source  = "test/test_module/aws"
+  version = var.version
+}
+"""
+
+
+def _write_file(tmp_path: Path, content: str) -> Path:
+    tf_file = tmp_path.joinpath("main.tf")
+    with open(tf_file, "w", newline="") as f:
+        f.write(content)
+    return tf_file
+
+
+def test_update_versions(version_rewriter: HclVersionRewriter, terraform_code: str, tmp_path: Path):
+    tf_file = _write_file(tmp_path, terraform_code)
+    errors = version_rewriter.update_versions(
+        tf_file,
+        [
+            HclVersionUpdate(start_line_number=4, current_version="~> 4.0", new_version="5.1.0"),
+            HclVersionUpdate(start_line_number=8, current_version="3.0.0", new_version="3.1.0"),
+            HclVersionUpdate(start_line_number=12, current_version="1.0.0", new_version="2.0.0"),
+        ],
+    )
+    assert errors == [None, None, None]
+    # Only the version values change, formatting and comments are kept
+    expected_code = terraform_code.replace('"~> 4.0"', '"5.1.0"').replace('version = "3.0.0"', 'version = "3.1.0"').replace('"1.0.0" # pinned', '"2.0.0" # pinned')
+    assert tf_file.read_text() == expected_code
+    assert list(tmp_path.iterdir()) == [tf_file]
+
+
+def test_update_versions_writes_through_symlink(version_rewriter: HclVersionRewriter, terraform_code: str, tmp_path: Path):
+    shared_directory = tmp_path.joinpath("shared")
+    shared_directory.mkdir()
+    shared_file = _write_file(shared_directory, terraform_code)
+    module_directory = tmp_path.joinpath("module")
+    module_directory.mkdir()
+    tf_file = module_directory.joinpath("versions.tf")
+    tf_file.symlink_to(Path("..", "shared", shared_file.name))
+
+    errors = version_rewriter.update_versions(tf_file, [HclVersionUpdate(start_line_number=12, current_version="1.0.0", new_version="2.0.0")])
+
+    # The link is kept and the shared file is updated
+    assert errors == [None]
+    assert tf_file.is_symlink()
+    assert shared_file.read_text() == terraform_code.replace('"1.0.0" # pinned', '"2.0.0" # pinned')
+    assert list(shared_directory.iterdir()) == [shared_file]
+
+
+def test_update_versions_keeps_line_endings(version_rewriter: HclVersionRewriter, terraform_code: str, tmp_path: Path):
+    tf_file = _write_file(tmp_path, terraform_code.replace("\n", "\r\n"))
+    errors = version_rewriter.update_versions(tf_file, [HclVersionUpdate(start_line_number=12, current_version="1.0.0", new_version="2.0.0")])
+    assert errors == [None]
+    with open(tf_file, newline="") as f:
+        assert f.read() == terraform_code.replace('"1.0.0" # pinned', '"2.0.0" # pinned').replace("\n", "\r\n")
+
+
+@pytest.mark.parametrize(
+    "update",
+    [
+        HclVersionUpdate(start_line_number=25, current_version="1.0.0", new_version="2.0.0"),
+        HclVersionUpdate(start_line_number=29, current_version="var.version", new_version="2.0.0"),
+        HclVersionUpdate(start_line_number=12, current_version="0.9.0", new_version="2.0.0"),
+        HclVersionUpdate(start_line_number=100, current_version="1.0.0", new_version="2.0.0"),
+    ],
+)
+def test_update_versions_reports_errors_per_update(version_rewriter: HclVersionRewriter, terraform_code: str, tmp_path: Path, update: HclVersionUpdate):
+    tf_file = _write_file(tmp_path, terraform_code)
+    errors = version_rewriter.update_versions(tf_file, [update, HclVersionUpdate(start_line_number=8, current_version="3.0.0", new_version="3.1.0")])
+    assert errors[0] is not None
+    assert errors[1] is None
+    assert tf_file.read_text() == terraform_code.replace('version = "3.0.0"', 'version = "3.1.0"')
+
+
+def test_update_versions_without_changes_does_not_write(version_rewriter: HclVersionRewriter, terraform_code: str, tmp_path: Path):
+    tf_file = _write_file(tmp_path, terraform_code)
+    modified_time = tf_file.stat().st_mtime_ns
+    errors = version_rewriter.update_versions(tf_file, [HclVersionUpdate(start_line_number=25, current_version="1.0.0", new_version="2.0.0")])
+    assert errors[0] is not None
+    assert tf_file.stat().st_mtime_ns == modified_time
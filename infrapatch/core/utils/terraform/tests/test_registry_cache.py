@@ -0,0 +1,123 @@
+import json
+import time
+from email.message import Message
+from pathlib import Path
+from typing import Union
+from unittest.mock import MagicMock
+
+import pytest
+
+from infrapatch.core.models.versioned_terraform_resources import TerraformProvider
+from infrapatch.core.utils.terraform.registry_cache import RegistryCacheEntry, RegistryCacheException, RegistryResponseCache
+from infrapatch.core.utils.terraform.registry_handler import RegistryHandler
+from infrapatch.core.utils.terraform.registry_transport import RegistryResponse
+from infrapatch.core.utils.version_selection import VersionConstraint
+
+
+class FakeTransport:
+    def __init__(self, status: int, body: Union[dict, None] = None, headers: Union[dict[str, str], None] = None):
+        self.status = status
+        self.body = body if body is not None else {}
+        self.headers = headers if headers is not None else {}
+        self.requests: list[tuple[str, dict[str, str]]] = []
+
+    def send(self, url: str, headers: dict[str, str]) -> RegistryResponse:
+        self.requests.append((url, headers))
+        response_headers = Message()
+        for key, value in self.headers.items():
+            response_headers[key] = value
+        return RegistryResponse(url=url, status=self.status, headers=response_headers, body=json.dumps(self.body).encode())
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def registry_cache(tmp_path: Path):
+    return RegistryResponseCache(tmp_path.joinpath("cache"))
+
+
+def test_set_and_get_entry(registry_cache: RegistryResponseCache):
+    entry = RegistryCacheEntry(url="https://registry.test/v1/versions", body='{"versions": []}', expires_at=time.time() + 60, etag='"abc"')
+    registry_cache.set(entry)
+
+    cached_entry = registry_cache.get(entry.url)
+    assert cached_entry == entry
+    assert cached_entry.is_expired() is False
+    assert registry_cache.get("https://registry.test/v1/other") is None
+
+
+def test_invalid_cache_path(tmp_path: Path):
+    cache_file = tmp_path.joinpath("cache_file")
+    cache_file.touch()
+    with pytest.raises(RegistryCacheException):
+        RegistryResponseCache(cache_file)
+
+
+def test_prune(registry_cache: RegistryResponseCache):
+    registry_cache.set(RegistryCacheEntry(url="https://registry.test/expired", body="{}", expires_at=time.time() - 1))
+    registry_cache.set(RegistryCacheEntry(url="https://registry.test/valid", body="{}", expires_at=time.time() + 60))
+    registry_cache.cache_path.joinpath("broken.json").write_text("not json")
+
+    assert registry_cache.prune() == 2
+    assert registry_cache.get("https://registry.test/expired") is None
+    assert registry_cache.get("https://registry.test/valid") is not None
+
+
+def test_registry_handler_uses_fresh_cache_entry(registry_cache: RegistryResponseCache):
+    transport = FakeTransport(200, {"modules.v1": "/v1/modules/"}, headers={"ETag": '"abc"'})
+    registry_handler = RegistryHandler("registry.test", {}, registry_cache, transport)
+    first = registry_handler._get_json("https://registry.test/.well-known/terraform.json", "registry.test", ttl=60)
+    second = registry_handler._get_json("https://registry.test/.well-known/terraform.json", "registry.test", ttl=60)
+
+    assert first == second == {"modules.v1": "/v1/modules/"}
+    assert len(transport.requests) == 1
+    cached_entry = registry_cache.get("https://registry.test/.well-known/terraform.json")
+    assert cached_entry is not None and cached_entry.etag == '"abc"'
+
+
+def test_registry_handler_revalidates_expired_entry(registry_cache: RegistryResponseCache):
+    url = "https://registry.test/v1/modules/test/module/aws/versions"
+    registry_cache.set(RegistryCacheEntry(url=url, body='{"cached": true}', expires_at=time.time() - 1, etag='"abc"'))
+    transport = FakeTransport(304)
+    registry_handler = RegistryHandler("registry.test", {}, registry_cache, transport)
+    response_data = registry_handler._get_json(url, "registry.test", ttl=60)
+
+    assert transport.requests[0][1]["If-None-Match"] == '"abc"'
+    assert response_data == {"cached": True}
+    cached_entry = registry_cache.get(url)
+    assert cached_entry is not None and cached_entry.is_expired() is False
+
+
+def test_registry_handler_ignores_cache_write_errors(registry_cache: RegistryResponseCache):
+    registry_cache.set = MagicMock(side_effect=RegistryCacheException("read-only file system"))
+    transport = FakeTransport(200, {"modules.v1": "/v1/modules/"})
+    registry_handler = RegistryHandler("registry.test", {}, registry_cache, transport)
+
+    assert registry_handler._get_json("https://registry.test/.well-known/terraform.json", "registry.test", ttl=60) == {"modules.v1": "/v1/modules/"}
+    registry_cache.set.assert_called_once()
+
+
+def test_registry_handler_ignores_deleted_cache_directory(registry_cache: RegistryResponseCache):
+    registry_cache.cache_path.rmdir()
+    entry = RegistryCacheEntry(url="https://registry.test/.well-known/terraform.json", body="{}", expires_at=time.time() + 60)
+    with pytest.raises(RegistryCacheException):
+        registry_cache.set(entry)
+
+    transport = FakeTransport(200, {"modules.v1": "/v1/modules/"})
+    registry_handler = RegistryHandler("registry.test", {}, registry_cache, transport)
+    assert registry_handler._get_json(entry.url, "registry.test", ttl=60) == {"modules.v1": "/v1/modules/"}
+
+
+def test_registry_handler_keeps_version_set():
+    # The same body answers the discovery and the versions request
+    transport = FakeTransport(200, {"providers.v1": "/v1/providers/", "versions": [{"version": "5.1.0"}, {"version": "4.67.0"}, {"version": "5.0.0"}]})
+    registry_handler = RegistryHandler("registry.test", {}, transport=transport)
+    provider = TerraformProvider(name="aws", current_version="4.67.0", source_file=Path("main.tf"), source_string="hashicorp/aws", start_line_number=1)
+
+    assert registry_handler.get_newest_version(provider) == "5.1.0"
+    version_set = registry_handler.get_version_set(provider)
+    assert version_set is not None
+    assert version_set.get_newest(constraint=VersionConstraint("~> 4.0")) == "4.67.0"
+    assert version_set.count_newer(provider.current_version) == 2
+    assert len(transport.requests) == 2
@@ -0,0 +1,113 @@
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import pytest
+
+from infrapatch.conftest import StubHttpServer, StubResponse
+from infrapatch.core.utils.terraform.registry_handler import RegistryHandler, TerraformRegistryException
+from infrapatch.core.utils.terraform.registry_transport import PooledRegistryTransport
+
+
+def _handle_registry_request(server: StubHttpServer, path: str) -> StubResponse:
+    if path == "/slow":
+        time.sleep(0.05)
+    if path == "/redirect":
+        return StubResponse(302, {}, {"Location": "/v1/modules/test/module/aws/versions"})
+    if path == "/missing":
+        return StubResponse(404, {"errors": ["not found"]})
+    return StubResponse(200, {"modules": [{"versions": [{"version": "1.0.0"}]}]})
+
+
+@pytest.fixture
+def stub_registry(start_stub_http_server) -> StubHttpServer:
+    return start_stub_http_server(_handle_registry_request)
+
+
+def test_connections_are_reused(stub_registry: StubHttpServer):
+    transport = PooledRegistryTransport()
+    for _ in range(10):
+        response = transport.send(f"{stub_registry.base_url}/v1/modules/test/module/aws/versions", {})
+        assert response.status == 200
+        assert json.loads(response.read())["modules"][0]["versions"][0]["version"] == "1.0.0"
+    transport.close()
+
+    assert stub_registry.connections == 1
+
+
+def test_close_closes_connections(stub_registry: StubHttpServer):
+    transport = PooledRegistryTransport()
+    transport.send(f"{stub_registry.base_url}/v1/modules/test/module/aws/versions", {})
+    transport.close()
+
+    # The transport can still be used after closing, with a new connection
+    assert transport.send(f"{stub_registry.base_url}/v1/modules/test/module/aws/versions", {}).status == 200
+    transport.close()
+    assert stub_registry.connections == 2
+
+
+@pytest.fixture
+def proxy_environment(monkeypatch: pytest.MonkeyPatch):
+    for key in ["http_proxy", "https_proxy", "no_proxy", "all_proxy"]:
+        monkeypatch.delenv(key, raising=False)
+        monkeypatch.delenv(key.upper(), raising=False)
+    return monkeypatch
+
+
+def test_plain_http_registry_uses_http_proxy(stub_registry: StubHttpServer, proxy_environment: pytest.MonkeyPatch):
+    # The stub registry acts as proxy, proxied requests contain the full url
+    proxy_environment.setenv("http_proxy", stub_registry.base_url)
+    transport = PooledRegistryTransport()
+
+    response = transport.send("http://registry.invalid/v1/modules/test/module/aws/versions", {})
+    transport.close()
+
+    assert response.status == 200
+    assert stub_registry.paths == ["http://registry.invalid/v1/modules/test/module/aws/versions"]
+
+
+def test_no_proxy_hosts_bypass_proxy(stub_registry: StubHttpServer, proxy_environment: pytest.MonkeyPatch):
+    proxy_environment.setenv("http_proxy", "http://proxy.invalid:3128")
+    proxy_environment.setenv("https_proxy", "http://proxy.invalid:3128")
+    proxy_environment.setenv("no_proxy", "127.0.0.1,internal.example")
+    transport = PooledRegistryTransport()
+
+    assert transport.uses_proxy(urlsplit("https://registry.terraform.io/v1/modules"))
+    assert not transport.uses_proxy(urlsplit("https://internal.example/v1/modules"))
+    # Hosts excluded by NO_PROXY keep using the connection pool
+    for _ in range(2):
+        assert transport.send(f"{stub_registry.base_url}/v1/modules/test/module/aws/versions", {}).status == 200
+    transport.close()
+    assert stub_registry.connections == 1
+
+
+def test_concurrency_is_capped_per_host(stub_registry: StubHttpServer):
+    transport = PooledRegistryTransport(max_connections_per_host=2)
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        responses = list(executor.map(lambda _: transport.send(f"{stub_registry.base_url}/slow", {}), range(16)))
+    transport.close()
+
+    assert all(response.status == 200 for response in responses)
+    assert stub_registry.max_active_requests <= 2
+    assert stub_registry.connections <= 2
+
+
+def test_redirects_are_followed(stub_registry: StubHttpServer):
+    transport = PooledRegistryTransport()
+    response = transport.send(f"{stub_registry.base_url}/redirect", {"Authorization": "Bearer token"})
+    transport.close()
+
+    assert response.status == 200
+    assert response.url == f"{stub_registry.base_url}/v1/modules/test/module/aws/versions"
+    assert stub_registry.authorization_headers == ["Bearer token", "Bearer token"]
+
+
+def test_registry_handler_with_pooled_transport(stub_registry: StubHttpServer):
+    registry_handler = RegistryHandler("127.0.0.1", {"127.0.0.1": "secret_token"}, transport=PooledRegistryTransport())
+    response_data = registry_handler._get_json(f"{stub_registry.base_url}/v1/modules/test/module/aws/versions", "127.0.0.1", ttl=60)
+    assert response_data["modules"][0]["versions"][0]["version"] == "1.0.0"
+    assert stub_registry.authorization_headers == ["Bearer secret_token"]
+
+    with pytest.raises(TerraformRegistryException):
+        registry_handler._get_json(f"{stub_registry.base_url}/missing", "127.0.0.1", ttl=60)
@@ -0,0 +1,33 @@
+import os
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+from infrapatch.core.utils.atomic_file import write_file_atomic
+
+
+def test_write_file_atomic(tmp_path: Path):
+    file = tmp_path.joinpath("file.tf")
+    write_file_atomic(file, "first\r\n")
+    file.chmod(0o644)
+
+    write_file_atomic(file, "second\r\n")
+
+    # Line endings and permissions are kept, no temporary files are left behind
+    assert file.read_bytes() == b"second\r\n"
+    assert file.stat().st_mode & 0o777 == 0o644
+    assert os.listdir(tmp_path) == ["file.tf"]
+
+
+def test_write_file_atomic_errors(tmp_path: Path):
+    file = tmp_path.joinpath("file.tf")
+    file.write_text("original")
+    with patch("infrapatch.core.utils.atomic_file.os.replace", side_effect=OSError("replace failed")):
+        with pytest.raises(OSError):
+            write_file_atomic(file, "new")
+    assert file.read_text() == "original"
+    assert os.listdir(tmp_path) == ["file.tf"]
+
+    with pytest.raises(FileNotFoundError):
+        write_file_atomic(tmp_path.joinpath("missing", "file.tf"), "new")
@@ -0,0 +1,75 @@
+from pathlib import Path
+
+import pytest
+
+from infrapatch.core.utils.file_discovery import FileDiscovery, is_ignored, parse_ignore_file
+
+
+def _create_files(root: Path, files: list[str]):
+    for file in files:
+        file_path = root.joinpath(file)
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        file_path.touch()
+
+
+def test_iter_files_prunes_directories(tmp_path: Path):
+    _create_files(
+        tmp_path,
+        ["main.tf", "variables.tf", "README.md", "modules/vpc/main.tf", ".terraform/modules/vpc/main.tf", "node_modules/package/main.tf", ".hidden.tf"],
+    )
+    file_discovery = FileDiscovery()
+
+    files = list(file_discovery.iter_files(tmp_path, ".tf"))
+
+    assert files == [tmp_path.joinpath("main.tf"), tmp_path.joinpath("variables.tf"), tmp_path.joinpath("modules/vpc/main.tf")]
+    assert file_discovery.statistics.directories_scanned == 3
+    assert file_discovery.statistics.files_scanned == 4
+    assert file_discovery.statistics.files_found == 3
+    assert file_discovery.statistics.duration_seconds > 0
+
+
+def test_iter_files_honours_ignore_files(tmp_path: Path):
+    _create_files(tmp_path, ["main.tf", "generated/main.tf", "envs/dev/main.tf", "envs/dev/backup.tf", "envs/prod/main.tf", "envs/prod/keep.tf"])
+    tmp_path.joinpath(".gitignore").write_text("# generated code\ngenerated/\nbackup.tf\n")
+    tmp_path.joinpath("envs/.infrapatchignore").write_text("/prod/*.tf\n!/prod/keep.tf\n")
+
+    files = list(FileDiscovery().iter_files(tmp_path, ".tf"))
+
+    assert files == [tmp_path.joinpath("main.tf"), tmp_path.joinpath("envs/dev/main.tf"), tmp_path.joinpath("envs/prod/keep.tf")]
+
+
+def test_iter_files_is_lazy(tmp_path: Path):
+    _create_files(tmp_path, ["a/main.tf", "b/main.tf"])
+    file_discovery = FileDiscovery()
+    files = file_discovery.iter_files(tmp_path, ".tf")
+
+    assert next(files) == tmp_path.joinpath("a/main.tf")
+    # The second directory has not been scanned yet
+    assert file_discovery.statistics.directories_scanned == 2
+
+
+@pytest.mark.parametrize(
+    "pattern, path, is_directory, expected",
+    [
+        ("*.tf", "main.tf", False, True),
+        ("*.tf", "modules/main.tf", False, True),
+        ("/main.tf", "modules/main.tf", False, False),
+        ("modules/*.tf", "modules/main.tf", False, True),
+        ("modules/*.tf", "modules/vpc/main.tf", False, False),
+        ("modules/**/*.tf", "modules/vpc/subnet/main.tf", False, True),
+        ("**/vpc", "modules/vpc", True, True),
+        ("build/", "build", False, False),
+        ("build/", "build", True, True),
+        ("file[0-9].tf", "file1.tf", False, True),
+        ("file[!0-9].tf", "file1.tf", False, False),
+        ("file?.tf", "file10.tf", False, False),
+    ],
+)
+def test_ignore_patterns(pattern: str, path: str, is_directory: bool, expected: bool):
+    assert is_ignored(parse_ignore_file(pattern, ""), path, is_directory) is expected
+
+
+def test_ignore_rules_are_relative_to_ignore_file():
+    rules = parse_ignore_file("/main.tf", "modules")
+    assert is_ignored(rules, "modules/main.tf", False) is True
+    assert is_ignored(rules, "main.tf", False) is False
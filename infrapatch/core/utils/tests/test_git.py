@@ -0,0 +1,41 @@
+import subprocess
+from pathlib import Path
+
+import pytest
+
+from infrapatch.core.utils.git import Git, GitException
+
+
+def _run_git(repo_path: Path, *args: str):
+    subprocess.run(["git", *args], cwd=repo_path, check=True, capture_output=True)
+
+
+@pytest.fixture
+def git_repo(tmp_path: Path) -> Path:
+    _run_git(tmp_path, "init", "-q", "-b", "main")
+    _run_git(tmp_path, "config", "user.email", "test@example.com")
+    _run_git(tmp_path, "config", "user.name", "test")
+    tmp_path.joinpath("modules").mkdir()
+    for file_name in ["main.tf", "removed.tf", "modules/module.tf"]:
+        tmp_path.joinpath(file_name).write_text("")
+    _run_git(tmp_path, "add", ".")
+    _run_git(tmp_path, "commit", "-q", "-m", "initial")
+    return tmp_path
+
+
+def test_get_changed_files(git_repo: Path):
+    _run_git(git_repo, "checkout", "-q", "-b", "feature")
+    git_repo.joinpath("modules/module.tf").write_text("# committed change")
+    _run_git(git_repo, "commit", "-q", "-am", "change")
+    git_repo.joinpath("removed.tf").unlink()
+    git_repo.joinpath("untracked.tf").write_text("")
+
+    # Relative to the repository root, even if the git command runs in a subdirectory
+    changed_files = Git(git_repo.joinpath("modules")).get_changed_files("main")
+    root = git_repo.resolve()
+    assert changed_files == [root.joinpath("modules/module.tf"), root.joinpath("removed.tf"), root.joinpath("untracked.tf")]
+
+
+def test_get_changed_files_invalid_ref(git_repo: Path):
+    with pytest.raises(GitException):
+        Git(git_repo).get_changed_files("does-not-exist")
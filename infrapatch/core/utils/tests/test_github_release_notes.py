@@ -0,0 +1,127 @@
+import re
+import time
+from pathlib import Path
+from unittest.mock import MagicMock
+
+import pytest
+from github import Github
+
+from infrapatch.conftest import StubHttpServer, StubResponse
+from infrapatch.core.utils.github_release_notes import GithubReleaseNotesFetcher, get_candidate_tags, limit_release_notes, merge_release_notes
+from infrapatch.core.utils.terraform.registry_cache import RegistryCacheEntry, RegistryCacheException, RegistryResponseCache
+
+
+# Release body by path, for example '/repos/owner/repo/releases/tags/v1.0.0'.
+RELEASES = {
+    "/repos/owner/prefixed/releases/tags/v1.0.0": "prefixed release",
+    "/repos/owner/unprefixed/releases/tags/2.0.0": "unprefixed release",
+    "/repos/owner/both/releases/tags/v3.0.0": "prefixed wins",
+    "/repos/owner/both/releases/tags/3.0.0": "unprefixed loses",
+}
+# Pages of tag and body for the release list of a repo, by path, for example '/repos/owner/repo/releases'.
+# Pages hold up to four releases, matching the page size of the test client.
+RELEASE_PAGES = {
+    "/repos/owner/range/releases": [
+        # Releases are listed by creation date, the backport 2.8.5 was published after 3.8.0
+        [("v3.9.0", "notes 3.9.0"), ("v2.8.5", "backport"), ("v3.8.0", "notes 3.8.0"), ("v3.8.0-beta1", "beta")],
+        [("v3.2.0", "notes 3.2.0"), ("v3.1.0", "notes 3.1.0"), ("v3.0.0", "notes 3.0.0"), ("v2.9.0", "notes 2.9.0")],
+        [("v2.8.0", "notes 2.8.0")],
+    ],
+}
+
+
+def _handle_github_request(server: StubHttpServer, request_path: str) -> StubResponse:
+    time.sleep(0.02)
+    path, _, query = request_path.partition("?")
+    if path in RELEASE_PAGES:
+        pages = RELEASE_PAGES[path]
+        page_match = re.search(r"(?:^|&)page=(\d+)", query)
+        page = int(page_match.group(1)) if page_match is not None else 1
+        page_releases = pages[page - 1] if page <= len(pages) else []
+        return StubResponse(200, [{"url": f"{server.base_url}{path}/{tag}", "tag_name": tag, "body": body, "draft": False} for tag, body in page_releases])
+    if request_path in RELEASES:
+        return StubResponse(200, {"url": f"{server.base_url}{request_path}", "tag_name": request_path.split("/")[-1], "body": RELEASES[request_path]})
+    return StubResponse(404, {"message": "Not Found"})
+
+
+@pytest.fixture
+def fake_github(start_stub_http_server) -> StubHttpServer:
+    return start_stub_http_server(_handle_github_request)
+
+
+def _get_github(server: StubHttpServer) -> Github:
+    return Github(base_url=server.base_url, retry=None, seconds_between_requests=None, per_page=4)
+
+
+def test_get_candidate_tags():
+    assert get_candidate_tags("1.0.0") == ["v1.0.0", "1.0.0"]
+    assert get_candidate_tags("v1.0.0") == ["v1.0.0", "1.0.0"]
+
+
+def test_get_release_bodies(fake_github: StubHttpServer):
+    fetcher = GithubReleaseNotesFetcher(_get_github(fake_github), workers=4)
+    releases = [("owner/prefixed", "1.0.0"), ("owner/unprefixed", "2.0.0"), ("owner/both", "3.0.0"), ("owner/missing", "4.0.0"), ("owner/prefixed", "1.0.0")]
+
+    assert fetcher.get_release_bodies(releases) == ["prefixed release", "unprefixed release", "prefixed wins", None, "prefixed release"]
+    # Both tags of every release are requested once and concurrently, repos are created without a request
+    assert len(fake_github.paths) == 8
+    assert all("/releases/tags/" in path for path in fake_github.paths)
+    assert 1 < fake_github.max_active_requests <= 4
+
+    assert fetcher.get_release_bodies([("owner/both", "3.0.0")]) == ["prefixed wins"]
+    assert len(fake_github.paths) == 8
+
+
+def test_release_bodies_are_cached_between_runs(fake_github: StubHttpServer, tmp_path: Path):
+    response_cache = RegistryResponseCache(tmp_path.joinpath("cache"))
+    releases = [("owner/prefixed", "1.0.0"), ("owner/missing", "4.0.0")]
+    assert GithubReleaseNotesFetcher(_get_github(fake_github), response_cache).get_release_bodies(releases) == ["prefixed release", None]
+    requests = len(fake_github.paths)
+
+    assert GithubReleaseNotesFetcher(_get_github(fake_github), response_cache).get_release_bodies(releases) == ["prefixed release", None]
+    assert len(fake_github.paths) == requests
+
+
+def test_release_bodies_with_broken_cache(fake_github: StubHttpServer, tmp_path: Path):
+    response_cache = RegistryResponseCache(tmp_path.joinpath("cache"))
+    response_cache.set(RegistryCacheEntry(url="github://owner/prefixed/releases/tags/v1.0.0", body="not json", expires_at=time.time() + 60))
+    response_cache.set(RegistryCacheEntry(url="github://owner/prefixed/releases/tags/1.0.0", body='{"notes": null}', expires_at=time.time() + 60))
+    response_cache.set = MagicMock(side_effect=RegistryCacheException("disk full"))
+
+    # Invalid entries are a cache miss, failing writes do not fail the release notes
+    releases = [("owner/prefixed", "1.0.0")]
+    assert GithubReleaseNotesFetcher(_get_github(fake_github), response_cache).get_release_bodies(releases) == ["prefixed release"]
+    assert len(fake_github.paths) == 2
+    assert response_cache.set.call_count == 2
+
+
+def test_release_bodies_with_deleted_cache_directory(fake_github: StubHttpServer, tmp_path: Path):
+    response_cache = RegistryResponseCache(tmp_path.joinpath("cache"))
+    response_cache.cache_path.rmdir()
+
+    releases = [("owner/prefixed", "1.0.0")]
+    assert GithubReleaseNotesFetcher(_get_github(fake_github), response_cache).get_release_bodies(releases) == ["prefixed release"]
+
+
+def test_get_release_ranges(fake_github: StubHttpServer):
+    fetcher = GithubReleaseNotesFetcher(_get_github(fake_github))
+    ranges = [("owner/range", "3.2.0", "3.9.0"), ("owner/range", "3.2.0", "3.8.0"), ("owner/range", "~>3.2.0", "3.9.0")]
+
+    assert fetcher.get_release_ranges(ranges) == [[("v3.9.0", "notes 3.9.0"), ("v3.8.0", "notes 3.8.0")], [("v3.8.0", "notes 3.8.0")], []]
+    # The releases are listed once, the backport does not stop paging, the third page is not needed for these ranges
+    assert [path.partition("?")[0] for path in fake_github.paths] == ["/repos/owner/range/releases"] * 2
+    # Releases found while listing answer single release requests
+    assert fetcher.get_release_bodies([("owner/range", "3.8.0")]) == ["notes 3.8.0"]
+    assert len(fake_github.paths) == 2
+
+    assert fetcher.get_release_ranges([("owner/range", "3.0.0", "3.1.0")]) == [[("v3.1.0", "notes 3.1.0")]]
+    assert len(fake_github.paths) == 5
+
+
+def test_merge_and_limit_release_notes():
+    body = merge_release_notes([("v2.0.0", "second"), ("v1.1.0", "first")])
+    assert body == "### v2.0.0\n\nsecond\n\n### v1.1.0\n\nfirst"
+    assert limit_release_notes(body, "owner/repo") == body
+    limited_body = limit_release_notes(body, "owner/repo", max_length=10)
+    assert limited_body.startswith("### v2.0.0\n\n... truncated")
+    assert "https://github.com/owner/repo/releases" in limited_body
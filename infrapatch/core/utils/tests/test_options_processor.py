@@ -110,6 +110,20 @@ def test_get_upper_line_with_valid_line_numbers(options_processor: OptionsProces
     assert resource2_line == "line4"
 
 
+def test_process_options_for_resources_reads_each_file_once(options_processor: OptionsProcessor):
+    resources = [
+        TerraformModule(
+            name=f"test_resource{i}", current_version="1.0.0", source_file=Path("test_file.tf"), source_string="test/test_module/test_provider", start_line_number=i * 2
+        )
+        for i in range(1, 4)
+    ]
+    file_content = "# infrapatch_options: ignore_resource=true\nmodule\nline3\nmodule\n# infrapatch_options: ignore_resource=true\nmodule\n"
+    with mock.patch("builtins.open", mock.mock_open(read_data=file_content)) as mock_file:
+        options_processor.process_options_for_resources(resources)
+        assert mock_file.call_count == 1
+    assert [resource.options.ignore_resource for resource in resources] == [True, False, True]
+
+
 options_strings = ["ignore_resource=true", "ignore_resource = true, test_option=2", "ignore_resource =false,test_option2=test4, test_option3 = test5"]
 
 
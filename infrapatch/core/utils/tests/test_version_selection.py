@@ -0,0 +1,71 @@
+import pytest
+
+from infrapatch.core.utils.version_selection import VersionConstraint, VersionSelectionException, VersionSet, parse_version, select_newest_version
+
+
+def test_parse_version():
+    assert parse_version("1.2.3") == parse_version("1.2.3")
+    assert parse_version("1.2") == parse_version("1.2.0")
+    assert parse_version("1.2.3a1") < parse_version("1.2.3b1") < parse_version("1.2.3")  # type: ignore
+    assert parse_version("1.10.0") > parse_version("1.9.0")  # type: ignore
+    assert parse_version("1.2.3-rc1") is None
+    assert parse_version("v1.2.3") is None
+
+
+def test_select_newest_version():
+    versions = ["1.9.0", "1.10.0", None, "invalid", "1.10.1a1", "0.1.0"]
+    assert select_newest_version(versions) == "1.10.1a1"
+    assert select_newest_version(versions, include_pre_releases=False) == "1.10.0"
+    assert select_newest_version(["invalid", None]) is None
+    assert select_newest_version([]) is None
+
+
+@pytest.mark.parametrize(
+    "constraint, expected_version",
+    [
+        ("~> 1.0", "1.10.0"),
+        ("~> 1.9.0", "1.9.5"),
+        (">= 1.0.0, < 1.10.0", "1.9.5"),
+        ("!= 2.1.0", "2.0.0"),
+        ("= 1.9.0", "1.9.0"),
+        ("1.9.0", "1.9.0"),
+        ("> 3.0.0", None),
+    ],
+)
+def test_select_newest_version_with_constraint(constraint: str, expected_version: str):
+    versions = ["1.9.0", "1.9.5", "1.10.0", "2.0.0a1", "2.0.0", "2.1.0"]
+    assert select_newest_version(versions, constraint=VersionConstraint(constraint)) == expected_version
+
+
+@pytest.mark.parametrize("constraint", ["~> 1", ">= abc", "1.2.3.4", ""])
+def test_invalid_constraint(constraint: str):
+    with pytest.raises(VersionSelectionException):
+        VersionConstraint(constraint)
+
+
+def test_version_set():
+    version_set = VersionSet(["1.9.0", "2.0.0", "1.10.0", "2.1.0b1", "1.9", None, "invalid"])
+
+    # Duplicates and unsupported versions are dropped, the first spelling of a version is kept
+    assert len(version_set) == 4
+    assert version_set.get_newest() == "2.1.0b1"
+    assert version_set.get_newest(include_pre_releases=False) == "2.0.0"
+    assert version_set.get_newest(constraint=VersionConstraint("~> 2.0")) == "2.1.0b1"
+    assert version_set.get_newest(include_pre_releases=False, constraint=VersionConstraint("~> 2.0")) == "2.0.0"
+    assert version_set.get_newest(constraint=VersionConstraint("~> 1.9.0")) == "1.9.0"
+    assert version_set.get_newest(constraint=VersionConstraint("!= 1.10.0, < 2.0.0")) == "1.9.0"
+    assert version_set.get_newest(constraint=VersionConstraint("> 2.1.0, < 3.0.0")) is None
+    assert version_set.count_newer("1.9.0") == 2
+    assert version_set.count_newer("1.9.0", include_pre_releases=True) == 3
+    assert version_set.count_newer("3.0.0") == 0
+    # Versions with larger parts than any stored version are compared correctly
+    assert version_set.count_newer("1.100.0") == 1
+    assert version_set.get_newest(constraint=VersionConstraint("<= 1.100.0")) == "1.10.0"
+
+
+def test_version_set_with_large_versions():
+    version_set = VersionSet(["20240101.0.0", "20231201.1.0", "1.0.0b99999999999999999999"])
+
+    assert version_set.get_newest() == "20240101.0.0"
+    assert version_set.get_newest(constraint=VersionConstraint("< 20240101.0.0")) == "20231201.1.0"
+    assert version_set.count_newer("1.0.0") == 2
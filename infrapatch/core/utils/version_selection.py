@@ -0,0 +1,189 @@
+import bisect
+import logging as log
+import re
+from array import array
+from typing import Iterable, Optional, Sequence, Union
+
+# Same format StrictVersion accepted: "1.2", "1.2.3" and pre-releases like "1.2.3a1" or "1.2b3".
+_version_re = re.compile(r"^(\d+)\.(\d+)(?:\.(\d+))?(?:([ab])(\d+))?$", re.ASCII)
+_constraint_re = re.compile(r"^(=|!=|>=|<=|>|<|~>)?\s*v?(\d+(?:\.\d+){0,2})$", re.ASCII)
+
+# Pre-releases sort before the release of the same version, alpha before beta.
+_PRE_RELEASE_RANKS = {"a": 0, "b": 1}
+_RELEASE_RANK = 2
+
+# (major, minor, patch, pre-release rank, pre-release number), compared as plain integer tuples.
+VersionKey = tuple[int, int, int, int, int]
+
+
+class VersionSelectionException(Exception):
+    pass
+
+
+def parse_version(version: str) -> Optional[VersionKey]:
+    match = _version_re.match(version)
+    if match is None:
+        return None
+    major, minor, patch, pre_release, pre_release_number = match.groups()
+    if pre_release is None:
+        return (int(major), int(minor), int(patch or 0), _RELEASE_RANK, 0)
+    return (int(major), int(minor), int(patch or 0), _PRE_RELEASE_RANKS[pre_release], int(pre_release_number))
+
+
+def is_pre_release(version: VersionKey) -> bool:
+    return version[3] != _RELEASE_RANK
+
+
+def pack_version(version: VersionKey, bits: Sequence[int]) -> Optional[int]:
+    # Packs the parts into one integer with the given bits per part, packed versions keep the order of the tuples.
+    # Returns None if a part does not fit into its bits.
+    packed = 0
+    for part, part_bits in zip(version, bits):
+        if part >= 1 << part_bits:
+            return None
+        packed = (packed << part_bits) | part
+    return packed
+
+
+def unpack_version(packed: int, bits: Sequence[int]) -> VersionKey:
+    parts = []
+    for part_bits in reversed(bits):
+        parts.append(packed & ((1 << part_bits) - 1))
+        packed >>= part_bits
+    return tuple(reversed(parts))  # type: ignore
+
+
+class VersionConstraint:
+    # Terraform style constraint, for example "~> 3.0" or ">= 1.2.0, < 2.0.0". All parts must match.
+    def __init__(self, constraint: str):
+        self.constraint = constraint
+        self._bounds: list[tuple[str, VersionKey]] = []
+        for part in constraint.split(","):
+            match = _constraint_re.match(part.strip())
+            if match is None:
+                raise VersionSelectionException(f"Invalid version constraint '{constraint}'.")
+            operator = match.group(1) or "="
+            numbers = [int(number) for number in match.group(2).split(".")]
+            lower = self._get_key(numbers)
+            if operator != "~>":
+                self._bounds.append((operator, lower))
+                continue
+            # "~> 1.2" allows everything below 2.0, "~> 1.2.3" everything below 1.3.0.
+            if len(numbers) == 1:
+                raise VersionSelectionException(f"Pessimistic constraint '{part.strip()}' needs at least a minor version.")
+            upper = numbers[:-1]
+            upper[-1] += 1
+            self._bounds.append((">=", lower))
+            # The lowest pre-release of the upper bound is excluded as well.
+            self._bounds.append(("<", (*self._get_key(upper)[:3], 0, 0)))
+
+    def get_lower_bound(self) -> Optional[VersionKey]:
+        # Lowest version which can match, used to stop searching sorted versions early.
+        bounds = [bound for operator, bound in self._bounds if operator in ["=", ">=", ">"]]
+        return max(bounds) if len(bounds) > 0 else None
+
+    def get_upper_bound(self) -> Optional[VersionKey]:
+        # No version above this one can match, versions equal to it might.
+        bounds = [bound for operator, bound in self._bounds if operator in ["=", "<=", "<"]]
+        return min(bounds) if len(bounds) > 0 else None
+
+    def _get_key(self, numbers: list[int]) -> VersionKey:
+        padded = [*numbers, 0, 0][:3]
+        return (padded[0], padded[1], padded[2], _RELEASE_RANK, 0)
+
+    def matches(self, version: VersionKey) -> bool:
+        for operator, bound in self._bounds:
+            if operator == "=" and version != bound:
+                return False
+            if operator == "!=" and version == bound:
+                return False
+            if operator == ">" and version <= bound:
+                return False
+            if operator == ">=" and version < bound:
+                return False
+            if operator == "<" and version >= bound:
+                return False
+            if operator == "<=" and version > bound:
+                return False
+        return True
+
+
+def select_newest_version(versions: Iterable[Union[str, None]], include_pre_releases: bool = True, constraint: Optional[VersionConstraint] = None) -> Optional[str]:
+    # Single pass over the versions, every version is parsed once and only the current maximum is kept.
+    newest_version = None
+    newest_key = None
+    for version in versions:
+        if version is None:
+            continue
+        key = parse_version(version)
+        if key is None:
+            continue
+        if not include_pre_releases and is_pre_release(key):
+            continue
+        if constraint is not None and not constraint.matches(key):
+            continue
+        if newest_key is None or key > newest_key:
+            newest_key = key
+            newest_version = version
+    return newest_version
+
+
+class VersionSet:
+    # All versions of a resource as a sorted array of packed integers, with the original strings alongside.
+    # The bits per part are taken from the largest versions, so the array usually fits 64 bit integers.
+    def __init__(self, versions: Iterable[Union[str, None]]):
+        parsed: dict[VersionKey, str] = {}
+        for version in versions:
+            if version is None:
+                continue
+            key = parse_version(version)
+            if key is not None:
+                parsed.setdefault(key, version)
+        keys = sorted(parsed)
+        self._bits = tuple(max([key[part].bit_length() for key in keys], default=0) for part in range(5))
+        packed_versions = [pack_version(key, self._bits) for key in keys]
+        packed_releases = [packed for key, packed in zip(keys, packed_versions) if not is_pre_release(key)]
+        if sum(self._bits) <= 64:
+            self._versions: Sequence[int] = array("Q", packed_versions)  # type: ignore
+            self._release_versions: Sequence[int] = array("Q", packed_releases)  # type: ignore
+        else:
+            log.debug(f"Versions need {sum(self._bits)} bits, storing them as plain integers.")
+            self._versions = packed_versions  # type: ignore
+            self._release_versions = packed_releases  # type: ignore
+        self._version_strings = [parsed[key] for key in keys]
+
+    def __len__(self) -> int:
+        return len(self._versions)
+
+    def get_newest(self, include_pre_releases: bool = True, constraint: Optional[VersionConstraint] = None) -> Optional[str]:
+        versions = self._versions if include_pre_releases else self._release_versions
+        end = len(versions)
+        lower_bound = None
+        if constraint is not None:
+            upper_bound = constraint.get_upper_bound()
+            if upper_bound is not None:
+                end = self._bisect_right(versions, upper_bound)
+            lower_bound = constraint.get_lower_bound()
+        # Walk down from the highest candidate, usually the first one already matches.
+        for position in range(end - 1, -1, -1):
+            key = unpack_version(versions[position], self._bits)
+            if lower_bound is not None and key < lower_bound:
+                return None
+            if constraint is None or constraint.matches(key):
+                return self._version_strings[bisect.bisect_left(self._versions, versions[position])]
+        return None
+
+    def count_newer(self, version: str, include_pre_releases: bool = False) -> int:
+        # Number of versions the given version is behind.
+        key = parse_version(version)
+        if key is None:
+            raise VersionSelectionException(f"Version '{version}' has an unsupported format.")
+        versions = self._versions if include_pre_releases else self._release_versions
+        return len(versions) - self._bisect_right(versions, key)
+
+    def _bisect_right(self, versions: Sequence[int], key: VersionKey) -> int:
+        packed = pack_version(key, self._bits)
+        if packed is not None:
+            return bisect.bisect_right(versions, packed)
+        # Versions with parts larger than any stored version are compared unpacked.
+        return bisect.bisect_right(versions, key, key=lambda packed_version: unpack_version(packed_version, self._bits))